@@ -1,30 +1,96 @@
 import os
+import sys
 import json
 import random
+import math
+import bisect
+import functools
 import re
 import base64
 import uuid
-from datetime import datetime, timedelta
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for
+import time
+import hashlib
+import hmac
+import cProfile
+import threading
+import atexit
+import sqlite3
+import struct
+import mmap
+import queue
+import logging
+import logging.handlers
+from abc import ABC, abstractmethod
+from array import array
+from collections import OrderedDict
+from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+try:
+    import fcntl  # POSIX only; used to coordinate gunicorn workers sharing RESULTS_DIR
+except ImportError:
+    fcntl = None
+try:
+    import tomllib  # Python 3.11+; only needed for a .toml distribution file
+except ImportError:
+    tomllib = None
+from flask import Flask, render_template, request, jsonify, session, redirect, url_for, g
 import requests
+from requests.adapters import HTTPAdapter
+from email.utils import parsedate_to_datetime
+from urllib.parse import parse_qs
+
+# Logging: DEBUG traces every request and GitHub call, INFO keeps lifecycle events only
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+
+class AsyncLogHandler(logging.handlers.QueueHandler):
+    """Queues records for a background writer thread so request threads never block on stdout.
+
+    The writer thread does not survive a fork, so each process starts its own on first use.
+    """
+    
+    def __init__(self, target):
+        super().__init__(queue.SimpleQueue())
+        self.target = target
+        self._listener = None
+        self._pid = None
+        self._lock = threading.Lock()
+    
+    def enqueue(self, record):
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self.queue = queue.SimpleQueue()
+                    self._listener = logging.handlers.QueueListener(self.queue, self.target)
+                    self._listener.start()
+                    self._pid = os.getpid()
+        self.queue.put_nowait(record)
+    
+    def stop(self):
+        """Write out everything still queued (called at exit)"""
+        if self._listener is not None and self._pid == os.getpid():
+            self._listener.stop()
+            self._pid = None
+
+def configure_logging():
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(logging.Formatter('%(asctime)s %(levelname)s [%(process)d] %(message)s'))
+    handler = AsyncLogHandler(stream)
+    atexit.register(handler.stop)
+    
+    logger = logging.getLogger('quiz')
+    level = logging.getLevelName(LOG_LEVEL)
+    logger.setLevel(level if isinstance(level, int) else logging.INFO)
+    logger.addHandler(handler)
+    logger.propagate = False
+    return logger
+
+log = configure_logging()
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-secret-key-change-in-production')
 app.config['PERMANENT_SESSION_LIFETIME'] = 1800  # 30 minutes session timeout
 
-# In-memory cache for questions (to avoid session size limits)
-# Key: session_id, Value: {'questions': [...], 'timestamp': datetime, 'database_key': str}
-questions_cache = {}
-
-def cleanup_old_cache():
-    """Remove cache entries older than 2 hours"""
-    cutoff = datetime.now() - timedelta(hours=2)
-    to_remove = [k for k, v in questions_cache.items() if v.get('timestamp', datetime.min) < cutoff]
-    for key in to_remove:
-        del questions_cache[key]
-    if to_remove:
-        print(f"[CACHE] Cleaned up {len(to_remove)} old cache entries")
-
 # Prevent caching of sensitive pages
 @app.after_request
 def add_no_cache_headers(response):
@@ -38,6 +104,83 @@ def add_no_cache_headers(response):
 # GitHub configuration
 GITHUB_TOKEN = os.environ.get('GITHUB_TOKEN')
 PRIVATE_REPO = os.environ.get('PRIVATE_REPO')  # Format: username/repo-name
+GITHUB_API_URL = os.environ.get('GITHUB_API_URL', 'https://api.github.com').rstrip('/')  # Override to point at a local stand-in
+GITHUB_BRANCH = os.environ.get('GITHUB_BRANCH')  # Pin the branch; otherwise the repo's default branch is looked up once
+GITHUB_TREE_TTL_SECONDS = float(os.environ.get('GITHUB_TREE_TTL_SECONDS', '1'))  # Reuse of one tree listing for many files
+# How question banks are downloaded: 'contents' (in-memory, 1 MB limit) or 'blobs' (streamed to RESULTS_DIR/blobs)
+GITHUB_FETCH_MODE = os.environ.get('GITHUB_FETCH_MODE', 'contents')
+
+# GitHub content cache configuration
+# Entries are revalidated with If-None-Match once older than the TTL (0 = revalidate on every read,
+# so edits in the private repo still take effect immediately; unchanged files cost only a 304)
+GITHUB_CACHE_TTL_SECONDS = float(os.environ.get('GITHUB_CACHE_TTL_SECONDS', '0'))
+GITHUB_CACHE_MAX_BYTES = int(os.environ.get('GITHUB_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))  # Total cached body size
+
+# GitHub HTTP client configuration (shared keep-alive pool, timeouts, retries, circuit breaker)
+GITHUB_CONNECT_TIMEOUT = float(os.environ.get('GITHUB_CONNECT_TIMEOUT', '3.05'))  # Seconds to establish a connection
+GITHUB_READ_TIMEOUT = float(os.environ.get('GITHUB_READ_TIMEOUT', '15'))  # Seconds to wait for response data
+GITHUB_MAX_RETRIES = int(os.environ.get('GITHUB_MAX_RETRIES', '3'))  # Retries on connection errors, 5xx and 429
+GITHUB_BACKOFF_SECONDS = float(os.environ.get('GITHUB_BACKOFF_SECONDS', '0.5'))  # Base of the jittered exponential backoff
+GITHUB_MAX_RETRY_WAIT_SECONDS = float(os.environ.get('GITHUB_MAX_RETRY_WAIT_SECONDS', '10'))  # Longer waits fail instead
+GITHUB_BREAKER_THRESHOLD = int(os.environ.get('GITHUB_BREAKER_THRESHOLD', '5'))  # Consecutive failed requests (after retries) that open the circuit
+GITHUB_BREAKER_RESET_SECONDS = float(os.environ.get('GITHUB_BREAKER_RESET_SECONDS', '30'))  # Open time before a trial call
+GITHUB_POOL_SIZE = int(os.environ.get('GITHUB_POOL_SIZE', '10'))  # Keep-alive connections per process
+
+# Results storage configuration
+# Results are appended to RESULTS_DIR/results.jsonl and exported to results.json in the private repo
+RESULTS_DIR = os.environ.get('RESULTS_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data'))
+RESULTS_FSYNC = os.environ.get('RESULTS_FSYNC', 'always')  # always | batch | never
+RESULTS_FSYNC_INTERVAL_SECONDS = float(os.environ.get('RESULTS_FSYNC_INTERVAL_SECONDS', '1'))  # Used with 'batch'
+RESULTS_EXPORT_INTERVAL_SECONDS = float(os.environ.get('RESULTS_EXPORT_INTERVAL_SECONDS', '300'))  # 0 disables export
+
+# Where users, results and completed sections live
+# 'github': the private repo's JSON files (results via results.jsonl); 'sqlite': RESULTS_DIR/quiz.sqlite3,
+# with users.json and completed_sections.json imported and results/completions exported in bulk
+STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'github')  # github | sqlite
+STORAGE_SYNC_SECONDS = float(os.environ.get('STORAGE_SYNC_SECONDS', '30'))  # sqlite: import interval for the GitHub files
+
+# Precompiled question bank snapshots (tools/compile_banks.py); used when their blob SHA matches GitHub
+BANK_SNAPSHOT_DIR = os.environ.get('BANK_SNAPSHOT_DIR', os.path.join(RESULTS_DIR, 'snapshots'))
+
+# Submissions are graded in the request and persisted from RESULTS_DIR/submissions.sqlite3 by a background worker
+SUBMIT_QUEUE_INTERVAL_SECONDS = float(os.environ.get('SUBMIT_QUEUE_INTERVAL_SECONDS', '0.5'))  # Poll period across workers
+SUBMISSION_REPLAY_SECONDS = float(os.environ.get('SUBMISSION_REPLAY_SECONDS', str(24 * 3600)))  # Retries replay the stored response
+
+# Write-behind configuration for GitHub uploads (completed sections etc.)
+GITHUB_FLUSH_INTERVAL_SECONDS = float(os.environ.get('GITHUB_FLUSH_INTERVAL_SECONDS', '10'))  # One PUT per file per flush
+GITHUB_COMMIT_ATTEMPTS = int(os.environ.get('GITHUB_COMMIT_ATTEMPTS', '5'))  # Re-merge attempts on SHA conflicts
+
+# How long the in-memory user directory is trusted before revalidating users.json with GitHub
+USERS_REFRESH_SECONDS = float(os.environ.get('USERS_REFRESH_SECONDS', '5'))
+
+# How long the in-memory completed-sections index is trusted before revalidating with GitHub
+COMPLETIONS_REFRESH_SECONDS = float(os.environ.get('COMPLETIONS_REFRESH_SECONDS', '2'))
+
+# Warm-up and background refresh of question banks
+WARMUP_THREADS = int(os.environ.get('WARMUP_THREADS', '6'))  # Parallel fetches during warm-up
+BANK_REFRESH_SECONDS = float(os.environ.get('BANK_REFRESH_SECONDS', '60'))  # 0 disables the refresher
+
+# Section weights by section name (JSON or TOML): a local path, else a path in the private repo.
+# Databases not listed there fall back to the positional *_PCT variables below.
+QUIZ_DISTRIBUTION_FILE = os.environ.get('QUIZ_DISTRIBUTION_FILE', 'distribution.json')
+DISTRIBUTION_REFRESH_SECONDS = float(os.environ.get('DISTRIBUTION_REFRESH_SECONDS', '30'))  # Hot-reload check interval
+
+# Quiz session store configuration
+# 'memory' keeps sessions in each worker; 'sqlite' shares them across gunicorn workers via RESULTS_DIR
+QUIZ_SESSION_BACKEND = os.environ.get('QUIZ_SESSION_BACKEND', 'memory')
+QUIZ_SESSION_MAX = int(os.environ.get('QUIZ_SESSION_MAX', '5000'))  # Least recently used sessions evicted beyond this
+QUIZ_SESSION_TTL_SECONDS = float(os.environ.get('QUIZ_SESSION_TTL_SECONDS', str(2 * 3600)))
+
+# multiLogin users are served questions they have not seen yet (tracked in RESULTS_DIR/exposure.sqlite3)
+QUESTION_ROTATION = os.environ.get('QUESTION_ROTATION', 'on')  # on | off
+
+# On-demand profiling: requests carrying PROFILE_TOKEN (X-Profile-Token header or ?profile=) are
+# profiled, plus a random PROFILE_SAMPLE_RATE share of all requests. Both unset = no profiling hook.
+PROFILE_TOKEN = os.environ.get('PROFILE_TOKEN')
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', '0'))  # e.g. 0.001 for 1 request in 1000
+PROFILE_DIR = os.environ.get('PROFILE_DIR', os.path.join(RESULTS_DIR, 'profiles'))
+PROFILE_STACK_INTERVAL_MS = float(os.environ.get('PROFILE_STACK_INTERVAL_MS', '1'))  # Stack sampling period
+PROFILE_KEEP = int(os.environ.get('PROFILE_KEEP', '50'))  # Profiles kept per endpoint
 
 # Quiz configuration (customizable)
 QUIZ_NUM_QUESTIONS = int(os.environ.get('QUIZ_NUM_QUESTIONS', '30'))  # Total questions per quiz (global default)
@@ -111,182 +254,1118 @@ CLASSIC_AUTOSAR_PCT = os.environ.get('CLASSIC_AUTOSAR_PCT')  # CLASSIC AUTOSAR
 ADAPTIVE_AUTOSAR_PCT = os.environ.get('ADAPTIVE_AUTOSAR_PCT')  # ADAPTIVE AUTOSAR
 MISC_AUTOSAR_PCT = os.environ.get('MISC_AUTOSAR_PCT')  # MISC AUTOSAR
 
-def upload_to_github(filename, content, message="Update file"):
-    """Upload/update file in private GitHub repository"""
-    print(f"[GITHUB] Uploading {filename} to GitHub...")
-    
-    url = f"https://api.github.com/repos/{PRIVATE_REPO}/contents/{filename}"
-    auth_prefix = 'Bearer' if GITHUB_TOKEN.startswith('github_pat_') else 'token'
+# Section percentages per database index, in the order the sections appear in the bank file
+SECTION_PCT_BY_DB_INDEX = {
+    1: [MATLAB_SCRIPTING_FUNDAMENTALS_PCT, MATLAB_SCRIPTING_ADVANCED_PCT, MATLAB_SCRIPTING_TRICKY_PCT,
+        MATLAB_WORKSPACE_SCOPE_PCT, MATLAB_SIMPLE_TRICKY_PCT, SIMULINK_MSCRIPT_FUNDAMENTALS_PCT,
+        SIMULINK_MSCRIPT_SIMPLE_PCT, SIMULINK_MSCRIPT_TRICKY_PCT, FIND_SYSTEM_COMMAND_PCT,
+        SIMULINK_TRUEFALSE_PCT, MATLAB_TRUEFALSE_PCT, STATEFLOW_MSCRIPTING_PCT,
+        SIMULINK_DATA_DICTIONARY_PCT, MODEL_COMPARISON_PROJECTS_PCT, CODE_GENERATION_SCRIPTING_PCT,
+        TEST_AUTOMATION_PCT, SIMULINK_DATA_HANDLING_PCT, MISCELLANEOUS_MSCRIPTING_PCT],
+    2: [SIMULINK_BASIC_PCT, SIMULINK_ADVANCED_PCT, SIMULINK_SUPER_ADVANCED_PCT, STATEFLOW_BASIC_PCT,
+        STATEFLOW_ADVANCED_PCT, STATEFLOW_SUPER_ADVANCED_PCT, STATEFLOW_TRICKY_PCT, SIMULINK_TRICKY_PCT],
+    3: [MODELING_SIMULINK_BASIC_PCT, MODELING_SIMULINK_ADVANCED_PCT, MODELING_STATEFLOW_BASIC_PCT,
+        MODELING_STATEFLOW_ADVANCED_PCT],
+    4: [BASIC_EMBEDDED_C_PCT, ADVANCED_EMBEDDED_C_PCT, AUTOMOTIVE_EMBEDDED_C_PCT,
+        MATLAB_AUTO_CODE_GENERATION_PCT, TRICKY_EMBEDDED_C_PCT, MEMORY_RELATED_EMBEDDED_C_PCT],
+    5: [CAN_HIGH_LEVEL_PCT, CAN_FRAME_FORMAT_PCT, MISC_CAN_PCT],
+    6: [CLASSIC_AUTOSAR_PCT, ADAPTIVE_AUTOSAR_PCT, MISC_AUTOSAR_PCT],
+}
+
+# Latency histogram buckets (seconds) for /metrics
+METRICS_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class ThreadCells:
+    """A fixed-size row of numbers that every thread updates in its own copy.
+
+    Updates touch only the calling thread's list, so they need no lock; a scrape adds
+    the rows together. Rows of finished threads are folded into one retired row.
+    """
+    
+    def __init__(self, size):
+        self.size = size
+        self._local = threading.local()
+        self._rows = []  # (thread, row)
+        self._retired = [0] * size
+        self._lock = threading.Lock()
+    
+    def row(self):
+        row = getattr(self._local, 'row', None)
+        if row is None:
+            row = self._local.row = [0] * self.size
+            with self._lock:
+                self._rows.append((threading.current_thread(), row))
+        return row
+    
+    def totals(self):
+        with self._lock:
+            live = []
+            for thread, row in self._rows:
+                if thread.is_alive():
+                    live.append((thread, row))
+                else:
+                    for i, value in enumerate(row):
+                        self._retired[i] += value
+            self._rows = live
+            totals = list(self._retired)
+            for _, row in live:
+                for i, value in enumerate(row):
+                    totals[i] += value
+        return totals
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join('%s="%s"' % (k, str(v).replace('\\', '\\\\').replace('"', '\\"'))
+                          for k, v in labels.items()) + '}'
+
+class Counter:
+    def __init__(self, labels):
+        self.labels = labels
+        self._cells = ThreadCells(1)
     
-    headers = {
-        'Authorization': f'{auth_prefix} {GITHUB_TOKEN}',
-        'Accept': 'application/vnd.github.v3+json'
-    }
+    def inc(self, amount=1):
+        self._cells.row()[0] += amount
     
-    # Check if file exists (to get SHA for update)
-    response = requests.get(url, headers=headers)
+    def samples(self, name):
+        yield name, self.labels, self._cells.totals()[0]
+
+class Histogram:
+    def __init__(self, labels, buckets=METRICS_BUCKETS):
+        self.labels = labels
+        self.buckets = buckets
+        self._cells = ThreadCells(len(buckets) + 2)  # one per bucket, +Inf, then the sum
+    
+    def observe(self, seconds):
+        row = self._cells.row()
+        row[bisect.bisect_left(self.buckets, seconds)] += 1
+        row[-1] += seconds
+    
+    def time(self):
+        return _Timer(self)
+    
+    def samples(self, name):
+        totals = self._cells.totals()
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), totals):
+            cumulative += count
+            yield name + '_bucket', {**self.labels, 'le': '+Inf' if bound == float('inf') else repr(bound)}, cumulative
+        yield name + '_sum', self.labels, totals[-1]
+        yield name + '_count', self.labels, cumulative
+
+class _Timer:
+    __slots__ = ('histogram', 'started')
     
-    content_encoded = base64.b64encode(content.encode()).decode()
+    def __init__(self, histogram):
+        self.histogram = histogram
     
-    data = {
-        'message': message,
-        'content': content_encoded
-    }
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
     
-    if response.status_code == 200:
-        # File exists, need SHA to update
-        data['sha'] = response.json()['sha']
-        print(f"[GITHUB] File exists, updating...")
-    else:
-        print(f"[GITHUB] File doesn't exist, creating...")
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started)
+
+class _Callback:
+    """A value read from existing application state when /metrics is scraped"""
     
-    response = requests.put(url, headers=headers, json=data)
+    def __init__(self, labels, read):
+        self.labels = labels
+        self.read = read
     
-    if response.status_code in [200, 201]:
-        print(f"[GITHUB] Successfully uploaded {filename}")
-        return True
-    else:
-        print(f"[GITHUB] Failed to upload {filename}: {response.status_code}")
-        print(f"[GITHUB] Response: {response.text[:200]}")
+    def samples(self, name):
+        value = self.read()
+        if value is not None:
+            yield name, self.labels, value
+
+class MetricsRegistry:
+    """Metric families rendered in the Prometheus text exposition format"""
+    
+    def __init__(self):
+        self._families = OrderedDict()  # name -> (type, help, {label values: metric})
+        self._lock = threading.Lock()
+    
+    def _get(self, kind, name, help_text, labels, factory):
+        key = tuple(sorted(labels.items()))
+        family = self._families.get(name)
+        metric = family[2].get(key) if family else None
+        if metric is None:
+            with self._lock:
+                family = self._families.setdefault(name, (kind, help_text, {}))
+                metric = family[2].get(key)
+                if metric is None:
+                    metric = family[2][key] = factory()
+        return metric
+    
+    def counter(self, name, help_text, **labels):
+        return self._get('counter', name, help_text, labels, lambda: Counter(labels))
+    
+    def histogram(self, name, help_text, **labels):
+        return self._get('histogram', name, help_text, labels, lambda: Histogram(labels))
+    
+    def callback(self, kind, name, help_text, read, **labels):
+        """Register a counter or gauge whose value is read from elsewhere at scrape time"""
+        return self._get(kind, name, help_text, labels, lambda: _Callback(labels, read))
+    
+    def render(self):
+        lines = []
+        with self._lock:
+            families = [(name, kind, help_text, list(metrics.values()))
+                        for name, (kind, help_text, metrics) in self._families.items()]
+        for name, kind, help_text, metrics in families:
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for metric in metrics:
+                for sample_name, labels, value in metric.samples(name):
+                    lines.append(f'{sample_name}{_format_labels(labels)} {value}')
+        return '\n'.join(lines) + '\n'
+
+metrics = MetricsRegistry()
+
+def stage_timer(stage):
+    """Latency histogram of one processing stage (quiz_stage_seconds{stage=...})"""
+    return metrics.histogram('quiz_stage_seconds', 'Time spent in each processing stage', stage=stage)
+
+def timed(stage):
+    """Decorator recording every call's duration in the stage's histogram"""
+    histogram = stage_timer(stage)
+    
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - started)
+        return wrapper
+    return decorate
+
+class SessionStore(ABC):
+    """Quiz session storage interface: quiz_session_id -> QuizSession.
+
+    Served quizzes are kept out of the Flask cookie session to avoid size limits.
+    Backends are bounded by entry count and TTL.
+    """
+    
+    def __init__(self, max_entries, ttl_seconds):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    @abstractmethod
+    def get(self, key, default=None):
+        raise NotImplementedError
+    
+    @abstractmethod
+    def set(self, key, entry):
+        raise NotImplementedError
+    
+    @abstractmethod
+    def delete(self, key):
+        raise NotImplementedError
+    
+    @abstractmethod
+    def purge_expired(self):
+        """Drop expired entries; returns how many were removed"""
+        raise NotImplementedError
+    
+    @abstractmethod
+    def __len__(self):
+        raise NotImplementedError
+    
+    def stats(self):
+        return {
+            'backend': type(self).__name__,
+            'size': len(self),
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions
+        }
+
+class MemorySessionStore(SessionStore):
+    """Per-process LRU + TTL store"""
+    
+    def __init__(self, max_entries, ttl_seconds):
+        super().__init__(max_entries, ttl_seconds)
+        self._entries = OrderedDict()  # key -> (expires_at, entry), least recently used first
+        self._lock = threading.Lock()
+    
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None or item[0] < time.monotonic():
+                if item is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return item[1]
+    
+    def set(self, key, entry):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, entry)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+    
+    def purge_expired(self):
+        now = time.monotonic()
+        with self._lock:
+            expired = [k for k, (expires_at, _) in self._entries.items() if expires_at < now]
+            for key in expired:
+                del self._entries[key]
+        return len(expired)
+    
+    def __len__(self):
+        return len(self._entries)
+
+class SQLiteSessionStore(SessionStore):
+    """Store shared by all workers on this machine: SQLite in WAL mode under RESULTS_DIR.
+
+    Expired entries are purged and the size cap enforced every CAP_CHECK_WRITES writes
+    of a worker rather than on each one, so the table can run over max_entries by that
+    many rows per worker in between.
+    """
+    
+    CAP_CHECK_WRITES = 100
+    
+    def __init__(self, path, max_entries, ttl_seconds):
+        super().__init__(max_entries, ttl_seconds)
+        self.path = path
+        self._local = threading.local()
+        self._writes = 0
+        self._lock = threading.Lock()  # Guards the counters
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        conn = self._conn()
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS quiz_sessions ('
+            ' id TEXT PRIMARY KEY, entry BLOB NOT NULL,'
+            ' expires_at REAL NOT NULL, accessed_at REAL NOT NULL)'
+        )
+        conn.execute('CREATE INDEX IF NOT EXISTS quiz_sessions_accessed ON quiz_sessions (accessed_at)')
+        conn.commit()
+    
+    def _conn(self):
+        # One connection per thread (and per process: connections must not cross a fork)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+    
+    def get(self, key, default=None):
+        now = time.time()
+        conn = self._conn()
+        row = conn.execute(
+            'SELECT entry FROM quiz_sessions WHERE id = ? AND expires_at >= ?', (key, now)
+        ).fetchone()
+        if row is None:
+            with self._lock:
+                self.misses += 1
+            return default
+        conn.execute('UPDATE quiz_sessions SET accessed_at = ? WHERE id = ?', (now, key))
+        with self._lock:
+            self.hits += 1
+        return QuizSession.from_bytes(row[0])
+    
+    def set(self, key, entry):
+        now = time.time()
+        conn = self._conn()
+        conn.execute(
+            'INSERT OR REPLACE INTO quiz_sessions (id, entry, expires_at, accessed_at) VALUES (?, ?, ?, ?)',
+            (key, entry.to_bytes(), now + self.ttl_seconds, now)
+        )
+        with self._lock:
+            self._writes += 1
+            check_cap = self._writes % self.CAP_CHECK_WRITES == 0
+        if check_cap:
+            self.purge_expired()
+            self._evict_over_cap(conn)
+    
+    def _evict_over_cap(self, conn):
+        excess = len(self) - self.max_entries
+        if excess > 0:
+            conn.execute(
+                'DELETE FROM quiz_sessions WHERE id IN '
+                '(SELECT id FROM quiz_sessions ORDER BY accessed_at LIMIT ?)', (excess,)
+            )
+            with self._lock:
+                self.evictions += excess
+    
+    def delete(self, key):
+        self._conn().execute('DELETE FROM quiz_sessions WHERE id = ?', (key,))
+    
+    def purge_expired(self):
+        return self._conn().execute('DELETE FROM quiz_sessions WHERE expires_at < ?', (time.time(),)).rowcount
+    
+    def __len__(self):
+        return self._conn().execute('SELECT COUNT(*) FROM quiz_sessions').fetchone()[0]
+
+def create_session_store():
+    if QUIZ_SESSION_BACKEND == 'sqlite':
+        return SQLiteSessionStore(os.path.join(RESULTS_DIR, 'quiz_sessions.sqlite3'),
+                                  QUIZ_SESSION_MAX, QUIZ_SESSION_TTL_SECONDS)
+    if QUIZ_SESSION_BACKEND != 'memory':
+        log.warning("Unknown QUIZ_SESSION_BACKEND '%s', using 'memory'", QUIZ_SESSION_BACKEND)
+    return MemorySessionStore(QUIZ_SESSION_MAX, QUIZ_SESSION_TTL_SECONDS)
+
+# Served quizzes (to avoid session size limits)
+# Key: quiz_session_id, Value: QuizSession
+questions_cache = create_session_store()
+
+def cleanup_old_cache():
+    """Remove expired quiz sessions"""
+    removed = questions_cache.purge_expired()
+    if removed:
+        log.debug("[CACHE] Cleaned up %s old cache entries", removed)
+
+class CachedContent:
+    """A cached GitHub file body together with its validators"""
+    __slots__ = ('content', 'etag', 'blob_sha', 'digest', 'size', 'validated_at')
+    
+    def __init__(self, content, etag, blob_sha=None):
+        self.content = content
+        self.etag = etag
+        self.blob_sha = blob_sha  # git blob SHA of the raw bytes, matched against tree listings
+        self.digest = hashlib.sha256(content.encode('utf-8')).hexdigest()
+        self.size = len(content)
+        self.validated_at = time.monotonic()
+
+class GitHubContentCache:
+    """Process-wide LRU cache of GitHub file contents keyed by (repo, path, branch)"""
+    
+    def __init__(self, max_bytes, ttl_seconds):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+    
+    def is_fresh(self, entry):
+        """True while the entry may be served without asking GitHub"""
+        return self.ttl_seconds > 0 and time.monotonic() - entry.validated_at < self.ttl_seconds
+    
+    def mark_validated(self, entry):
+        entry.validated_at = time.monotonic()
+    
+    def put(self, key, content, etag, blob_sha=None):
+        entry = CachedContent(content, etag, blob_sha)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.total_bytes -= old.size
+            if entry.size <= self.max_bytes:
+                self._entries[key] = entry
+                self.total_bytes += entry.size
+                while self.total_bytes > self.max_bytes:
+                    _, evicted = self._entries.popitem(last=False)
+                    self.total_bytes -= evicted.size
+        return entry
+    
+    def invalidate(self, repo, path):
+        """Drop every cached branch of a file (called after we write it)"""
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == repo and k[1] == path]:
+                self.total_bytes -= self._entries.pop(key).size
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+
+github_content_cache = GitHubContentCache(GITHUB_CACHE_MAX_BYTES, GITHUB_CACHE_TTL_SECONDS)
+
+class GitHubFileNotFound(Exception):
+    """The file does not exist in the private repo (a normal state for files the app creates)"""
+
+class GitHubUnavailable(Exception):
+    """GitHub could not be reached: circuit open, or retries exhausted"""
+
+class CircuitBreaker:
+    """Fails fast after repeated failed GitHub requests; lets one trial call through after a cool-down.
+
+    A request counts once, success or failure, however many retries it took.
+    """
+    
+    def __init__(self, threshold, reset_seconds):
+        self.threshold = threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+    
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            return 'half-open'
+        return 'open'
+    
+    def allow(self):
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return True
+            if state == 'half-open' and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+    
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+    
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.failures >= self.threshold or self.opened_at is not None:
+                if self.opened_at is None:
+                    log.error("[GITHUB] Circuit opened after %s consecutive failures", self.failures)
+                self.opened_at = time.monotonic()
+
+def _header_number(response, name):
+    """Numeric value of a response header; None if it is missing or malformed"""
+    value = response.headers.get(name)
+    if value is None:
+        return None
+    try:
+        number = float(value)
+    except ValueError:
+        number = None
+    if number is None or not math.isfinite(number):
+        log.warning("[GITHUB] Ignoring malformed %s header: %r", name, value[:40])
+        return None
+    return number
+
+class GitHubClient:
+    """Shared HTTP client for all GitHub calls.
+
+    One keep-alive connection pool per process, connect/read timeouts on every call,
+    bounded retries with jittered exponential backoff (honoring Retry-After and rate-limit
+    reset headers) and a circuit breaker that fails fast while GitHub is down.
+    """
+    
+    RETRY_STATUSES = (429, 500, 502, 503, 504)
+    
+    def __init__(self):
+        self.breaker = CircuitBreaker(GITHUB_BREAKER_THRESHOLD, GITHUB_BREAKER_RESET_SECONDS)
+        self.rate_limit_remaining = None
+        self.retries = 0
+        self._session = None
+        self._session_pid = None
+        self._lock = threading.Lock()
+    
+    def _get_session(self):
+        # Pooled sockets must not be shared with a forked child
+        if self._session is None or self._session_pid != os.getpid():
+            with self._lock:
+                if self._session is None or self._session_pid != os.getpid():
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=GITHUB_POOL_SIZE, pool_maxsize=GITHUB_POOL_SIZE)
+                    session.mount('https://', adapter)
+                    session.mount('http://', adapter)
+                    self._session, self._session_pid = session, os.getpid()
+        return self._session
+    
+    def _retry_delay(self, response, attempt):
+        """Seconds to wait before retrying, from Retry-After / rate-limit headers or backoff"""
+        if response is not None:
+            retry_after = response.headers.get('Retry-After')
+            if retry_after:
+                try:
+                    return max(0.0, float(retry_after))
+                except ValueError:
+                    try:
+                        return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+                    except (TypeError, ValueError):
+                        pass
+            reset = _header_number(response, 'X-RateLimit-Reset')
+            if response.headers.get('X-RateLimit-Remaining') == '0' and reset is not None:
+                return max(0.0, reset - time.time())
+        return random.uniform(0, GITHUB_BACKOFF_SECONDS * (2 ** attempt))
+    
+    def _is_retryable(self, response):
+        if response.status_code in self.RETRY_STATUSES:
+            return True
+        # Primary rate limit exhausted comes back as 403
+        return response.status_code == 403 and response.headers.get('X-RateLimit-Remaining') == '0'
+    
+    def request(self, method, url, **kwargs):
+        """Send a request; returns the final Response or raises GitHubUnavailable"""
+        with stage_timer('github_fetch' if method == 'GET' else 'github_commit').time():
+            return self._request(method, url, **kwargs)
+    
+    def _request(self, method, url, **kwargs):
+        if not self.breaker.allow():
+            raise GitHubUnavailable(f"GitHub circuit open, not calling {method} {url}")
+        try:
+            return self._send(method, url, **kwargs)
+        except GitHubUnavailable:
+            raise  # Already counted
+        except BaseException:
+            # Anything unexpected still ends the request as a failure, which also frees
+            # the half-open trial slot; otherwise the breaker would refuse every call
+            self.breaker.record_failure()
+            raise
+    
+    def _send(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', (GITHUB_CONNECT_TIMEOUT, GITHUB_READ_TIMEOUT))
+        for attempt in range(GITHUB_MAX_RETRIES + 1):
+            response = None
+            try:
+                response = self._get_session().request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+            else:
+                remaining = _header_number(response, 'X-RateLimit-Remaining')
+                if remaining is not None:
+                    self.rate_limit_remaining = int(remaining)
+                if not self._is_retryable(response):
+                    self.breaker.record_success()
+                    return response
+                error = None
+            
+            delay = self._retry_delay(response, attempt)
+            if attempt == GITHUB_MAX_RETRIES or delay > GITHUB_MAX_RETRY_WAIT_SECONDS or self.breaker.state == 'open':
+                self.breaker.record_failure()
+                if response is not None:
+                    return response  # Let the caller report the status
+                raise GitHubUnavailable(f"{method} {url} failed after {attempt + 1} attempt(s): {error}")
+            
+            self.retries += 1
+            status = response.status_code if response is not None else type(error).__name__
+            log.warning("[GITHUB] %s %s -> %s, retrying in %.2fs (attempt %s/%s)",
+                        method, url, status, delay, attempt + 1, GITHUB_MAX_RETRIES)
+            time.sleep(delay)
+
+github_client = GitHubClient()
+
+def git_blob_sha(data):
+    """SHA-1 of raw file bytes as git computes it for blobs (matches tree listings)"""
+    return hashlib.sha1(b'blob %d\0' % len(data) + data).hexdigest()
+
+def _github_headers(accept='application/vnd.github.v3+json'):
+    # Fine-grained tokens use 'Bearer', classic tokens use 'token'
+    auth_prefix = 'Bearer' if GITHUB_TOKEN.startswith('github_pat_') else 'token'
+    return {'Authorization': f'{auth_prefix} {GITHUB_TOKEN}', 'Accept': accept}
+
+github_commit_conflicts = metrics.counter('quiz_github_commit_conflicts_total',
+                                          'GitHub commits re-read and re-merged after a SHA conflict')
+
+def commit_to_github(filename, merge, message="Update file", max_attempts=None):
+    """Read-merge-write a JSON file in the private repository.
+
+    merge(current) receives the parsed file (None if it doesn't exist) and returns the new
+    data. If someone else updated the file between our GET and PUT (409/422 on the SHA),
+    the file is read again and merged again, up to max_attempts times.
+    """
+    if max_attempts is None:
+        max_attempts = GITHUB_COMMIT_ATTEMPTS
+    
+    url = f"{GITHUB_API_URL}/repos/{PRIVATE_REPO}/contents/{filename}"
+    branch = resolve_branch()
+    headers = _github_headers()
+    
+    for attempt in range(1, max_attempts + 1):
+        response = github_client.request('GET', url, headers=headers, params={'ref': branch})
+        if response.status_code == 200:
+            meta = response.json()
+            sha = meta['sha']
+            if meta.get('encoding') == 'base64':
+                current = json.loads(base64.b64decode(meta['content']).decode('utf-8'))
+            else:
+                # Files over 1 MB come back without inline content
+                github_content_cache.invalidate(PRIVATE_REPO, filename)
+                current = json.loads(fetch_from_github(filename))
+        elif response.status_code == 404:
+            sha, current = None, None
+        else:
+            log.error("[GITHUB] Failed to read %s for update: %s", filename, response.status_code)
+            return False
+        
+        data = {
+            'message': message,
+            'content': base64.b64encode(json.dumps(merge(current), indent=2).encode()).decode(),
+            'branch': branch
+        }
+        if sha:
+            data['sha'] = sha
+        
+        response = github_client.request('PUT', url, headers=headers, json=data)
+        if response.status_code in [200, 201]:
+            github_content_cache.invalidate(PRIVATE_REPO, filename)
+            log.info("[GITHUB] Committed %s (attempt %s)", filename, attempt)
+            return True
+        if response.status_code in [409, 422]:
+            github_commit_conflicts.inc()
+            log.info("[GITHUB] SHA conflict on %s (attempt %s/%s), re-merging...", filename, attempt, max_attempts)
+            continue
+        log.error("[GITHUB] Failed to commit %s: %s", filename, response.status_code)
+        log.error("[GITHUB] Response: %s", response.text[:200])
         return False
+    
+    log.error("[GITHUB] Giving up on %s after %s conflicting attempts", filename, max_attempts)
+    return False
+
+# Branch resolved once per process (GITHUB_BRANCH, else the repo's default_branch)
+_resolved_branch = None
 
-def fetch_from_github(filename, branch='main'):
+def resolve_branch():
+    """Return the branch to read from, asking GitHub for the default branch only once"""
+    global _resolved_branch
+    if GITHUB_BRANCH:
+        return GITHUB_BRANCH
+    if _resolved_branch is None:
+        try:
+            response = github_client.request('GET', f"{GITHUB_API_URL}/repos/{PRIVATE_REPO}",
+                                             headers=_github_headers())
+            if response.status_code == 200:
+                _resolved_branch = response.json().get('default_branch') or 'main'
+                log.info("[GITHUB] Using default branch '%s' of %s", _resolved_branch, PRIVATE_REPO)
+            else:
+                log.warning("[GITHUB] Could not read repo metadata (%s), assuming 'main'", response.status_code)
+                return 'main'
+        except GitHubUnavailable as e:
+            log.warning("[GITHUB] %s; assuming branch 'main'", e)
+            return 'main'
+    return _resolved_branch
+
+class RepoTree:
+    """Path -> blob SHA for one branch, from a single recursive tree listing.
+
+    Lets fetch_github_file confirm that a cached file is current without a request per
+    file: one conditional tree listing covers every file in the repository.
+    """
+    
+    def __init__(self, branch):
+        self.branch = branch
+        self.shas = {}
+        self.sizes = {}
+        self.etag = None
+        self.checked_at = None
+        self._lock = threading.Lock()
+    
+    def refresh(self):
+        """Revalidate the listing if older than GITHUB_TREE_TTL_SECONDS; False if unavailable"""
+        if self.checked_at is not None and time.monotonic() - self.checked_at < GITHUB_TREE_TTL_SECONDS:
+            return True
+        with self._lock:
+            if self.checked_at is not None and time.monotonic() - self.checked_at < GITHUB_TREE_TTL_SECONDS:
+                return True
+            headers = _github_headers()
+            if self.etag:
+                headers['If-None-Match'] = self.etag
+            try:
+                response = github_client.request(
+                    'GET', f"{GITHUB_API_URL}/repos/{PRIVATE_REPO}/git/trees/{self.branch}?recursive=1",
+                    headers=headers)
+            except GitHubUnavailable:
+                return False
+            if response.status_code == 200:
+                blobs = [item for item in response.json().get('tree', []) if item.get('type') == 'blob']
+                self.shas = {item['path']: item['sha'] for item in blobs}
+                self.sizes = {item['path']: item.get('size') for item in blobs}
+                self.etag = response.headers.get('ETag')
+            elif response.status_code != 304:
+                log.warning("[GITHUB] Tree listing for '%s' failed: %s", self.branch, response.status_code)
+                return False
+            self.checked_at = time.monotonic()
+            return True
+    
+    def sha(self, path):
+        return self.shas.get(path)
+
+repo_trees = {}
+
+def get_repo_tree(branch):
+    tree = repo_trees.get(branch)
+    if tree is None:
+        tree = repo_trees.setdefault(branch, RepoTree(branch))
+    return tree
+
+def fetch_from_github(filename, branch=None):
     """Fetch file content from private GitHub repository"""
-    print(f"[DEBUG] fetch_from_github called for: {filename} (branch: {branch})")
-    
+    return fetch_github_file(filename, branch).content
+
+def fetch_github_file(filename, branch=None):
+    """Fetch a file through the content cache, revalidating with If-None-Match.
+
+    The branch defaults to the resolved default branch. A cached copy whose blob SHA
+    matches the current tree listing is served without a per-file request.
+    Returns the CachedContent entry so callers can key derived data on its digest.
+    """
     if not GITHUB_TOKEN:
-        print("[ERROR] GITHUB_TOKEN is not set!")
+        log.error("GITHUB_TOKEN is not set!")
         raise Exception("GitHub credentials not configured: GITHUB_TOKEN missing")
     
     if not PRIVATE_REPO:
-        print("[ERROR] PRIVATE_REPO is not set!")
+        log.error("PRIVATE_REPO is not set!")
         raise Exception("GitHub credentials not configured: PRIVATE_REPO missing")
     
-    print(f"[DEBUG] GITHUB_TOKEN exists: {GITHUB_TOKEN[:10]}... (truncated)")
-    print(f"[DEBUG] PRIVATE_REPO: {PRIVATE_REPO}")
+    if branch is None:
+        branch = resolve_branch()
+    log.debug("fetch_from_github called for: %s (branch: %s)", filename, branch)
     
-    # Try with specified branch
-    url = f"https://api.github.com/repos/{PRIVATE_REPO}/contents/{filename}?ref={branch}"
-    print(f"[DEBUG] Fetching URL: {url}")
+    cache_key = (PRIVATE_REPO, filename, branch)
+    cached = github_content_cache.get(cache_key)
+    if cached is not None and github_content_cache.is_fresh(cached):
+        github_content_cache.hits += 1
+        return cached
     
-    # Fine-grained tokens use 'Bearer', classic tokens use 'token'
-    # Try Bearer first (for fine-grained tokens)
-    auth_prefix = 'Bearer' if GITHUB_TOKEN.startswith('github_pat_') else 'token'
-    print(f"[DEBUG] Using auth prefix: {auth_prefix}")
+    # One tree listing tells us whether any cached file changed
+    tree = get_repo_tree(branch)
+    if cached is not None and cached.blob_sha and tree.refresh() and tree.sha(filename) == cached.blob_sha:
+        github_content_cache.revalidations += 1
+        github_content_cache.mark_validated(cached)
+        return cached
     
-    headers = {
-        'Authorization': f'{auth_prefix} {GITHUB_TOKEN}',
-        'Accept': 'application/vnd.github.v3.raw'
-    }
-    print(f"[DEBUG] Request headers set (Authorization: {auth_prefix} {GITHUB_TOKEN[:10]}...)")
+    url = f"{GITHUB_API_URL}/repos/{PRIVATE_REPO}/contents/{filename}?ref={branch}"
+    log.debug("Fetching URL: %s", url)
     
-    print(f"[DEBUG] Making GET request...")
-    response = requests.get(url, headers=headers)
-    print(f"[DEBUG] Response status code: {response.status_code}")
+    headers = _github_headers('application/vnd.github.v3.raw')
+    # Revalidate a cached copy: GitHub answers 304 (no body, no rate-limit cost) if unchanged
+    if cached is not None and cached.etag:
+        headers['If-None-Match'] = cached.etag
     
-    if response.status_code == 200:
-        print(f"[DEBUG] Successfully fetched {filename}, size: {len(response.text)} bytes")
-        return response.text
-    elif response.status_code == 404 and branch == 'main':
-        # Try with 'master' branch
-        print(f"[DEBUG] 404 on 'main' branch, trying 'master' branch...")
-        return fetch_from_github(filename, branch='master')
+    try:
+        response = github_client.request('GET', url, headers=headers)
+    except GitHubUnavailable as e:
+        if cached is None:
+            raise
+        log.warning("[CACHE] %s; serving last known copy of %s", e, filename)
+        return cached
+    log.debug("Response status code: %s", response.status_code)
+    
+    if response.status_code == 304 and cached is not None:
+        github_content_cache.revalidations += 1
+        github_content_cache.mark_validated(cached)
+        log.debug("[CACHE] %s not modified, serving cached copy (%s bytes)", filename, cached.size)
+        return cached
+    elif response.status_code == 404:
+        log.debug("%s does not exist in %s", filename, PRIVATE_REPO)
+        raise GitHubFileNotFound(f"{filename} not found in {PRIVATE_REPO}")
+    elif response.status_code == 200:
+        github_content_cache.misses += 1
+        log.debug("Successfully fetched %s, size: %s bytes", filename, len(response.content))
+        return github_content_cache.put(cache_key, response.text, response.headers.get('ETag'),
+                                        git_blob_sha(response.content))
     else:
-        print(f"[ERROR] Failed to fetch {filename}")
-        print(f"[ERROR] Status code: {response.status_code}")
-        print(f"[ERROR] Response body: {response.text[:500]}")
+        log.error("Failed to fetch %s", filename)
+        log.error("Status code: %s", response.status_code)
+        log.error("Response body: %s", response.text[:500])
         raise Exception(f"Failed to fetch {filename}: {response.status_code}")
 
+BLOB_CHUNK_BYTES = 64 * 1024
+
+class BlobFile:
+    """A file downloaded by blob SHA into the on-disk blob cache"""
+    __slots__ = ('path', 'digest', 'size')
+    
+    def __init__(self, path, digest, size):
+        self.path = path
+        self.digest = digest  # git blob SHA; doubles as the content version
+        self.size = size
+    
+    @property
+    def blob_sha(self):
+        return self.digest
+    
+    def lines(self):
+        """Yield the file's lines without their newline, reading it a chunk at a time"""
+        with open(self.path, encoding='utf-8', errors='replace', newline='') as f:
+            for line in f:
+                yield line.rstrip('\n')
+    
+    def read(self):
+        with open(self.path, encoding='utf-8', errors='replace', newline='') as f:
+            return f.read()
+
+def _blob_cache_dir():
+    return os.path.join(RESULTS_DIR, 'blobs')
+
+def _prune_blob_cache(tree):
+    """Delete cached blobs the tree no longer references (open readers keep their copy)"""
+    current = set(tree.shas.values())
+    for name in os.listdir(_blob_cache_dir()):
+        if name not in current and not name.endswith('.tmp'):
+            try:
+                os.remove(os.path.join(_blob_cache_dir(), name))
+            except OSError:
+                pass
+
+def fetch_github_blob(filename, branch=None):
+    """Fetch a file through the Git Data API into RESULTS_DIR/blobs and return a BlobFile.
+
+    The tree listing maps the path to its blob SHA, so an unchanged file is never
+    downloaded twice (not even across restarts). New blobs are streamed to disk
+    gzip-compressed on the wire, checked against the SHA, then moved into place.
+    Unlike the contents endpoint there is no 1 MB limit and the body is never held
+    in memory.
+    """
+    if not GITHUB_TOKEN or not PRIVATE_REPO:
+        raise Exception("GitHub credentials not configured: GITHUB_TOKEN or PRIVATE_REPO missing")
+    
+    if branch is None:
+        branch = resolve_branch()
+    tree = get_repo_tree(branch)
+    if not tree.refresh() and tree.checked_at is None:
+        raise GitHubUnavailable(f"Cannot list the tree of '{branch}' to locate {filename}")
+    sha = tree.sha(filename)
+    if sha is None:
+        raise Exception(f"Failed to fetch {filename}: not in the tree of '{branch}'")
+    
+    path = os.path.join(_blob_cache_dir(), sha)
+    if os.path.exists(path):
+        return BlobFile(path, sha, os.path.getsize(path))
+    
+    os.makedirs(_blob_cache_dir(), exist_ok=True)
+    url = f"{GITHUB_API_URL}/repos/{PRIVATE_REPO}/git/blobs/{sha}"
+    headers = _github_headers('application/vnd.github.v3.raw')
+    headers['Accept-Encoding'] = 'gzip'
+    log.info("[GITHUB] Downloading %s as blob %s", filename, sha[:12])
+    
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    response = github_client.request('GET', url, headers=headers, stream=True)
+    try:
+        if response.status_code != 200:
+            raise Exception(f"Failed to fetch blob for {filename}: {response.status_code}")
+        expected_size = tree.sizes.get(filename)
+        size = 0
+        digest = hashlib.sha1(b'blob %d\0' % expected_size) if expected_size is not None else None
+        with open(tmp_path, 'wb') as f:
+            # iter_content undoes the gzip transfer encoding chunk by chunk
+            for chunk in response.iter_content(BLOB_CHUNK_BYTES):
+                if digest is not None:
+                    digest.update(chunk)
+                f.write(chunk)
+                size += len(chunk)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    finally:
+        response.close()
+    
+    if digest is not None and (size != expected_size or digest.hexdigest() != sha):
+        os.remove(tmp_path)
+        raise Exception(f"Blob for {filename} does not match {sha} ({size} bytes received)")
+    os.replace(tmp_path, path)
+    log.info("[GITHUB] Stored %s (%s bytes) in the blob cache", filename, size)
+    _prune_blob_cache(tree)
+    return BlobFile(path, sha, size)
+
 def verify_github_access():
     """Verify GitHub API access and list repo contents"""
-    print("[VERIFY] Testing GitHub API access...")
+    global _resolved_branch
+    log.info("[VERIFY] Testing GitHub API access...")
     
     # Test 1: Check if we can access the repo at all
-    repo_url = f"https://api.github.com/repos/{PRIVATE_REPO}"
+    repo_url = f"{GITHUB_API_URL}/repos/{PRIVATE_REPO}"
     headers = {
         'Authorization': f'Bearer {GITHUB_TOKEN}' if GITHUB_TOKEN.startswith('github_pat_') else f'token {GITHUB_TOKEN}',
         'Accept': 'application/vnd.github.v3+json'
     }
     
-    print(f"[VERIFY] Checking repo access: {repo_url}")
-    response = requests.get(repo_url, headers=headers)
-    print(f"[VERIFY] Repo access status: {response.status_code}")
+    log.info("[VERIFY] Checking repo access: %s", repo_url)
+    response = github_client.request('GET', repo_url, headers=headers)
+    log.info("[VERIFY] Repo access status: %s", response.status_code)
     
     if response.status_code == 200:
         repo_data = response.json()
-        print(f"[VERIFY] ✓ Repo found: {repo_data.get('name')}")
-        print(f"[VERIFY] ✓ Default branch: {repo_data.get('default_branch')}")
-        print(f"[VERIFY] ✓ Private: {repo_data.get('private')}")
+        log.info("[VERIFY] ✓ Repo found: %s", repo_data.get('name'))
+        log.info("[VERIFY] ✓ Default branch: %s", repo_data.get('default_branch'))
+        if repo_data.get('default_branch') and not GITHUB_BRANCH:
+            _resolved_branch = repo_data['default_branch']
+        log.info("[VERIFY] ✓ Private: %s", repo_data.get('private'))
     else:
-        print(f"[VERIFY] ✗ Cannot access repo: {response.text[:200]}")
+        log.error("[VERIFY] ✗ Cannot access repo: %s", response.text[:200])
         return False
     
     # Test 2: List root contents
-    contents_url = f"https://api.github.com/repos/{PRIVATE_REPO}/contents"
-    print(f"[VERIFY] Listing repo contents: {contents_url}")
-    response = requests.get(contents_url, headers=headers)
-    print(f"[VERIFY] Contents list status: {response.status_code}")
+    contents_url = f"{GITHUB_API_URL}/repos/{PRIVATE_REPO}/contents"
+    log.info("[VERIFY] Listing repo contents: %s", contents_url)
+    response = github_client.request('GET', contents_url, headers=headers)
+    log.info("[VERIFY] Contents list status: %s", response.status_code)
     
     if response.status_code == 200:
         contents = response.json()
-        print(f"[VERIFY] ✓ Found {len(contents)} items in repo root:")
+        log.info("[VERIFY] ✓ Found %s items in repo root:", len(contents))
         for item in contents:
-            print(f"[VERIFY]   - {item.get('name')} ({item.get('type')})")
+            log.debug("[VERIFY]   - %s (%s)", item.get('name'), item.get('type'))
     else:
-        print(f"[VERIFY] ✗ Cannot list contents: {response.text[:200]}")
+        log.error("[VERIFY] ✗ Cannot list contents: %s", response.text[:200])
     
     return True
 
-def load_users():
-    """Load users from private repository"""
-    try:
-        print(f"Attempting to fetch users.json from {PRIVATE_REPO}")
-        
-        # First time? Run verification
-        if not hasattr(load_users, '_verified'):
-            verify_github_access()
-            load_users._verified = True
-        
-        users_json = fetch_from_github('users.json')
-        print(f"Successfully fetched users.json, content length: {len(users_json)}")
-        parsed = json.loads(users_json)
-        print(f"Parsed {len(parsed.get('users', []))} users")
-        return parsed
-    except Exception as e:
-        print(f"Error loading users: {e}")
-        import traceback
-        traceback.print_exc()
-        return {"users": []}
+class UserDirectory:
+    """Users from users.json keyed by username, rebuilt only when the file changes"""
+    
+    def __init__(self, refresh_seconds):
+        self.refresh_seconds = refresh_seconds
+        self._users = {}
+        self._digest = None
+        self._checked_at = None
+        self._access_verified = False
+        self._lock = threading.Lock()
+    
+    def refresh(self, force=False):
+        now = time.monotonic()
+        if not force and self._checked_at is not None and now - self._checked_at < self.refresh_seconds:
+            return
+        with self._lock:
+            if not force and self._checked_at is not None and now - self._checked_at < self.refresh_seconds:
+                return
+            try:
+                # First time? Run verification
+                if not self._access_verified:
+                    verify_github_access()
+                    self._access_verified = True
+                
+                entry = fetch_github_file('users.json')
+                if entry.digest != self._digest:
+                    users = json.loads(entry.content).get('users', [])
+                    self._users = {u['username']: u for u in users if 'username' in u}
+                    self._digest = entry.digest
+                    log.info("[USERS] Indexed %s users (version %s)", len(self._users), entry.digest[:12])
+            except Exception as e:
+                # Keep serving the last good directory
+                log.error("[USERS] Error refreshing users: %s", e)
+            self._checked_at = time.monotonic()
+    
+    def get(self, username):
+        self.refresh()
+        return self._users.get(username)
+    
+    def __len__(self):
+        return len(self._users)
 
-def load_completed_sections():
-    """Load completed sections data from GitHub"""
-    try:
-        content = fetch_from_github('completed_sections.json')
-        return json.loads(content)
-    except Exception as e:
-        print(f"[SECTIONS] No existing completed sections file or error: {e}")
-        return {}
+user_directory = UserDirectory(USERS_REFRESH_SECONDS)
 
-def mark_section_completed(username, database_key, section_name):
-    """Mark a section as completed for a user"""
-    completed = load_completed_sections()
-    
-    if username not in completed:
-        completed[username] = {}
-    
-    if database_key not in completed[username]:
-        completed[username][database_key] = []
-    
-    if section_name not in completed[username][database_key]:
-        completed[username][database_key].append(section_name)
-        content = json.dumps(completed, indent=2)
-        upload_to_github('completed_sections.json', content, f"Mark {section_name} completed for {username}")
-        print(f"[SECTIONS] Marked section '{section_name}' in '{database_key}' as completed for '{username}'")
+def check_password(user, password):
+    """Constant-time comparison of a provided password with the stored one"""
+    stored = (user or {}).get('password', '')
+    matches = hmac.compare_digest(str(stored).encode('utf-8'), str(password or '').encode('utf-8'))
+    return user is not None and matches
+
+def _merge_completed_section(completed, op):
+    """Write-behind merge: add one completed section to completed_sections.json data"""
+    completed = completed or {}
+    sections = completed.setdefault(op['username'], {}).setdefault(op['database'], [])
+    if op['section'] not in sections:
+        sections.append(op['section'])
+    return completed
+
+class CompletionIndex:
+    """In-memory index of completed sections: username -> database_key -> set of sections.
+
+    Built from completed_sections.json, the write-behind journal and submissions still in
+    the submission queue, revalidated at most every COMPLETIONS_REFRESH_SECONDS, and
+    updated in place when this worker marks a completion, so page renders answer from
+    memory.
+    """
+    
+    def __init__(self, refresh_seconds):
+        self.refresh_seconds = refresh_seconds
+        self._remote = {}
+        self._remote_digest = None
+        self._index = {}
+        self._checked_at = None
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def _to_sets(completed):
+        return {user: {db: set(sections) for db, sections in dbs.items()}
+                for user, dbs in (completed or {}).items()}
+    
+    def refresh(self, force=False):
+        now = time.monotonic()
+        if not force and self._checked_at is not None and now - self._checked_at < self.refresh_seconds:
+            return
+        with self._lock:
+            if not force and self._checked_at is not None and now - self._checked_at < self.refresh_seconds:
+                return
+            try:
+                entry = fetch_github_file('completed_sections.json')
+                if entry.digest != self._remote_digest:
+                    self._remote = self._to_sets(json.loads(entry.content))
+                    self._remote_digest = entry.digest
+            except GitHubFileNotFound:
+                # Nobody has completed a section yet; the first completion creates the file
+                if self._remote_digest != '':
+                    log.info("[SECTIONS] completed_sections.json does not exist yet; starting empty")
+                self._remote, self._remote_digest = {}, ''
+            except Exception as e:
+                log.warning("[SECTIONS] Error reading completed sections: %s", e)
+            
+            index = {user: {db: set(sections) for db, sections in dbs.items()}
+                     for user, dbs in self._remote.items()}
+            # Queue before journal: a submission drained in between shows up in the journal
+            try:
+                ops = submission_queue.pending_completions()
+            except sqlite3.Error as e:
+                # Keep everything known so far rather than let a spent credential back in
+                log.warning("[SECTIONS] Could not read queued completions: %s", e)
+                ops = [_complete_section_op(user, db, section) for user, dbs in self._index.items()
+                       for db, sections in dbs.items() for section in sections]
+            ops.extend(github_write_behind.pending('completed_sections.json'))
+            for op in ops:
+                index.setdefault(op['username'], {}).setdefault(op['database'], set()).add(op['section'])
+            self._index = index
+            self._checked_at = time.monotonic()
+    
+    def for_user(self, username):
+        """database_key -> set of completed sections for one user"""
+        self.refresh()
+        return self._index.get(username, {})
+    
+    def is_completed(self, username, database_key, section_name):
+        return section_name in self.for_user(username).get(database_key, ())
+    
+    def add(self, username, database_key, section_name):
+        with self._lock:
+            self._index.setdefault(username, {}).setdefault(database_key, set()).add(section_name)
+
+completion_index = CompletionIndex(COMPLETIONS_REFRESH_SECONDS)
+
+def _complete_section_op(username, database_key, section_name):
+    return {'op': 'complete_section', 'username': username, 'database': database_key, 'section': section_name}
+
+@timed('mark_section_completed')
+def mark_sections_completed(ops):
+    """Store a batch of completed sections (_complete_section_op dicts) from drained submissions"""
+    storage.add_completions(ops)
 
 def is_section_completed(username, database_key, section_name):
     """Check if section has been completed by user"""
-    completed = load_completed_sections()
-    return section_name in completed.get(username, {}).get(database_key, [])
+    return storage.is_section_completed(username, database_key, section_name)
 
 def get_available_databases():
     """Get list of available quiz databases with numeric IDs and hardcoded filenames"""
@@ -318,485 +1397,1209 @@ def get_database_config(database_key):
     # Determine num_questions with fallback logic
     if db_config.get('num_questions') is not None:
         num_questions = int(db_config['num_questions'])
-        print(f"[CONFIG] Using database-specific num_questions for {database_key}: {num_questions}")
+        log.debug("[CONFIG] Using database-specific num_questions for %s: %s", database_key, num_questions)
     else:
         num_questions = QUIZ_NUM_QUESTIONS
-        print(f"[CONFIG] Using global QUIZ_NUM_QUESTIONS for {database_key}: {num_questions}")
+        log.debug("[CONFIG] Using global QUIZ_NUM_QUESTIONS for %s: %s", database_key, num_questions)
     
     # Determine time_minutes with fallback logic
     if db_config.get('time_minutes') is not None:
         time_minutes = int(db_config['time_minutes'])
-        print(f"[CONFIG] Using database-specific time_minutes for {database_key}: {time_minutes}")
+        log.debug("[CONFIG] Using database-specific time_minutes for %s: %s", database_key, time_minutes)
     else:
         time_minutes = QUIZ_TIME_MINUTES
-        print(f"[CONFIG] Using global QUIZ_TIME_MINUTES for {database_key}: {time_minutes}")
+        log.debug("[CONFIG] Using global QUIZ_TIME_MINUTES for %s: %s", database_key, time_minutes)
     
     return {
         'num_questions': num_questions,
         'time_minutes': time_minutes
     }
 
-def load_database(database_key='db1'):
-    """Load question database from private repository with hardcoded filenames"""
+def _resolve_database(database_key):
+    """Return (database_key, db_info), falling back to 'db1' for unknown keys"""
+    databases = get_available_databases()
+    if database_key not in databases:
+        log.warning("Unknown database_key '%s', falling back to 'db1'", database_key)
+        database_key = 'db1'  # Default fallback
+    return database_key, databases[database_key]
+
+class CompiledBank:
+    """A parsed question bank, built once per database content version"""
+    
+    def __init__(self, database_key, version, sections, records):
+        self.database_key = database_key
+        self.version = version  # git blob SHA of the database file
+        self.records = records  # list of QuestionRecord, or SnapshotRecords backed by an mmap
+        self.sections = sections  # question_indices point into self.records
+        self.section_by_name = {s['name']: s for s in sections}
+    
+    @classmethod
+    @timed('parse_database')
+    def from_lines(cls, database_key, version, lines):
+        """Compile a bank in one pass over an iterator of lines"""
+        parser = BankParser()
+        for line in lines:
+            parser.feed(line)
+        parser.close()
+        for line_no, message in parser.errors:
+            log.warning("[PARSE_ERROR] %s line %s: %s", database_key, line_no, message)
+        return cls(database_key, version, parser.sections, parser.records)
+    
+    @classmethod
+    def from_text(cls, database_key, version, content):
+        return cls.from_lines(database_key, version, content.split('\n'))
+    
+    @classmethod
+    def from_snapshot(cls, database_key, snapshot):
+        return cls(database_key, snapshot.blob_sha, snapshot.sections(), snapshot.records)
+    
+    def section_name(self, record):
+        return self.sections[record.section_index]['name']
+
+# Binary snapshot layout (little-endian). All strings live in one deduplicated table;
+# records refer to them by index, so every record has a fixed width:
+#   header | sections | questions | options | answers (u16 option positions)
+#   | string offsets (u32, count + 1) | UTF-8 string data
+SNAPSHOT_MAGIC = b'QBANK\0'
+SNAPSHOT_FORMAT = 1
+_SNAP_HEADER = struct.Struct('<6sH20s5I')  # magic, format, blob SHA, sections, questions, options, answers, strings
+_SNAP_SECTION = struct.Struct('<3I')       # name, first question, question count
+_SNAP_QUESTION = struct.Struct('<5I2HBx')  # number, stem, first option, first answer, section, options, answers, flags
+_SNAP_OPTION = struct.Struct('<2IB3x')     # num, text, special
+_SNAP_ANSWER = struct.Struct('<H')
+_SNAP_STRING = struct.Struct('<2I')        # start, end in the string data
+
+def write_bank_snapshot(path, bank, blob_sha):
+    """Write a compiled bank as a binary snapshot (atomically, so mapped readers are unaffected)"""
+    strings = {}
+    
+    def intern(text):
+        index = strings.get(text)
+        if index is None:
+            index = strings[text] = len(strings)
+        return index
+    
+    section_blob = bytearray()
+    for section in bank.sections:
+        indices = section['question_indices']
+        first = indices[0] if indices else 0
+        if list(indices) != list(range(first, first + len(indices))):
+            raise ValueError(f"Section '{section['name']}' questions are not contiguous")
+        section_blob += _SNAP_SECTION.pack(intern(section['name']), first, len(indices))
+    
+    question_blob, option_blob, answer_blob = bytearray(), bytearray(), bytearray()
+    option_count = answer_count = 0
+    for record in bank.records:
+        question_blob += _SNAP_QUESTION.pack(
+            intern(record.number), intern(record.stem), option_count, answer_count,
+            record.section_index, len(record.option_texts), len(record.answer_indices),
+            1 if record.has_references else 0)
+        special = set(record.special_positions)
+        for i, (num, text) in enumerate(zip(record.option_nums, record.option_texts)):
+            option_blob += _SNAP_OPTION.pack(intern(num), intern(text), 1 if i in special else 0)
+        for i in record.answer_indices:
+            answer_blob += _SNAP_ANSWER.pack(i)
+        option_count += len(record.option_texts)
+        answer_count += len(record.answer_indices)
+    
+    offsets, data = bytearray(), bytearray()
+    for text in strings:  # dicts keep insertion order, i.e. index order
+        start = len(data)
+        data += text.encode('utf-8')
+        offsets += _SNAP_STRING.pack(start, len(data))
+    
+    header = _SNAP_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_FORMAT, bytes.fromhex(blob_sha), len(bank.sections),
+                               len(bank.records), option_count, answer_count, len(strings))
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        for part in (header, section_blob, question_blob, option_blob, answer_blob, offsets, data):
+            f.write(part)
+    os.replace(tmp_path, path)
+
+class BankSnapshot:
+    """A memory-mapped snapshot file; all workers mapping it share the same page cache pages"""
+    
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.stat = os.fstat(f.fileno())
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, fmt, blob_sha, self.section_count, self.question_count, self.option_count,
+         self.answer_count, self.string_count) = _SNAP_HEADER.unpack_from(self.mm)
+        if magic != SNAPSHOT_MAGIC or fmt != SNAPSHOT_FORMAT:
+            raise ValueError(f"{path} is not a format {SNAPSHOT_FORMAT} bank snapshot")
+        self.blob_sha = blob_sha.hex()
+        self.sections_at = _SNAP_HEADER.size
+        self.questions_at = self.sections_at + self.section_count * _SNAP_SECTION.size
+        self.options_at = self.questions_at + self.question_count * _SNAP_QUESTION.size
+        self.answers_at = self.options_at + self.option_count * _SNAP_OPTION.size
+        self.offsets_at = self.answers_at + self.answer_count * _SNAP_ANSWER.size
+        self.data_at = self.offsets_at + self.string_count * _SNAP_STRING.size
+        if self.data_at > len(self.mm):
+            raise ValueError(f"{path} is truncated")
+        self.records = SnapshotRecords(self)
+    
+    def string(self, index):
+        start, end = _SNAP_STRING.unpack_from(self.mm, self.offsets_at + index * _SNAP_STRING.size)
+        return self.mm[self.data_at + start:self.data_at + end].decode('utf-8')
+    
+    def sections(self):
+        sections = []
+        for i in range(self.section_count):
+            name, first, count = _SNAP_SECTION.unpack_from(self.mm, self.sections_at + i * _SNAP_SECTION.size)
+            sections.append({'name': self.string(name), 'count': count,
+                             'question_indices': range(first, first + count)})
+        return sections
+    
+    def record(self, bank_id):
+        """Decode one QuestionRecord from the mapped file"""
+        (number, stem, first_option, first_answer, section_index,
+         option_count, answer_count, flags) = _SNAP_QUESTION.unpack_from(
+            self.mm, self.questions_at + bank_id * _SNAP_QUESTION.size)
+        nums, texts, special_flags = [], [], []
+        for i in range(first_option, first_option + option_count):
+            num, text, special = _SNAP_OPTION.unpack_from(self.mm, self.options_at + i * _SNAP_OPTION.size)
+            nums.append(self.string(num))
+            texts.append(self.string(text))
+            special_flags.append(special)
+        answers = tuple(_SNAP_ANSWER.unpack_from(self.mm, self.answers_at + i * _SNAP_ANSWER.size)[0]
+                        for i in range(first_answer, first_answer + answer_count))
+        return QuestionRecord(bank_id, self.string(number), self.string(stem), tuple(nums), tuple(texts),
+                              answers, bool(flags & 1), special_flags, section_index)
+
+class SnapshotRecords(Sequence):
+    """bank.records for a snapshot: records are decoded from the mmap when accessed"""
+    
+    def __init__(self, snapshot):
+        self._snapshot = snapshot
+    
+    def __len__(self):
+        return self._snapshot.question_count
+    
+    def __getitem__(self, bank_id):
+        if isinstance(bank_id, slice):
+            return [self[i] for i in range(*bank_id.indices(len(self)))]
+        if bank_id < 0:
+            bank_id += len(self)
+        if not 0 <= bank_id < len(self):
+            raise IndexError(bank_id)
+        return self._snapshot.record(bank_id)
+
+# Open snapshots by path; reopened when the file is replaced
+_bank_snapshots = {}
+
+def snapshot_path(filename):
+    return os.path.join(BANK_SNAPSHOT_DIR, os.path.splitext(filename)[0] + '.qbank')
+
+def load_bank_snapshot(filename):
+    """Return the BankSnapshot for a bank file, or None if there is no usable snapshot"""
+    path = snapshot_path(filename)
     try:
-        databases = get_available_databases()
-        if database_key not in databases:
-            print(f"[WARNING] Unknown database_key '{database_key}', falling back to 'db1'")
-            database_key = 'db1'  # Default fallback
-        
-        db_info = databases[database_key]
-        filename = db_info['file']
-        db_index = db_info['index']
-        
-        print(f"[DATABASE] Loading database #{db_index}: '{database_key}' from file: {filename}")
-        content = fetch_from_github(filename)
-        print(f"[DATABASE] Loaded {len(content)} bytes from {filename}")
-        print(f"[DATABASE] Database index: {db_index}, Key: {database_key}, Name: {db_info['name']}")
-        return content
+        stat = os.stat(path)
+    except OSError:
+        return None
+    snapshot = _bank_snapshots.get(path)
+    if snapshot is not None and (snapshot.stat.st_ino, snapshot.stat.st_mtime_ns) == (stat.st_ino, stat.st_mtime_ns):
+        return snapshot
+    try:
+        snapshot = BankSnapshot(path)
+    except (OSError, ValueError, struct.error) as e:
+        log.warning("[DATABASE] Ignoring snapshot %s: %s", path, e)
+        return None
+    _bank_snapshots[path] = snapshot
+    return snapshot
+
+# Compiled banks keyed by database_key; rebuilt only when the file's digest changes
+compiled_banks = {}
+_compile_locks = {}  # database_key -> lock held only while that database compiles
+_compile_locks_guard = threading.Lock()
+
+# Recently replaced banks by version, so quizzes started before an edit can still be served
+retired_banks = OrderedDict()
+RETIRED_BANKS_MAX = 12
+_retired_banks_lock = threading.Lock()
+
+def _compile_lock(database_key):
+    with _compile_locks_guard:
+        return _compile_locks.setdefault(database_key, threading.Lock())
+
+def get_bank_version(database_key, version):
+    """Return the compiled bank with an exact version, or None if it is no longer available"""
+    bank = compiled_banks.get(database_key)
+    if bank is not None and bank.version == version:
+        return bank
+    bank = retired_banks.get(version)
+    if bank is not None:
+        return bank
+    # Not compiled in this worker yet (e.g. the session was created by another worker)
+    bank = get_compiled_bank(database_key)
+    if bank is not None and bank.version == version:
+        return bank
+    return None
+
+def get_compiled_bank(database_key='db1'):
+    """Return the CompiledBank for a database, re-parsing only if the file changed.
+
+    Returns None if the database cannot be loaded and nothing was compiled before.
+    """
+    database_key, db_info = _resolve_database(database_key)
+    current = compiled_banks.get(database_key)
+    
+    # A precompiled snapshot of the current blob skips both the download and the parse
+    snapshot = load_bank_snapshot(db_info['file'])
+    if snapshot is not None and GITHUB_TOKEN and PRIVATE_REPO:
+        tree = get_repo_tree(resolve_branch())
+        if tree.refresh() and tree.sha(db_info['file']) == snapshot.blob_sha:
+            if current is not None and current.version == snapshot.blob_sha:
+                return current
+            with _compile_lock(database_key):
+                current = compiled_banks.get(database_key)
+                if current is not None and current.version == snapshot.blob_sha:
+                    return current
+                bank = CompiledBank.from_snapshot(database_key, snapshot)
+                _install_bank(database_key, bank, current)
+                log.info("[DATABASE] Mapped snapshot for '%s' (%s): %s sections, %s questions, version %s",
+                         database_key, db_info['file'], len(bank.sections), len(bank.records), bank.version[:12])
+                return bank
+    
+    try:
+        if GITHUB_FETCH_MODE == 'blobs':
+            entry = fetch_github_blob(db_info['file'])
+        else:
+            entry = fetch_github_file(db_info['file'])
     except Exception as e:
-        print(f"[ERROR] Error loading database '{database_key}': {e}")
-        return ""
-
-def parse_database(content):
-    """Parse database file to extract sections and questions with fallback logic"""
-    # Try primary parsing method (line-by-line)
-    sections, questions = _parse_database_line_by_line(content)
-    
-    # Safeguard: If no questions found, try alternative parsing method
-    if not questions or len(questions) == 0:
-        print("[WARNING] Primary parser found 0 questions. Trying fallback parser...")
-        sections, questions = _parse_database_fallback(content)
-        if questions:
-            print(f"[SUCCESS] Fallback parser found {len(questions)} questions")
-    
-    return sections, questions
-
-def _parse_database_line_by_line(content):
-    """Primary parsing method: line-by-line"""
-    lines = content.split('\n')
-    sections = []
-    questions = []
-    
-    current_section = {'name': '', 'count': 0, 'question_indices': []}
-    current_question = ''
-    in_question = False
-    
-    for line in lines:
-        line_stripped = line.strip()
+        log.error("Error loading database '%s': %s", database_key, e)
+        if current is not None:
+            log.warning("[DATABASE] Serving previously compiled '%s' (version %s)", database_key, current.version[:12])
+        return current
+    
+    version = entry.blob_sha or entry.digest
+    if current is not None and current.version == version:
+        return current
+    
+    # Parse under this database's lock so a burst of quiz starts compiles a changed file
+    # once, while quizzes on other databases carry on
+    with _compile_lock(database_key):
+        current = compiled_banks.get(database_key)
+        if current is not None and current.version == version:
+            return current
         
-        # Check for section header
-        if line_stripped.startswith('SECTION:'):
-            if current_section['name']:
-                sections.append(current_section)
-            section_name = line_stripped[8:].strip()
-            current_section = {'name': section_name, 'count': 0, 'question_indices': []}
-            continue
+        if isinstance(entry, BlobFile):
+            # Stream from disk; only the question being read is held as text
+            bank = CompiledBank.from_lines(database_key, version, entry.lines())
+        else:
+            bank = CompiledBank.from_text(database_key, version, entry.content)
+        _install_bank(database_key, bank, current)
+        log.info("[DATABASE] Compiled '%s' (%s): %s sections, %s questions usable, version %s",
+                 database_key, db_info['file'], len(bank.sections), len(bank.records), version[:12])
+        return bank
+
+def _install_bank(database_key, bank, current):
+    """Make bank the live version, keeping the one it replaces for in-flight quizzes"""
+    if current is not None:
+        with _retired_banks_lock:
+            retired_banks[current.version] = current
+            while len(retired_banks) > RETIRED_BANKS_MAX:
+                retired_banks.popitem(last=False)
+    compiled_banks[database_key] = bank
+
+# Option patterns that make shuffling unsafe ("Both 1 and 2", "All of the above", ...)
+_REFERENCE_RE = re.compile('|'.join([
+    r'both.*\d+.*\d+',
+    r'both.*and',
+    r'option.*and.*option',
+    r'\d+.*and.*\d+',
+    r'all of the above',
+    r'none of the above',
+    r'all the above',
+    r'none the above'
+]))
+_SPECIAL_OPTION_KEYWORDS = ('all of the above', 'none of the above', 'all the above', 'none the above')
+_QUESTION_LINE_RE = re.compile(r'QUESTION (\d+)\.\s*(.*)')
+_OPTION_LINE_RE = re.compile(r'(\d+)\.\s*(.*)')
+
+class QuestionRecord:
+    """Immutable, pre-parsed question; quizzes only sample these and permute options"""
+    __slots__ = ('bank_id', 'number', 'stem', 'option_nums', 'option_texts',
+                 'answer_indices', 'has_references', 'regular_positions',
+                 'special_positions', 'section_index')
+    
+    def __init__(self, bank_id, number, stem, option_nums, option_texts,
+                 answer_indices, has_references, special_flags, section_index):
+        self.bank_id = bank_id
+        self.number = number
+        self.stem = stem
+        self.option_nums = option_nums
+        self.option_texts = option_texts
+        self.answer_indices = answer_indices
+        self.has_references = has_references
+        self.regular_positions = tuple(i for i, special in enumerate(special_flags) if not special)
+        self.special_positions = tuple(i for i, special in enumerate(special_flags) if special)
+        self.section_index = section_index
+    
+    @property
+    def is_multiple(self):
+        return len(self.answer_indices) > 1
+
+class BankParser:
+    """Single-pass parser for question bank files.
+
+    Feed it lines one at a time (from a string, a file or a download stream). Stems,
+    options and answers are parsed as the lines arrive and each finished question is
+    compiled straight into a QuestionRecord, so only the question being read is held.
+    Skipped entries are collected in errors as (line number, message).
+    """
+    
+    def __init__(self):
+        self.sections = []
+        self.records = []
+        self.errors = []
+        self.line_no = 0
+        self._section = None
+        self._active = False
+    
+    def feed(self, line):
+        self.line_no += 1
+        stripped = line.strip()
         
-        # Check for question start
-        if line_stripped.startswith('QUESTION '):
-            if in_question and current_question:
-                questions.append(current_question.strip())
-                current_section['count'] += 1
-                current_section['question_indices'].append(len(questions) - 1)
-            current_question = line
-            in_question = True
-        elif in_question:
-            current_question += '\n' + line
-            if line_stripped.startswith('ANSWER:'):
-                questions.append(current_question.strip())
-                current_section['count'] += 1
-                current_section['question_indices'].append(len(questions) - 1)
-                current_question = ''
-                in_question = False
-    
-    if current_section['name']:
-        sections.append(current_section)
-    
-    return sections, questions
-
-def _parse_database_fallback(content):
-    """Fallback parsing method: split by QUESTION markers"""
-    sections = []
-    questions = []
-    
-    # Split content into section blocks
-    section_blocks = re.split(r'\nSECTION:\s*', content)
-    
-    for block in section_blocks:
-        if not block.strip():
-            continue
+        if stripped.startswith('SECTION:'):
+            name = stripped[8:].strip()
+            if name:
+                self._section = {'name': name, 'count': 0, 'question_indices': []}
+                self.sections.append(self._section)
+            else:
+                self._section = None
+                self.errors.append((self.line_no, "SECTION header without a name; its questions are skipped"))
+            return
         
-        # First line is section name
-        lines = block.split('\n')
-        section_name = lines[0].strip()
+        if stripped.startswith('QUESTION '):
+            if self._active:
+                self._finish()
+            self._start(stripped)
+            return
         
-        if not section_name:
-            continue
+        if not self._active:
+            return
+        if stripped.startswith('OPTIONS:'):
+            self._in_options = True
+        elif stripped.startswith('ANSWER:'):
+            self._answer = stripped[7:].strip()
+            self._finish()
+        elif self._in_options:
+            if stripped:
+                match = _OPTION_LINE_RE.match(stripped)
+                if match:
+                    self._nums.append(match.group(1))
+                    self._texts.append(match.group(2).strip())
+        elif self._stem:
+            # Continue question text - preserve newlines for diagram tags
+            self._stem.append(stripped)
+    
+    def close(self):
+        """Finish the input; a question still open at the end has no ANSWER and is dropped"""
+        if self._active:
+            self.errors.append((self._first_line, f"QUESTION {self._num or '?'} skipped: no ANSWER line before end of file"))
+            self._active = False
+    
+    def _start(self, stripped):
+        match = _QUESTION_LINE_RE.match(stripped)
+        self._active = True
+        self._first_line = self.line_no
+        self._num = match.group(1) if match else ''
+        self._stem = [match.group(2)] if match and match.group(2) else None
+        self._nums = []
+        self._texts = []
+        self._answer = ''
+        self._in_options = False
+    
+    def _finish(self):
+        self._active = False
+        label = f"QUESTION {self._num or '?'}"
+        if self._section is None:
+            self.errors.append((self._first_line, f"{label} skipped: not inside a named SECTION"))
+            return
         
-        current_section = {'name': section_name, 'count': 0, 'question_indices': []}
+        # Resolve answer numbers to option positions (first option with that number wins)
+        nums, texts = self._nums, self._texts
+        answer_indices = [nums.index(num) for num in self._answer.split() if num in nums]
+        stem = '\n'.join(self._stem).strip() if self._stem else ''
         
-        # Split by QUESTION markers (but keep the QUESTION keyword)
-        question_blocks = re.split(r'(\nQUESTION\s+\d+\.)', block)
+        if not stem:
+            problem = "no question text"
+        elif not texts:
+            problem = "no options"
+        elif not self._answer:
+            problem = "no ANSWER line"
+        elif not answer_indices:
+            problem = f"ANSWER '{self._answer}' matches no option"
+        else:
+            problem = None
+        if problem:
+            self.errors.append((self._first_line, f"{label} skipped: {problem}"))
+            return
         
-        # Reconstruct questions (pairs of marker + content)
-        for i in range(1, len(question_blocks), 2):
-            if i + 1 < len(question_blocks):
-                question_text = (question_blocks[i].strip() + '\n' + question_blocks[i + 1]).strip()
-                
-                # Validate it has required components
-                if 'OPTIONS:' in question_text and 'ANSWER:' in question_text:
-                    questions.append(question_text)
-                    current_section['count'] += 1
-                    current_section['question_indices'].append(len(questions) - 1)
+        lowered = [text.lower() for text in texts]
+        has_references = any(_REFERENCE_RE.search(text) for text in lowered)
+        special_flags = [any(keyword in text for keyword in _SPECIAL_OPTION_KEYWORDS) for text in lowered]
         
-        if current_section['count'] > 0:
-            sections.append(current_section)
-    
-    return sections, questions
+        section = self._section
+        record = QuestionRecord(len(self.records), self._num, stem, tuple(nums), tuple(texts),
+                                tuple(answer_indices), has_references, special_flags,
+                                len(self.sections) - 1)
+        section['question_indices'].append(record.bank_id)
+        section['count'] += 1
+        self.records.append(record)
+
+def draw_option_order(record):
+    """Random display order of a record's options (as option positions).
+
+    Options that reference each other are kept in order; otherwise regular options are
+    shuffled and special options ("All of the above", ...) stay at the end.
+    """
+    if record.has_references:
+        return list(range(len(record.option_texts)))
+    order = list(record.regular_positions)
+    random.shuffle(order)
+    order.extend(record.special_positions)
+    return order
 
-def parse_question(question_text):
-    """Parse individual question to extract components with detailed logging"""
-    lines = question_text.split('\n')
-    question_num = ''
-    question = ''
-    options = []
-    answer = ''
+def build_quiz_question(record, quiz_question_id, section_name=None, order=None):
+    """Build the per-quiz question dict from a record and an option order.
+
+    A fresh order is drawn if none is given. The bank ID and section travel with the
+    question so grading never has to look them up.
+    """
+    if order is None:
+        order = draw_option_order(record)
     
-    in_options = False
-    line_count = 0
-    options_line_found = False
+    texts = record.option_texts
+    return {
+        'id': quiz_question_id,
+        'number': record.number,
+        'question': record.stem,
+        'options': [{'num': record.option_nums[i], 'text': texts[i]} for i in order],
+        'correct_answers': [texts[i] for i in record.answer_indices],
+        'is_multiple': record.is_multiple,
+        'bank_id': record.bank_id,
+        'section': section_name or 'Unknown Section'
+    }
+
+class QuizSession:
+    """A served quiz stored as references into a compiled bank.
+
+    Holds only the bank version, the bank IDs of the questions in quiz order and each
+    question's option order (flattened, one byte per option); question dicts are rebuilt
+    from the shared bank on demand. A 30-question quiz takes a few hundred bytes.
+    """
+    __slots__ = ('database_key', 'bank_version', 'ids', 'orders')
+    
+    _HEADER = struct.Struct('<HH')  # len(database_key), len(bank_version)
+    
+    def __init__(self, database_key, bank_version, ids, orders):
+        self.database_key = database_key
+        self.bank_version = bank_version
+        self.ids = ids  # array('I') of bank IDs
+        self.orders = orders  # bytes: option positions, len(options) per question
+    
+    @classmethod
+    def draw(cls, bank, records):
+        """Create a session for the given records, drawing a fresh option order for each"""
+        orders = bytearray()
+        for record in records:
+            orders.extend(draw_option_order(record))
+        return cls(bank.database_key, bank.version, array('I', (r.bank_id for r in records)), bytes(orders))
+    
+    def __len__(self):
+        return len(self.ids)
+    
+    @timed('build_questions')
+    def questions(self, bank):
+        """Full question dicts (including correct answers and section) rebuilt from the bank"""
+        questions = []
+        offset = 0
+        for i, bank_id in enumerate(self.ids):
+            record = bank.records[bank_id]
+            n = len(record.option_texts)
+            questions.append(build_quiz_question(record, i + 1, bank.section_name(record),
+                                                 self.orders[offset:offset + n]))
+            offset += n
+        return questions
+    
+    def to_bytes(self):
+        key = self.database_key.encode('utf-8')
+        version = self.bank_version.encode('ascii')
+        return self._HEADER.pack(len(key), len(version)) + key + version + \
+            struct.pack('<I', len(self.ids)) + self.ids.tobytes() + self.orders
+    
+    @classmethod
+    def from_bytes(cls, data):
+        key_len, version_len = cls._HEADER.unpack_from(data)
+        pos = cls._HEADER.size
+        database_key = data[pos:pos + key_len].decode('utf-8')
+        pos += key_len
+        bank_version = data[pos:pos + version_len].decode('ascii')
+        pos += version_len
+        (count,) = struct.unpack_from('<I', data, pos)
+        pos += 4
+        ids = array('I')
+        ids.frombytes(data[pos:pos + count * ids.itemsize])
+        pos += count * ids.itemsize
+        return cls(database_key, bank_version, ids, bytes(data[pos:]))
+
+def generate_quiz_session(database_key='db1', section_name=None, num_questions=None, username=None):
+    """Draw a quiz and return it as a QuizSession (None if no questions are available).
+
+    With a username (multiLogin users), questions that user has not seen yet are preferred.
+    """
+    bank, records = _select_questions(database_key, section_name, num_questions, username)
+    if not records:
+        return None
+    return QuizSession.draw(bank, records)
+
+def _select_questions(database_key='db1', section_name=None, num_questions=None, username=None):
+    """Pick question records with the configured section distribution; returns (bank, records)"""
+    if num_questions is None:
+        num_questions = QUIZ_NUM_QUESTIONS
     
-    print(f"[PARSE_DEBUG] Starting to parse question with {len(lines)} lines")
+    bank = get_compiled_bank(database_key)
+    if not bank or not bank.sections or not bank.records:
+        log.error("No sections or questions found for database: %s", database_key)
+        return bank, []
     
-    for line in lines:
-        line_count += 1
-        line_stripped = line.strip()
+    with stage_timer('sampling').time():
+        sampler = get_quiz_sampler(bank, section_name, num_questions)
+        if sampler is None:
+            return bank, []
         
-        if line_stripped.startswith('QUESTION '):
-            # Extract question number and text
-            match = re.match(r'QUESTION (\d+)\.\s*(.*)', line_stripped)
-            if match:
-                question_num = match.group(1)
-                question = match.group(2)
-                print(f"[PARSE_DEBUG] Line {line_count}: Found QUESTION {question_num}, initial text: '{match.group(2)[:50]}'")
-        elif line_stripped.startswith('OPTIONS:'):
-            in_options = True
-            options_line_found = True
-            print(f"[PARSE_DEBUG] Line {line_count}: Found OPTIONS marker, question text length: {len(question)}")
-        elif line_stripped.startswith('ANSWER:'):
-            in_options = False
-            answer = line_stripped[7:].strip()
-            print(f"[PARSE_DEBUG] Line {line_count}: Found ANSWER: {answer}, parsed {len(options)} options")
-        elif in_options and line_stripped:
-            # Parse option (format: "1. option text")
-            match = re.match(r'(\d+)\.\s*(.*)', line_stripped)
-            if match:
-                options.append({
-                    'num': match.group(1),
-                    'text': match.group(2).strip()
-                })
-                print(f"[PARSE_DEBUG] Line {line_count}: Parsed option {match.group(1)}: '{match.group(2)[:30]}'")
+        seen = None
+        if username and QUESTION_ROTATION == 'on':
+            try:
+                seen = exposure_store.load(username, bank)
+            except sqlite3.Error as e:
+                log.warning("[QUIZ] Exposure lookup failed for %s, sampling uniformly: %s", username, e)
+        selected = sampler.draw(seen)
+        if seen is not None:
+            try:
+                exposure_store.save(username, bank, seen)
+            except sqlite3.Error as e:
+                log.warning("[QUIZ] Could not record exposure for %s: %s", username, e)
+    log.debug("[QUIZ] Selected %s questions for %s", len(selected), database_key)
+    return bank, selected
+
+def section_percentages(bank):
+    """Validated share of the quiz per section.
+
+    The distribution file (by section name) wins; otherwise the positional *_PCT variables;
+    otherwise equal shares.
+    """
+    percentages = distribution_config.percentages(bank)
+    if percentages is not None:
+        return percentages
+    
+    database_key, sections = bank.database_key, bank.sections
+    db_index = get_available_databases().get(database_key, {}).get('index', 0)
+    pct_vars = SECTION_PCT_BY_DB_INDEX.get(db_index)
+    num_sections = len(sections)
+    
+    if not pct_vars or all(p is None for p in pct_vars):
+        log.info("[QUIZ] No custom percentages found for %s. Using equal distribution.", database_key)
+        return [1.0 / num_sections] * num_sections
+    
+    # At least one variable is set, use them (convert None to 0.0)
+    percentages = [float(p) if p is not None else 0.0 for p in pct_vars]
+    if len(percentages) != num_sections:
+        log.warning("Percentage count mismatch for %s. Using equal distribution.", database_key)
+        return [1.0 / num_sections] * num_sections
+    
+    # Validate that percentages sum to approximately 1.0 (allow small floating point errors)
+    total_pct = sum(percentages)
+    if abs(total_pct - 1.0) > 0.01:  # More than 1% deviation
+        log.warning("Percentages sum to %s (expected 1.0) for %s. Using equal distribution.",
+                    total_pct, database_key)
+        return [1.0 / num_sections] * num_sections
+    return percentages
+
+def plan_section_quotas(percentages, num_questions):
+    """Questions per section for the given shares, rounded so they add up to num_questions"""
+    questions_per_section = [round(num_questions * pct) for pct in percentages]
+    
+    # Adjust for rounding errors to ensure total equals num_questions
+    current_total = sum(questions_per_section)
+    if current_total < num_questions:
+        # Add extra questions to sections with highest percentages
+        diff = num_questions - current_total
+        sorted_indices = sorted(range(len(percentages)), key=lambda i: percentages[i], reverse=True)
+        for i in range(diff):
+            questions_per_section[sorted_indices[i % len(sorted_indices)]] += 1
+    elif current_total > num_questions:
+        # Remove questions from sections with lowest percentages
+        diff = current_total - num_questions
+        sorted_indices = sorted(range(len(percentages)), key=lambda i: percentages[i])
+        for i in range(diff):
+            if questions_per_section[sorted_indices[i % len(sorted_indices)]] > 0:
+                questions_per_section[sorted_indices[i % len(sorted_indices)]] -= 1
+    return questions_per_section
+
+class QuizSampler:
+    """Draws quizzes from one bank version with a fixed per-section quota plan.
+
+    The plan (validation, rounding, capping at the section size) is computed once; a
+    draw is one random.sample per section with a non-zero quota plus a shuffle, O(k)
+    in the quiz length regardless of bank size.
+    """
+    
+    def __init__(self, bank, quotas):
+        self.bank = bank
+        self.quotas = [min(quota, section['count']) for quota, section in zip(quotas, bank.sections)]
+        # (question indices, quota, first bank ID if the indices are one contiguous run)
+        self.strata = [(section['question_indices'], quota, _contiguous_start(section['question_indices']))
+                       for section, quota in zip(bank.sections, self.quotas) if quota > 0]
+        self.size = sum(self.quotas)
+    
+    @classmethod
+    def for_bank(cls, bank, section_name, num_questions):
+        """Plan a sampler for a whole bank or a single section; None if the section is unknown"""
+        if section_name and section_name != 'ALL':
+            target = bank.section_by_name.get(section_name)
+            if target is None:
+                return None
+            quotas = [num_questions if section is target else 0 for section in bank.sections]
+        else:
+            percentages = section_percentages(bank)
+            quotas = plan_section_quotas(percentages, num_questions)
+            log.info("[QUIZ] Distribution for %s: %s",
+                     bank.database_key, dict(zip([s['name'] for s in bank.sections], quotas)))
+        return cls(bank, quotas)
+    
+    def draw(self, seen=None):
+        """A shuffled list of records, exactly self.quotas[i] from section i.
+
+        seen is an optional exposure bitset (see ExposureStore): unseen questions are
+        preferred and the drawn ones are marked in it.
+        """
+        ids = []
+        for indices, quota, start in self.strata:
+            if seen is not None and start is not None:
+                ids.extend(_draw_unseen(seen, start, len(indices), quota))
             else:
-                print(f"[PARSE_DEBUG] Line {line_count}: In options but line doesn't match pattern: '{line_stripped[:50]}'")
-        elif not line_stripped.startswith('OPTIONS:') and not in_options and question:
-            # Continue question text - preserve newlines for diagram tags
-            question += '\n' + line_stripped
-    
-    print(f"[PARSE_DEBUG] Parsing complete for Q{question_num}: question_len={len(question)}, options={len(options)}, answer='{answer}'")
-    
-    # Debug logging for parsing issues
-    if not question:
-        print(f"[PARSE_ERROR] No question text found in: {question_text[:200]}")
-    if not options:
-        print(f"[PARSE_ERROR] No options found in question {question_num}, options_line_found={options_line_found}")
-        print(f"[PARSE_ERROR] Full question text:\n{question_text}")
-    if not answer:
-        print(f"[PARSE_ERROR] No answer found in question {question_num}")
-    
-    # Convert answer numbers to actual option texts
-    answer_nums = answer.split()
-    correct_option_texts = []
-    for num in answer_nums:
-        for opt in options:
-            if opt['num'] == num:
-                correct_option_texts.append(opt['text'].strip())  # Ensure clean text
-                break
-    
-    # Check if any option references other options (e.g., "Both 1 and 2", "Option A and B")
-    # If so, don't shuffle to avoid breaking references
-    has_references = False
-    reference_patterns = [
-        r'both.*\d+.*\d+',  # "Both 1 and 2"
-        r'both.*and',  # "Both A and B"
-        r'option.*and.*option',  # "Option A and Option B"
-        r'\d+.*and.*\d+',  # "1 and 2"
-        r'all of the above',
-        r'none of the above',
-        r'all the above',
-        r'none the above'
-    ]
-    
-    for opt in options:
-        opt_lower = opt['text'].lower()
-        if any(re.search(pattern, opt_lower) for pattern in reference_patterns):
-            has_references = True
-            break
-    
-    # If no references, shuffle normally but keep special options at end
-    if not has_references:
-        special_keywords = ['all of the above', 'none of the above', 'all the above', 'none the above']
+                ids.extend(random.sample(indices, quota))
+        random.shuffle(ids)
+        records = self.bank.records
+        return [records[i] for i in ids]
+
+class DistributionConfig:
+    """Per-database section weights from QUIZ_DISTRIBUTION_FILE, matched to sections by name.
+
+    Example (JSON; the TOML equivalent uses one table per database):
+        {"db5": {"CAN HIGH LEVEL": 2, "CAN FRAME FORMAT": 1, "MISC CAN": 1}}
+    Weights are relative. The file is re-read when it changes (checked every
+    refresh_seconds); every change bumps generation, which invalidates cached samplers.
+    """
+    
+    def __init__(self, source, refresh_seconds):
+        self.source = source
+        self.refresh_seconds = refresh_seconds
+        self.weights = {}
+        self.generation = 0
+        self._digest = None
+        self._checked_at = None
+        self._plans = {}
+        self._lock = threading.Lock()
+    
+    def _read(self):
+        """Return (digest, text) of the file, or None if there is no distribution file"""
+        if os.path.isfile(self.source):
+            with open(self.source, 'rb') as f:
+                data = f.read()
+            return hashlib.sha256(data).hexdigest(), data.decode('utf-8')
+        if not GITHUB_TOKEN or not PRIVATE_REPO:
+            return None
+        tree = get_repo_tree(resolve_branch())
+        if tree.refresh() and tree.sha(self.source) is None:
+            return None
+        entry = fetch_github_file(self.source)
+        return entry.digest, entry.content
+    
+    def _parse(self, text):
+        if self.source.endswith('.toml'):
+            if tomllib is None:
+                raise ValueError("TOML distribution files need Python 3.11+")
+            data = tomllib.loads(text)
+        else:
+            data = json.loads(text)
+        if not isinstance(data, dict):
+            raise ValueError("expected a mapping of database key to section weights")
         
-        regular_options = []
-        special_options = []
+        databases = get_available_databases()
+        weights = {}
+        for database_key, sections in data.items():
+            if database_key not in databases:
+                log.warning("[DISTRIBUTION] Ignoring unknown database '%s'", database_key)
+                continue
+            if not isinstance(sections, dict):
+                raise ValueError(f"{database_key}: expected a mapping of section name to weight")
+            for name, weight in sections.items():
+                if isinstance(weight, bool) or not isinstance(weight, (int, float)) or weight < 0:
+                    raise ValueError(f"{database_key}/{name}: weight must be a non-negative number")
+            if sum(sections.values()) <= 0:
+                raise ValueError(f"{database_key}: weights add up to 0")
+            weights[database_key] = {name: float(weight) for name, weight in sections.items()}
+        return weights
+    
+    def refresh(self, force=False):
+        now = time.monotonic()
+        if not force and self._checked_at is not None and now - self._checked_at < self.refresh_seconds:
+            return
+        with self._lock:
+            if not force and self._checked_at is not None and now - self._checked_at < self.refresh_seconds:
+                return
+            try:
+                current = self._read()
+                digest = current[0] if current else None
+                if digest != self._digest:
+                    self.weights = self._parse(current[1]) if current else {}
+                    self._digest = digest
+                    self._plans = {}
+                    self.generation += 1
+                    log.info("[DISTRIBUTION] Loaded weights for %s from %s",
+                             sorted(self.weights) or 'no databases', self.source)
+                    # Report mismatches against the banks already compiled right away
+                    for bank in list(compiled_banks.values()):
+                        self.percentages(bank)
+            except Exception as e:
+                # Keep the last valid distribution
+                log.error("[DISTRIBUTION] Error loading %s: %s", self.source, e)
+            self._checked_at = time.monotonic()
+    
+    def percentages(self, bank):
+        """Shares aligned with bank.sections, or None if the file does not cover this database"""
+        key = (bank.database_key, bank.version, self.generation)
+        if key in self._plans:
+            return self._plans[key]
         
-        for opt in options:
-            if any(keyword in opt['text'].lower() for keyword in special_keywords):
-                special_options.append(opt)
+        weights = self.weights.get(bank.database_key)
+        percentages = None
+        if weights is not None:
+            names = {section['name'] for section in bank.sections}
+            for name in weights:
+                if name not in names:
+                    log.warning("[DISTRIBUTION] %s: section '%s' is not in the bank; ignored", bank.database_key, name)
+            for name in names - set(weights):
+                log.warning("[DISTRIBUTION] %s: section '%s' has no weight; it gets no questions",
+                            bank.database_key, name)
+            values = [weights.get(section['name'], 0.0) for section in bank.sections]
+            total = sum(values)
+            if total > 0:
+                percentages = [value / total for value in values]
             else:
-                regular_options.append(opt)
-        
-        # Shuffle only regular options
-        random.shuffle(regular_options)
-        
-        # Combine: shuffled regular options + special options at end
-        shuffled_options = regular_options + special_options
+                log.warning("[DISTRIBUTION] %s: no weighted section is in the bank; ignoring the file",
+                            bank.database_key)
+        self._plans[key] = percentages
+        return percentages
+
+distribution_config = DistributionConfig(QUIZ_DISTRIBUTION_FILE, DISTRIBUTION_REFRESH_SECONDS)
+
+def _contiguous_start(indices):
+    if indices and indices[-1] - indices[0] + 1 == len(indices):
+        return indices[0]
+    return None
+
+def _bit_positions(bits, offset):
+    """Positions (plus offset) of the set bits of an int, in O(number of set bits)"""
+    positions = []
+    while bits:
+        low = bits & -bits
+        positions.append(offset + low.bit_length() - 1)
+        bits ^= low
+    return positions
+
+def _draw_unseen(seen, start, count, quota):
+    """Pick quota bank IDs from start..start+count-1, preferring ones whose bit in seen is clear.
+
+    Rejection sampling costs O(quota) while most of the section is unseen. When too few
+    unseen questions remain, they are all served and the section starts over.
+    """
+    end = start + count
+    window = int.from_bytes(seen[start >> 3:(end + 7) >> 3], 'little') >> (start & 7)
+    free = ~window & ((1 << count) - 1)
+    
+    picked = set()
+    if bin(free).count('1') >= quota:  # int.bit_count() needs Python 3.10
+        for _ in range(8 * quota):
+            i = start + random.randrange(count)
+            if not seen[i >> 3] >> (i & 7) & 1:
+                picked.add(i)
+                if len(picked) == quota:
+                    break
+        if len(picked) < quota:
+            # Mostly seen already: list the unseen ones instead of guessing
+            remaining = [i for i in _bit_positions(free, start) if i not in picked]
+            picked.update(random.sample(remaining, quota - len(picked)))
     else:
-        # Don't shuffle if options reference each other
-        shuffled_options = options
-    
-    return {
-        'number': question_num,
-        'question': question.strip(),
-        'options': shuffled_options,
-        'correct_answers': correct_option_texts,  # Store actual text of correct answers
-        'is_multiple': len(correct_option_texts) > 1  # Flag for radio vs checkbox
-    }
+        # Section exhausted: serve what is left, then start the rotation over
+        picked.update(_bit_positions(free, start))
+        for i in range(start, end):
+            seen[i >> 3] &= ~(1 << (i & 7)) & 0xFF
+        rest = [i for i in range(start, end) if i not in picked]
+        picked.update(random.sample(rest, quota - len(picked)))
+    
+    for i in picked:
+        seen[i >> 3] |= 1 << (i & 7)
+    return picked
 
-def generate_random_questions(database_key='db1', section_name=None, num_questions=None):
-    """Generate random questions with configurable percentage distribution across all sections"""
-    if num_questions is None:
-        num_questions = QUIZ_NUM_QUESTIONS
-    
-    # Get database info to determine which one we're loading
-    databases = get_available_databases()
-    db_index = databases.get(database_key, {}).get('index', 0)
-    
-    database_content = load_database(database_key)
-    
-    # Debug: Check what we actually loaded
-    content_preview = database_content[:200].replace('\n', ' ') if database_content else '(empty)'
-    print(f"[DEBUG] Database #{db_index} - Loaded content preview: {content_preview}")
-    
-    sections, questions = parse_database(database_content)
-    
-    print(f"[DEBUG] Database: {database_key} (index #{db_index}), Sections: {len(sections)}, Questions: {len(questions)}")
-    if sections:
-        for sect in sections:
-            print(f"[DEBUG]   Section '{sect['name']}': {sect['count']} questions")
+class ExposureStore:
+    """Which questions each user has been served, as one bitset per (user, database).
+
+    Bit i is set once bank ID i was in one of the user's quizzes; a 1500-question bank
+    takes 188 bytes per user. Kept in SQLite (WAL) under RESULTS_DIR so all workers
+    share it. Bank IDs change when the bank file changes, so a bitset recorded for
+    another bank version starts over.
+    """
+    
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+    
+    def _conn(self):
+        # One connection per thread (and per process: connections must not cross a fork)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS exposure ('
+                ' username TEXT NOT NULL, database_key TEXT NOT NULL, bank_version TEXT NOT NULL,'
+                ' seen BLOB NOT NULL, updated_at REAL NOT NULL,'
+                ' PRIMARY KEY (username, database_key)) WITHOUT ROWID'
+            )
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+    
+    def load(self, username, bank):
+        """The user's bitset for this bank version (all clear if none is recorded)"""
+        size = (len(bank.records) + 7) >> 3
+        row = self._conn().execute(
+            'SELECT bank_version, seen FROM exposure WHERE username = ? AND database_key = ?',
+            (username, bank.database_key)
+        ).fetchone()
+        if row is None or row[0] != bank.version or len(row[1]) != size:
+            return bytearray(size)
+        return bytearray(row[1])
+    
+    def save(self, username, bank, seen):
+        self._conn().execute(
+            'INSERT OR REPLACE INTO exposure (username, database_key, bank_version, seen, updated_at)'
+            ' VALUES (?, ?, ?, ?, ?)', (username, bank.database_key, bank.version, bytes(seen), time.time())
+        )
+
+exposure_store = ExposureStore(os.path.join(RESULTS_DIR, 'exposure.sqlite3'))
+
+# Samplers keyed by (database_key, bank version, section, num_questions, distribution generation)
+quiz_samplers = OrderedDict()
+QUIZ_SAMPLERS_MAX = 64
+_quiz_samplers_lock = threading.Lock()
+
+def get_quiz_sampler(bank, section_name, num_questions):
+    distribution_config.refresh()
+    key = (bank.database_key, bank.version, section_name or 'ALL', num_questions, distribution_config.generation)
+    sampler = quiz_samplers.get(key)
+    if sampler is None:
+        with _quiz_samplers_lock:
+            sampler = quiz_samplers.get(key)
+            if sampler is None:
+                sampler = QuizSampler.for_bank(bank, section_name, num_questions)
+                if sampler is None:
+                    return None
+                quiz_samplers[key] = sampler
+                while len(quiz_samplers) > QUIZ_SAMPLERS_MAX:
+                    quiz_samplers.popitem(last=False)
+    return sampler
+
+class JsonLinesLog:
+    """Append-only JSON-lines file (quiz results, pending GitHub writes).
+
+    Each record is a single O_APPEND write, so cost does not grow with history and
+    several gunicorn workers can append to the same file without losing records.
+    """
+    
+    def __init__(self, path, fsync_mode='always'):
+        self.path = path
+        self.fsync_mode = fsync_mode
+        self._fd = None
+        self._dirty = False
+        self._lock = threading.Lock()
+    
+    def _open(self):
+        if self._fd is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        return self._fd
+    
+    def append(self, record):
+        line = (json.dumps(record, separators=(',', ':')) + '\n').encode('utf-8')
+        with self._lock:
+            fd = self._open()
+            if fcntl:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                os.write(fd, line)
+            finally:
+                if fcntl:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+            if self.fsync_mode == 'always':
+                os.fsync(fd)
+            else:
+                self._dirty = True
+    
+    def append_many(self, records):
+        """Append several records with one write (and at most one fsync)"""
+        if not records:
+            return
+        data = ''.join(json.dumps(r, separators=(',', ':')) + '\n' for r in records).encode('utf-8')
+        with self._lock:
+            fd = self._open()
+            if fcntl:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                os.write(fd, data)
+            finally:
+                if fcntl:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+            if self.fsync_mode == 'always':
+                os.fsync(fd)
+            else:
+                self._dirty = True
     
-    if not sections or not questions:
-        print(f"[ERROR] No sections or questions found for database: {database_key} (index #{db_index})")
-        return []
+    def sync(self):
+        """Flush appended records to disk (used by 'batch' mode and at shutdown)"""
+        with self._lock:
+            if self._dirty and self._fd is not None:
+                os.fsync(self._fd)
+                self._dirty = False
     
-    # If specific section requested, use only that section
-    if section_name and section_name != 'ALL':
-        target_section = next((s for s in sections if s['name'] == section_name), None)
-        if not target_section:
-            return []
-        
-        available = target_section['question_indices']
-        num_to_select = min(num_questions, len(available))
-        selected_indices = random.sample(available, num_to_select)
-        selected = [questions[idx] for idx in selected_indices]
-    else:
-        # Get percentage distribution based on database index
-        percentages = None
-        
-        if db_index == 1:  # MATLAB Scripting
-            # Try to get percentages from environment variables
-            pct_vars = [
-                MATLAB_SCRIPTING_FUNDAMENTALS_PCT,
-                MATLAB_SCRIPTING_ADVANCED_PCT,
-                MATLAB_SCRIPTING_TRICKY_PCT,
-                MATLAB_WORKSPACE_SCOPE_PCT,
-                MATLAB_SIMPLE_TRICKY_PCT,
-                SIMULINK_MSCRIPT_FUNDAMENTALS_PCT,
-                SIMULINK_MSCRIPT_SIMPLE_PCT,
-                SIMULINK_MSCRIPT_TRICKY_PCT,
-                FIND_SYSTEM_COMMAND_PCT,
-                SIMULINK_TRUEFALSE_PCT,
-                MATLAB_TRUEFALSE_PCT,
-                STATEFLOW_MSCRIPTING_PCT,
-                SIMULINK_DATA_DICTIONARY_PCT,
-                MODEL_COMPARISON_PROJECTS_PCT,
-                CODE_GENERATION_SCRIPTING_PCT,
-                TEST_AUTOMATION_PCT,
-                SIMULINK_DATA_HANDLING_PCT,
-                MISCELLANEOUS_MSCRIPTING_PCT
-            ]
-            if any(p is not None for p in pct_vars):
-                # At least one variable is set, use them (convert None to 0.0)
-                percentages = [float(p) if p is not None else 0.0 for p in pct_vars]
-        
-        elif db_index == 2:  # Simulink & Stateflow
-            # Try to get percentages from environment variables
-            pct_vars = [
-                SIMULINK_BASIC_PCT,
-                SIMULINK_ADVANCED_PCT,
-                SIMULINK_SUPER_ADVANCED_PCT,
-                STATEFLOW_BASIC_PCT,
-                STATEFLOW_ADVANCED_PCT,
-                STATEFLOW_SUPER_ADVANCED_PCT,
-                STATEFLOW_TRICKY_PCT,
-                SIMULINK_TRICKY_PCT
-            ]
-            if any(p is not None for p in pct_vars):
-                # At least one variable is set, use them (convert None to 0.0)
-                percentages = [float(p) if p is not None else 0.0 for p in pct_vars]
-        
-        elif db_index == 3:  # Simulink & Stateflow Modeling
-            # Try to get percentages from environment variables
-            pct_vars = [
-                MODELING_SIMULINK_BASIC_PCT,
-                MODELING_SIMULINK_ADVANCED_PCT,
-                MODELING_STATEFLOW_BASIC_PCT,
-                MODELING_STATEFLOW_ADVANCED_PCT
-            ]
-            if any(p is not None for p in pct_vars):
-                # At least one variable is set, use them (convert None to 0.0)
-                percentages = [float(p) if p is not None else 0.0 for p in pct_vars]
-        
-        elif db_index == 4:  # Embedded C Automotive
-            # Try to get percentages from environment variables
-            pct_vars = [
-                BASIC_EMBEDDED_C_PCT,
-                ADVANCED_EMBEDDED_C_PCT,
-                AUTOMOTIVE_EMBEDDED_C_PCT,
-                MATLAB_AUTO_CODE_GENERATION_PCT,
-                TRICKY_EMBEDDED_C_PCT,
-                MEMORY_RELATED_EMBEDDED_C_PCT
-            ]
-            if any(p is not None for p in pct_vars):
-                # At least one variable is set, use them (convert None to 0.0)
-                percentages = [float(p) if p is not None else 0.0 for p in pct_vars]
-        
-        elif db_index == 5:  # CAN Protocol
-            # Try to get percentages from environment variables
-            pct_vars = [
-                CAN_HIGH_LEVEL_PCT,
-                CAN_FRAME_FORMAT_PCT,
-                MISC_CAN_PCT
-            ]
-            if any(p is not None for p in pct_vars):
-                # At least one variable is set, use them (convert None to 0.0)
-                percentages = [float(p) if p is not None else 0.0 for p in pct_vars]
-        
-        elif db_index == 6:  # AUTOSAR
-            # Try to get percentages from environment variables
-            pct_vars = [
-                CLASSIC_AUTOSAR_PCT,
-                ADAPTIVE_AUTOSAR_PCT,
-                MISC_AUTOSAR_PCT
-            ]
-            if any(p is not None for p in pct_vars):
-                # At least one variable is set, use them (convert None to 0.0)
-                percentages = [float(p) if p is not None else 0.0 for p in pct_vars]
+    def read_from(self, offset=0):
+        """Return (records, next_offset) for complete lines at or after a byte offset"""
+        try:
+            with open(self.path, 'rb') as f:
+                f.seek(offset)
+                data = f.read()
+        except FileNotFoundError:
+            return [], offset
         
-        # If no percentages configured or database not recognized, use equal distribution
-        if percentages is None:
-            num_sections = len(sections)
-            percentages = [1.0 / num_sections] * num_sections
-            print(f"[QUIZ] No custom percentages found for {database_key}. Using equal distribution.")
+        end = data.rfind(b'\n') + 1  # Ignore a trailing partial line still being written
+        records = []
+        for line in data[:end].splitlines():
+            if line.strip():
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    log.warning("[RESULTS] Skipping corrupt line in %s: %r", self.path, line[:80])
+        return records, offset + end
+    
+    def read_unconsumed(self, read_offset):
+        """(records, next_offset) from the offset read_offset() returns.
+
+        The offset and the file are read under the file lock, so consume() cannot move the
+        offset or empty the file in between.
+        """
+        with self._lock:
+            fd = self._open()
+            if fcntl:
+                fcntl.flock(fd, fcntl.LOCK_SH)
+            try:
+                return self.read_from(read_offset())
+            finally:
+                if fcntl:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+    
+    def consume(self, offset, save_offset):
+        """Mark everything before offset as consumed, emptying the file if nothing follows.
+
+        save_offset persists the reader's new offset. It runs under the file lock and before
+        the file is emptied: a crash in between leaves offset 0 over the old records, which
+        replays them, instead of a stale offset that would skip records appended later.
+        """
+        with self._lock:
+            fd = self._open()
+            if fcntl:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                if os.fstat(fd).st_size != offset:
+                    save_offset(offset)
+                    return
+                save_offset(0)
+                os.ftruncate(fd, 0)
+            finally:
+                if fcntl:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+
+results_log = JsonLinesLog(os.path.join(RESULTS_DIR, 'results.jsonl'), RESULTS_FSYNC)
+
+class GitHubWriteBehind:
+    """Durable write-behind queue for updates to JSON files in the private repository.
+
+    Updates are appended to a local journal (shared by all workers) and return immediately.
+    A background thread flushes the journal every GITHUB_FLUSH_INTERVAL_SECONDS, coalescing
+    all pending updates for a file into a single commit. Merge handlers must be idempotent:
+    a partially failed flush replays its updates on the next attempt.
+    """
+    
+    def __init__(self, journal_path, mergers):
+        self.journal = JsonLinesLog(journal_path, 'always')
+        self.mergers = mergers
+        self.failed_flushes = metrics.counter('quiz_github_flush_failures_total',
+                                              'Write-behind flushes that left updates queued for a retry')
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+    
+    @property
+    def _offset_path(self):
+        return self.journal.path + '.flushed'
+    
+    def _read_offset(self):
+        try:
+            with open(self._offset_path) as f:
+                return int(f.read().strip() or 0)
+        except (FileNotFoundError, ValueError):
+            return 0
+    
+    def _write_offset(self, offset):
+        tmp_path = self._offset_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(str(offset))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self._offset_path)
+    
+    def enqueue(self, filename, op):
+        """Durably queue one update for a file"""
+        self.journal.append({'file': filename, **op})
+    
+    def enqueue_many(self, filename, ops):
+        self.journal.append_many([{'file': filename, **op} for op in ops])
+    
+    def pending(self, filename=None):
+        """Queued updates not yet committed to GitHub (optionally for one file)"""
+        entries, _ = self.journal.read_unconsumed(self._read_offset)
+        return [e for e in entries if filename is None or e['file'] == filename]
+    
+    def flush(self):
+        """Commit every queued update, one PUT per file. Returns True if the queue is empty."""
+        with self._flush_lock:
+            os.makedirs(os.path.dirname(self.journal.path), exist_ok=True)
+            with open(self.journal.path + '.lock', 'a') as lock_file:
+                if fcntl:
+                    try:
+                        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except OSError:
+                        return False  # Another worker is flushing
+                
+                entries, next_offset = self.journal.read_unconsumed(self._read_offset)
+                if not entries:
+                    return True
+                
+                by_file = OrderedDict()
+                for entry in entries:
+                    by_file.setdefault(entry['file'], []).append(entry)
+                
+                committed = True
+                for filename, ops in by_file.items():
+                    def merge(data, ops=ops):
+                        for op in ops:
+                            data = self.mergers[op['op']](data, op)
+                        return data
+                    if not commit_to_github(filename, merge, f"Apply {len(ops)} queued update(s)"):
+                        committed = False
+                
+                if not committed:
+                    self.failed_flushes.inc()
+                    return False
+                self.journal.consume(next_offset, self._write_offset)
+                log.info("[GITHUB] Flushed %s queued update(s) across %s file(s)", len(entries), len(by_file))
+                return True
+    
+    def run(self):
+        """Background loop: flush every interval (or sooner when woken)"""
+        while True:
+            self._wakeup.wait(GITHUB_FLUSH_INTERVAL_SECONDS)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                self.failed_flushes.inc()
+                log.error("[GITHUB] Write-behind flush failed: %s", e)
+
+github_write_behind = GitHubWriteBehind(
+    os.path.join(RESULTS_DIR, 'github_outbox.jsonl'),
+    {'complete_section': _merge_completed_section}
+)
+
+@timed('grading')
+def grade_quiz(questions, user_answers):
+    """Score served questions against the submitted option texts.
+
+    Returns (score, per-question results, section-wise results).
+    """
+    # Calculate score and track section-wise performance
+    score = 0
+    results = []
+    section_wise_scores = {}
+    
+    for q in questions:
+        q_id = str(q['id'])
+        correct_answer_texts = q['correct_answers']  # List of correct option texts
+        user_answer_texts = user_answers.get(q_id, [])  # List of selected option texts
         
-        # Ensure we have the right number of percentages
-        elif len(percentages) != len(sections):
-            print(f"[WARNING] Percentage count mismatch for {database_key}. Using equal distribution.")
-            num_sections = len(sections)
-            percentages = [1.0 / num_sections] * num_sections
+        # Ensure user_answer_texts is a list
+        if not isinstance(user_answer_texts, list):
+            user_answer_texts = [user_answer_texts] if user_answer_texts else []
         
-        # Validate that percentages sum to approximately 1.0 (allow small floating point errors)
-        else:
-            total_pct = sum(percentages)
-            if abs(total_pct - 1.0) > 0.01:  # More than 1% deviation
-                print(f"[WARNING] Percentages sum to {total_pct} (expected 1.0) for {database_key}. Using equal distribution.")
-                num_sections = len(sections)
-                percentages = [1.0 / num_sections] * num_sections
+        # Normalize texts by stripping whitespace for comparison
+        correct_set = set(text.strip() for text in correct_answer_texts)
+        user_set = set(text.strip() for text in user_answer_texts if text)
         
-        # Calculate questions per section based on percentages
-        questions_per_section = [round(num_questions * pct) for pct in percentages]
+        is_correct = correct_set == user_set
+        if is_correct:
+            score += 1
         
-        # Adjust for rounding errors to ensure total equals num_questions
-        current_total = sum(questions_per_section)
-        if current_total < num_questions:
-            # Add extra questions to sections with highest percentages
-            diff = num_questions - current_total
-            sorted_indices = sorted(range(len(percentages)), key=lambda i: percentages[i], reverse=True)
-            for i in range(diff):
-                questions_per_section[sorted_indices[i % len(sorted_indices)]] += 1
-        elif current_total > num_questions:
-            # Remove questions from sections with lowest percentages
-            diff = current_total - num_questions
-            sorted_indices = sorted(range(len(percentages)), key=lambda i: percentages[i])
-            for i in range(diff):
-                if questions_per_section[sorted_indices[i % len(sorted_indices)]] > 0:
-                    questions_per_section[sorted_indices[i % len(sorted_indices)]] -= 1
+        # Section was attached when the question was drawn from the bank
+        question_section = q.get('section', 'Unknown Section')
         
-        # Select random questions from each section
-        selected = []
-        for i, section in enumerate(sections):
-            if questions_per_section[i] > 0:
-                available = section['question_indices']
-                num_to_select = min(questions_per_section[i], len(available))
-                selected_indices = random.sample(available, num_to_select)
-                
-                for idx in selected_indices:
-                    selected.append(questions[idx])
+        # Track section-wise scores
+        if question_section not in section_wise_scores:
+            section_wise_scores[question_section] = {'correct': 0, 'total': 0}
         
-        print(f"[QUIZ] Distribution for {database_key}: {dict(zip([s['name'] for s in sections], questions_per_section))}")
-    
-    # Shuffle questions
-    random.shuffle(selected)
-    print(f"[QUIZ] Selected {len(selected)} raw question texts")
-    
-    # Parse each question
-    parsed_questions = []
-    failed_count = 0
-    
-    for i, q_text in enumerate(selected):
-        try:
-            parsed = parse_question(q_text)
-            
-            # Validate parsed question has required fields
-            if not parsed.get('question') or not parsed.get('options') or not parsed.get('correct_answers'):
-                print(f"[ERROR] Q{i+1} missing required fields: question={bool(parsed.get('question'))}, options={len(parsed.get('options', []))}, answers={len(parsed.get('correct_answers', []))}")
-                print(f"[ERROR] Raw question text (first 200 chars): {q_text[:200]}")
-                failed_count += 1
-                continue
-            
-            parsed['id'] = i + 1
-            parsed_questions.append(parsed)
-            
-            # Log first question from each section (for debugging)
-            if i < 4:
-                question_preview = parsed['question'][:100].replace('\n', ' ')
-                print(f"[QUIZ] Sample Q{i+1}: {question_preview}... (options: {len(parsed['options'])}, correct: {len(parsed['correct_answers'])})")
+        section_wise_scores[question_section]['total'] += 1
+        if is_correct:
+            section_wise_scores[question_section]['correct'] += 1
         
-        except Exception as e:
-            print(f"[ERROR] Failed to parse question {i+1}: {e}")
-            print(f"[ERROR] Raw question text (first 200 chars): {q_text[:200]}")
-            failed_count += 1
-            continue
-    
-    print(f"[QUIZ] Parsed {len(parsed_questions)} questions successfully, {failed_count} failed")
+        results.append({
+            'id': q['id'],
+            'question': q['question'],
+            'section': question_section,
+            'options': q['options'],
+            'correct_answers': correct_answer_texts,
+            'user_answers': user_answer_texts,
+            'is_correct': is_correct,
+            'is_multiple': q.get('is_multiple', False)
+        })
     
-    if len(parsed_questions) == 0:
-        print(f"[ERROR] No questions were successfully parsed! Check parse_question logic.")
+    # Calculate percentages for each section
+    section_wise_results = {}
+    for sect, scores in section_wise_scores.items():
+        section_wise_results[sect] = {
+            'correct': scores['correct'],
+            'total': scores['total'],
+            'percentage': round((scores['correct'] / scores['total']) * 100, 2) if scores['total'] > 0 else 0
+        }
     
-    return parsed_questions
+    return score, results, section_wise_results
 
-def save_result(username, score, total, time_taken, database_key=None, section_name=None, section_wise_scores=None):
-    """Save quiz result to GitHub with detailed section information"""
-    result = {
+def result_record(username, score, total, time_taken, database_key=None, section_name=None, section_wise_scores=None):
+    """The results log entry for one submission, with detailed section information"""
+    return {
         'username': username,
         'database': database_key or 'unknown',
         'section': section_name or 'All Sections',
@@ -807,22 +2610,705 @@ def save_result(username, score, total, time_taken, database_key=None, section_n
         'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
         'section_wise_scores': section_wise_scores or {}
     }
-    
-    # Load existing results from GitHub
-    results = []
+
+@timed('save_result')
+def save_results(results):
+    """Store a batch of result_record dicts from drained submissions"""
+    storage.add_results(results)
+
+class _PendingInsert:
+    """One submission row waiting for the group commit that will write it"""
+    __slots__ = ('row', 'done', 'inserted', 'error')
+    
+    def __init__(self, row):
+        self.row = row
+        self.done = threading.Event()
+        self.inserted = False
+        self.error = None
+
+class SubmissionQueue:
+    """Durable queue of graded submissions, keyed by quiz session (the idempotency key).
+
+    submit_quiz grades, stores the result and its response with one INSERT and answers
+    right away. Inserts arriving together in one process share a transaction (group
+    commit), so a burst of submits pays for one fsync instead of one each. The first
+    insert for a key wins, so a retried or duplicated submit gets the stored response
+    back instead of recording a second result. A background worker (one process at a
+    time) hands queued results and completed sections to the storage backend in
+    batches. Rows are kept for SUBMISSION_REPLAY_SECONDS to answer late retries.
+    Delivery is at-least-once: after a crash between the write and the bookkeeping,
+    the github backend can append a result twice, with the same submission_id (the
+    sqlite backend stores it once).
+    """
+    
+    BATCH = 500
+    
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._wakeup = threading.Event()
+        self._drain_lock = threading.Lock()
+        self._purged_at = 0.0
+        self._commit_lock = threading.Lock()
+        self._waiting_lock = threading.Lock()
+        self._waiting = []  # _PendingInsert entries not committed yet
+    
+    def _conn(self):
+        # One connection per thread (and per process: connections must not cross a fork)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            # A submission is only acknowledged once it is on disk (unless results fsync is relaxed)
+            conn.execute('PRAGMA synchronous=%s' % ('FULL' if RESULTS_FSYNC == 'always' else 'NORMAL'))
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS submissions ('
+                ' id TEXT PRIMARY KEY, username TEXT NOT NULL, result TEXT NOT NULL,'
+                ' completion TEXT, response TEXT NOT NULL,'
+                ' created_at REAL NOT NULL, persisted_at REAL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS submissions_persisted ON submissions (persisted_at)')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+    
+    def replay(self, key, username):
+        """The stored response (JSON text) for a key already submitted by this user, else None"""
+        row = self._conn().execute('SELECT username, response FROM submissions WHERE id = ?', (key,)).fetchone()
+        if row is None or row[0] != username:
+            return None
+        return row[1]
+    
+    def _insert(self, row):
+        """Insert one submission row; True if it was new. Waits for the group commit holding it"""
+        pending = _PendingInsert(row)
+        with self._waiting_lock:
+            self._waiting.append(pending)
+        with self._commit_lock:
+            # Whoever holds the lock commits what queued up during the previous transaction
+            while not pending.done.is_set():
+                with self._waiting_lock:
+                    batch, self._waiting = self._waiting[:self.BATCH], self._waiting[self.BATCH:]
+                self._commit(batch)
+        if pending.error is not None:
+            raise pending.error
+        return pending.inserted
+    
+    def _commit(self, batch):
+        conn = self._conn()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                # Few statements per batch: every call has to win the GIL back from request threads
+                keys = [item.row[0] for item in batch]
+                taken = {row[0] for row in conn.execute(
+                    'SELECT id FROM submissions WHERE id IN (%s)' % ','.join('?' * len(keys)), keys)}
+                for item in batch:
+                    item.inserted = item.row[0] not in taken
+                    taken.add(item.row[0])
+                conn.executemany('INSERT OR IGNORE INTO submissions'
+                                 ' (id, username, result, completion, response, created_at)'
+                                 ' VALUES (?, ?, ?, ?, ?, ?)', [item.row for item in batch])
+                conn.execute('COMMIT')
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+        except BaseException as e:
+            for item in batch:
+                item.error = e
+        finally:
+            for item in batch:
+                item.done.set()
+    
+    def submit(self, key, username, result, completion, response):
+        """Queue a graded submission; returns the response to send (the stored one if key was taken)"""
+        text = json.dumps(response)
+        inserted = self._insert((key, username, json.dumps({**result, 'submission_id': key}),
+                                 json.dumps(completion) if completion else None, text, time.time()))
+        if not inserted:
+            return self.replay(key, username) or text
+        self._wakeup.set()
+        return text
+    
+    def pending(self):
+        return self._conn().execute('SELECT COUNT(*) FROM submissions WHERE persisted_at IS NULL').fetchone()[0]
+    
+    def pending_completions(self):
+        """Completed-section ops of submissions not yet handed to storage, from every worker"""
+        return [json.loads(row[0]) for row in self._conn().execute(
+            'SELECT completion FROM submissions WHERE persisted_at IS NULL AND completion IS NOT NULL')]
+    
+    def drain(self):
+        """Persist every queued submission; returns how many were persisted"""
+        with self._drain_lock:
+            with open(self.path + '.lock', 'a') as lock_file:
+                if fcntl:
+                    try:
+                        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except OSError:
+                        return 0  # Another worker is draining
+                conn = self._conn()
+                total = 0
+                while True:
+                    rows = conn.execute(
+                        'SELECT id, result, completion FROM submissions WHERE persisted_at IS NULL'
+                        ' ORDER BY created_at LIMIT ?', (self.BATCH,)
+                    ).fetchall()
+                    if not rows:
+                        break
+                    save_results([json.loads(r[1]) for r in rows])
+                    completions = [json.loads(r[2]) for r in rows if r[2]]
+                    if completions:
+                        mark_sections_completed(completions)
+                    now = time.time()
+                    conn.executemany('UPDATE submissions SET persisted_at = ? WHERE id = ?',
+                                     [(now, r[0]) for r in rows])
+                    total += len(rows)
+                if time.monotonic() - self._purged_at > 60:
+                    self._purged_at = time.monotonic()
+                    conn.execute('DELETE FROM submissions WHERE persisted_at < ?',
+                                 (time.time() - SUBMISSION_REPLAY_SECONDS,))
+                if total:
+                    log.debug("[SUBMIT] Persisted %s queued submission(s)", total)
+                return total
+    
+    def run(self):
+        """Background loop: drain when woken by a local submit, else every interval"""
+        while True:
+            self._wakeup.wait(SUBMIT_QUEUE_INTERVAL_SECONDS)
+            self._wakeup.clear()
+            try:
+                self.drain()
+            except Exception as e:
+                log.error("[SUBMIT] Persisting queued submissions failed: %s", e)
+
+submission_queue = SubmissionQueue(os.path.join(RESULTS_DIR, 'submissions.sqlite3'))
+
+def _read_export_offset():
+    """Byte offset in results.jsonl up to which results were exported to GitHub"""
     try:
-        content = fetch_from_github('results.json')
-        results = json.loads(content)
-    except Exception as e:
-        print(f"[RESULTS] No existing results file or error: {e}")
-        results = []
+        with open(results_log.path + '.exported') as f:
+            return int(f.read().strip() or 0)
+    except (FileNotFoundError, ValueError):
+        return 0
+
+def export_results_snapshot():
+    """Ship results appended since the last export to results.json in the private repo.
+
+    The exported byte offset is kept next to the log, and an exclusive lock makes sure
+    only one worker exports at a time. Returns the number of results exported.
+    """
+    state_path = results_log.path + '.exported'
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    with open(results_log.path + '.lock', 'a') as lock_file:
+        if fcntl:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                return 0  # Another worker is exporting
+        
+        records, next_offset = results_log.read_from(_read_export_offset())
+        if not records:
+            return 0
+        
+        if not commit_to_github('results.json', lambda results: (results or []) + records,
+                                f"Add {len(records)} result(s)"):
+            return 0
+        
+        tmp_path = state_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(str(next_offset))
+        os.replace(tmp_path, state_path)
+        log.info("[RESULTS] Exported %s result(s) to GitHub", len(records))
+        return len(records)
+
+class Storage(ABC):
+    """Persistent state interface: users, quiz results and completed sections.
+
+    Results are result_record dicts (carrying the submission_id of their queued
+    submission); completions are _complete_section_op dicts.
+    """
+    
+    @abstractmethod
+    def refresh(self, force=False):
+        """Pick up changes made on GitHub to users.json and completed_sections.json"""
+        raise NotImplementedError
+    
+    @abstractmethod
+    def get_user(self, username):
+        raise NotImplementedError
+    
+    @abstractmethod
+    def completed_sections(self, username):
+        """database_key -> set of completed sections for one user"""
+        raise NotImplementedError
+    
+    def is_section_completed(self, username, database_key, section_name):
+        return section_name in self.completed_sections(username).get(database_key, ())
+    
+    @abstractmethod
+    def add_results(self, results):
+        raise NotImplementedError
+    
+    @abstractmethod
+    def add_completions(self, ops):
+        raise NotImplementedError
+    
+    @abstractmethod
+    def remember_completion(self, username, database_key, section_name):
+        """Make a completion visible at once, before its queued submission is persisted"""
+        raise NotImplementedError
+    
+    @abstractmethod
+    def export(self):
+        """Copy new results to the private repo; returns how many were exported"""
+        raise NotImplementedError
+    
+    def sync(self):
+        """Flush buffered writes to disk (batch fsync mode and shutdown)"""
+    
+    def maintain(self):
+        """Periodic work, called every second or so by the results maintenance thread"""
+
+class GitHubStorage(Storage):
+    """The private repo's JSON files, read through the in-memory user directory and
+    completion index; results go to results.jsonl, completions to the write-behind journal"""
+    
+    def refresh(self, force=False):
+        user_directory.refresh(force)
+        completion_index.refresh(force)
     
-    # Append new result
-    results.append(result)
+    def get_user(self, username):
+        return user_directory.get(username)
     
-    # Save back to GitHub
-    content = json.dumps(results, indent=2)
-    upload_to_github('results.json', content, f"Add result for {username}")
+    def completed_sections(self, username):
+        return completion_index.for_user(username)
+    
+    def add_results(self, results):
+        results_log.append_many(results)
+    
+    def add_completions(self, ops):
+        github_write_behind.enqueue_many('completed_sections.json', ops)
+    
+    def remember_completion(self, username, database_key, section_name):
+        completion_index.add(username, database_key, section_name)
+    
+    def export(self):
+        return export_results_snapshot()
+    
+    def sync(self):
+        results_log.sync()
+
+class SQLiteStorage(Storage):
+    """Users, results and completed sections in SQLite (WAL) under RESULTS_DIR, shared by all workers.
+
+    Logins and page renders are indexed point queries; persisting a batch of submissions
+    is one transaction. users.json and completed_sections.json are imported in bulk when
+    they change on GitHub (checked every STORAGE_SYNC_SECONDS), and new results and
+    completions are exported to results.json and completed_sections.json every
+    RESULTS_EXPORT_INTERVAL_SECONDS. GitHub stays authoritative for completions that
+    were already exported, so removing one there allows a retake as before. On first
+    start, results.json and any results.jsonl entries not yet exported are taken over.
+    A result is stored once per submission_id, even if its submission is persisted twice.
+    """
+    
+    SCHEMA = '''
+        CREATE TABLE IF NOT EXISTS users (
+            username TEXT PRIMARY KEY, data TEXT NOT NULL) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS results (
+            id INTEGER PRIMARY KEY, submission_id TEXT UNIQUE, username TEXT NOT NULL,
+            database_key TEXT NOT NULL, timestamp TEXT NOT NULL, data TEXT NOT NULL);
+        CREATE INDEX IF NOT EXISTS results_user ON results (username, database_key, timestamp);
+        CREATE INDEX IF NOT EXISTS results_database ON results (database_key, timestamp);
+        CREATE TABLE IF NOT EXISTS completions (
+            username TEXT NOT NULL, database_key TEXT NOT NULL, section TEXT NOT NULL,
+            completed_at REAL NOT NULL, exported INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (username, database_key, section)) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS sync_state (
+            name TEXT PRIMARY KEY, value TEXT NOT NULL) WITHOUT ROWID;
+    '''
+    
+    def __init__(self, path, sync_seconds):
+        self.path = path
+        self.sync_seconds = sync_seconds
+        self._local = threading.local()
+        self._refresh_lock = threading.Lock()
+        self._refreshed_at = None
+        self._users_imported = False
+        self._schema_pid = None
+    
+    def _conn(self):
+        # One connection per thread (and per process: connections must not cross a fork)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            if self._schema_pid != os.getpid():
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                conn.execute('PRAGMA journal_mode=WAL')
+                conn.executescript(self.SCHEMA)
+                self._schema_pid = os.getpid()
+            # Results are acknowledged as persisted once committed (unless results fsync is relaxed)
+            conn.execute('PRAGMA synchronous=%s' % ('FULL' if RESULTS_FSYNC == 'always' else 'NORMAL'))
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+    
+    def _transaction(self, work):
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            result = work(conn)
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+        return result
+    
+    @staticmethod
+    def _state(conn, name, default=None):
+        row = conn.execute('SELECT value FROM sync_state WHERE name = ?', (name,)).fetchone()
+        return row[0] if row else default
+    
+    @staticmethod
+    def _set_state(conn, name, value):
+        conn.execute('INSERT OR REPLACE INTO sync_state (name, value) VALUES (?, ?)', (name, str(value)))
+    
+    @staticmethod
+    def _fetch(filename):
+        """A file from the private repo, or None if it does not exist"""
+        try:
+            return fetch_github_file(filename)
+        except GitHubFileNotFound:
+            return None
+    
+    @staticmethod
+    def _insert_results(conn, results):
+        conn.executemany(
+            'INSERT OR IGNORE INTO results (submission_id, username, database_key, timestamp, data)'
+            ' VALUES (?, ?, ?, ?, ?)',
+            [(r.get('submission_id'), r.get('username', ''), r.get('database', 'unknown'), r.get('timestamp', ''),
+              json.dumps(r, separators=(',', ':'))) for r in results]
+        )
+    
+    def _import_results(self):
+        """First start: take over results.json and the results.jsonl entries not yet exported"""
+        entry = self._fetch('results.json')
+        exported = json.loads(entry.content) if entry else []
+        local, _ = results_log.read_from(_read_export_offset())
+        
+        def work(conn):
+            self._insert_results(conn, exported or [])
+            self._set_state(conn, 'results_exported', conn.execute('SELECT MAX(id) FROM results').fetchone()[0] or 0)
+            self._insert_results(conn, local)
+            self._set_state(conn, 'results_imported', time.time())
+        self._transaction(work)
+        log.info("[STORAGE] Imported %s exported and %s local result(s)", len(exported or []), len(local))
+    
+    @staticmethod
+    def _import_users(conn, data):
+        users = [u for u in (data or {}).get('users', []) if 'username' in u]
+        conn.execute('DELETE FROM users')
+        conn.executemany('INSERT OR REPLACE INTO users (username, data) VALUES (?, ?)',
+                         [(u['username'], json.dumps(u)) for u in users])
+        return len(users)
+    
+    @staticmethod
+    def _import_completions(conn, completed):
+        # Exported rows are replaced by the file; rows still waiting for export are kept
+        now = time.time()
+        rows = [(user, db, section, now) for user, dbs in (completed or {}).items()
+                for db, sections in dbs.items() for section in sections]
+        conn.execute('DELETE FROM completions WHERE exported = 1')
+        conn.executemany('INSERT OR IGNORE INTO completions (username, database_key, section, completed_at, exported)'
+                         ' VALUES (?, ?, ?, ?, 1)', rows)
+        return len(rows)
+    
+    def refresh(self, force=False):
+        """Import users.json and completed_sections.json if they changed (one worker at a time)"""
+        if not force and self._refreshed_at is not None and time.monotonic() - self._refreshed_at < self.sync_seconds:
+            return
+        with self._refresh_lock:
+            if not force and self._refreshed_at is not None and time.monotonic() - self._refreshed_at < self.sync_seconds:
+                return
+            try:
+                with open(self.path + '.lock', 'a') as lock_file:
+                    if fcntl:
+                        try:
+                            fcntl.flock(lock_file, fcntl.LOCK_EX if force else fcntl.LOCK_EX | fcntl.LOCK_NB)
+                        except OSError:
+                            return  # Another worker is importing or exporting
+                    conn = self._conn()
+                    if self._state(conn, 'results_imported') is None:
+                        try:
+                            self._import_results()
+                        except Exception as e:
+                            log.error("[STORAGE] Error importing results (retried on the next sync): %s", e)
+                    for filename, importer in (('users.json', self._import_users),
+                                               ('completed_sections.json', self._import_completions)):
+                        try:
+                            entry = self._fetch(filename)
+                            digest = entry.digest if entry else ''
+                            if digest == self._state(conn, filename):
+                                continue
+                            data = json.loads(entry.content) if entry else None
+                            
+                            def work(conn, importer=importer, data=data, filename=filename, digest=digest):
+                                count = importer(conn, data)
+                                self._set_state(conn, filename, digest)
+                                return count
+                            count = self._transaction(work)
+                            log.info("[STORAGE] Imported %s with %s entries (version %s)", filename, count, digest[:12])
+                        except Exception as e:
+                            # Keep serving the last imported copy
+                            log.error("[STORAGE] Error importing %s: %s", filename, e)
+            finally:
+                self._refreshed_at = time.monotonic()
+    
+    def get_user(self, username):
+        conn = self._conn()
+        if not self._users_imported:
+            # Only wait for an import when users.json was never imported; otherwise serve the
+            # table as it is and let the background sync bring it up to date
+            if self._state(conn, 'users.json') is None:
+                self.refresh(force=True)
+            self._users_imported = self._state(conn, 'users.json') is not None
+        row = conn.execute('SELECT data FROM users WHERE username = ?', (username,)).fetchone()
+        return json.loads(row[0]) if row else None
+    
+    def completed_sections(self, username):
+        completed = {}
+        for database_key, section in self._conn().execute(
+                'SELECT database_key, section FROM completions WHERE username = ?', (username,)):
+            completed.setdefault(database_key, set()).add(section)
+        return completed
+    
+    def is_section_completed(self, username, database_key, section_name):
+        return self._conn().execute(
+            'SELECT 1 FROM completions WHERE username = ? AND database_key = ? AND section = ?',
+            (username, database_key, section_name)
+        ).fetchone() is not None
+    
+    def add_results(self, results):
+        if results:
+            self._transaction(lambda conn: self._insert_results(conn, results))
+    
+    def add_completions(self, ops):
+        if ops:
+            now = time.time()
+            self._transaction(lambda conn: conn.executemany(
+                'INSERT OR IGNORE INTO completions (username, database_key, section, completed_at)'
+                ' VALUES (?, ?, ?, ?)', [(op['username'], op['database'], op['section'], now) for op in ops]))
+    
+    def remember_completion(self, username, database_key, section_name):
+        self._conn().execute(
+            'INSERT OR IGNORE INTO completions (username, database_key, section, completed_at) VALUES (?, ?, ?, ?)',
+            (username, database_key, section_name, time.time()))
+    
+    def export(self):
+        """Commit results and completions added since the last export (one worker at a time)"""
+        with open(self.path + '.lock', 'a') as lock_file:
+            if fcntl:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    return 0  # Another worker is importing or exporting
+            conn = self._conn()
+            
+            exported = 0
+            done = int(self._state(conn, 'results_exported', 0))
+            rows = conn.execute('SELECT id, data FROM results WHERE id > ? ORDER BY id', (done,)).fetchall()
+            records = [json.loads(data) for _, data in rows]
+            if records and commit_to_github('results.json', lambda results: (results or []) + records,
+                                            f"Add {len(records)} result(s)"):
+                self._set_state(conn, 'results_exported', rows[-1][0])
+                exported = len(records)
+                log.info("[RESULTS] Exported %s result(s) to GitHub", exported)
+            
+            completions = conn.execute(
+                'SELECT username, database_key, section FROM completions WHERE exported = 0').fetchall()
+            
+            def merge(completed):
+                for row in completions:
+                    completed = _merge_completed_section(completed, _complete_section_op(*row))
+                return completed
+            if completions and commit_to_github('completed_sections.json', merge,
+                                                f"Add {len(completions)} completed section(s)"):
+                def mark_exported(conn):
+                    conn.executemany('UPDATE completions SET exported = 1'
+                                     ' WHERE username = ? AND database_key = ? AND section = ?', completions)
+                    self._set_state(conn, 'completed_sections.json', '')  # Re-import the file as committed
+                self._transaction(mark_exported)
+                log.info("[SECTIONS] Exported %s completed section(s) to GitHub", len(completions))
+            return exported
+    
+    def maintain(self):
+        self.refresh()
+
+def create_storage():
+    if STORAGE_BACKEND == 'sqlite':
+        return SQLiteStorage(os.path.join(RESULTS_DIR, 'quiz.sqlite3'), STORAGE_SYNC_SECONDS)
+    if STORAGE_BACKEND != 'github':
+        log.warning("Unknown STORAGE_BACKEND '%s', using 'github'", STORAGE_BACKEND)
+    return GitHubStorage()
+
+storage = create_storage()
+
+def _results_maintenance_loop():
+    """Background loop: batch fsync of the results log, periodic export to GitHub and storage upkeep"""
+    last_export = time.monotonic()
+    while True:
+        time.sleep(RESULTS_FSYNC_INTERVAL_SECONDS if RESULTS_FSYNC == 'batch' else 1)
+        try:
+            storage.sync()
+            if RESULTS_EXPORT_INTERVAL_SECONDS > 0 and time.monotonic() - last_export >= RESULTS_EXPORT_INTERVAL_SECONDS:
+                last_export = time.monotonic()
+                storage.export()
+            storage.maintain()
+        except Exception as e:
+            log.error("[RESULTS] Background maintenance failed: %s", e)
+
+# Warm-up state reported by /health
+warmup_state = {'ready': False, 'pid': None, 'seconds': None, 'databases': {}}
+
+def warm_up():
+    """Fetch users, completions and compile every question bank in parallel.
+
+    Runs once per worker (or once in the gunicorn master with preload_app, so workers
+    inherit the compiled banks copy-on-write). /health reports ready afterwards.
+    """
+    started = time.monotonic()
+    databases = get_available_databases()
+    
+    def compile_bank(database_key):
+        bank = get_compiled_bank(database_key)
+        return len(bank.records) if bank else None
+    
+    with ThreadPoolExecutor(max_workers=max(1, WARMUP_THREADS), thread_name_prefix='warmup') as pool:
+        users = pool.submit(storage.refresh, True)
+        distribution = pool.submit(distribution_config.refresh, True)
+        banks = {key: pool.submit(compile_bank, key) for key in databases}
+        statuses = {}
+        for key, future in banks.items():
+            try:
+                count = future.result()
+                statuses[key] = {'questions': count} if count is not None else {'error': 'unavailable'}
+            except Exception as e:
+                statuses[key] = {'error': str(e)}
+        for future in (users, distribution):
+            try:
+                future.result()
+            except Exception as e:
+                log.error("[STARTUP] Warm-up step failed: %s", e)
+    
+    warmup_state.update(ready=True, pid=os.getpid(), seconds=round(time.monotonic() - started, 3), databases=statuses)
+    log.info("[STARTUP] Warm-up finished in %ss: %s", warmup_state['seconds'], statuses)
+    return statuses
+
+def _bank_refresh_loop():
+    """Background loop: revalidate every bank (recompiling changed files), users and completions"""
+    while True:
+        time.sleep(BANK_REFRESH_SECONDS)
+        for database_key in get_available_databases():
+            try:
+                get_compiled_bank(database_key)
+            except Exception as e:
+                log.error("[DATABASE] Background refresh of '%s' failed: %s", database_key, e)
+        try:
+            storage.refresh()
+        except Exception as e:
+            log.error("[USERS] Background refresh failed: %s", e)
+        distribution_config.refresh(force=True)
+
+def _warm_up_then_refresh():
+    try:
+        warm_up()
+    except Exception as e:
+        log.error("[STARTUP] Warm-up failed: %s", e)
+        warmup_state.update(ready=True, pid=os.getpid())
+    if BANK_REFRESH_SECONDS > 0:
+        _bank_refresh_loop()
+
+_background_pid = None
+_background_lock = threading.Lock()
+
+def start_background_workers():
+    """Start this process's background threads (once per gunicorn worker, after fork)"""
+    global _background_pid
+    if _background_pid == os.getpid():
+        return
+    with _background_lock:
+        if _background_pid == os.getpid():
+            return
+        _background_pid = os.getpid()
+        if warmup_state['pid'] != _background_pid:
+            # Inherited state from a preloading master still counts as warm, but this
+            # worker revalidates its banks before reporting ready
+            warmup_state['ready'] = False
+        threading.Thread(target=_warm_up_then_refresh, name='bank-warmup', daemon=True).start()
+        threading.Thread(target=_results_maintenance_loop, name='results-maintenance', daemon=True).start()
+        threading.Thread(target=github_write_behind.run, name='github-write-behind', daemon=True).start()
+        threading.Thread(target=submission_queue.run, name='submission-queue', daemon=True).start()
+        log.info("[STARTUP] Background workers started in process %s", _background_pid)
+
+@atexit.register
+def _flush_on_exit():
+    if _background_pid == os.getpid():
+        try:
+            submission_queue.drain()
+        except Exception as e:
+            log.error("[SUBMIT] Final drain of queued submissions failed: %s", e)
+    try:
+        storage.sync()
+    except Exception as e:
+        log.error("[RESULTS] Final sync failed: %s", e)
+    if _background_pid == os.getpid():
+        try:
+            github_write_behind.flush()
+        except Exception as e:
+            log.error("[GITHUB] Final write-behind flush failed: %s", e)
+
+@app.before_request
+def _ensure_background_workers():
+    start_background_workers()
+
+@app.before_request
+def _start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def _observe_request(response):
+    started = g.pop('request_started', None)
+    if started is not None and request.endpoint:
+        metrics.histogram('quiz_request_seconds', 'Request latency by endpoint',
+                          endpoint=request.endpoint).observe(time.perf_counter() - started)
+    return response
+
+# Figures the app already keeps, read when /metrics is scraped
+_process_started = time.time()
+metrics.callback('gauge', 'quiz_process_start_time_seconds', 'Start time of this worker process',
+                 lambda: _process_started)
+metrics.callback('gauge', 'quiz_active_sessions', 'Quiz sessions held in the session store',
+                 lambda: len(questions_cache))
+for _result, _read in (('hit', lambda: questions_cache.hits), ('miss', lambda: questions_cache.misses)):
+    metrics.callback('counter', 'quiz_session_lookups_total', 'Quiz session store lookups', _read, result=_result)
+metrics.callback('counter', 'quiz_session_evictions_total', 'Quiz sessions evicted over QUIZ_SESSION_MAX',
+                 lambda: questions_cache.evictions)
+for _result, _read in (('hit', lambda: github_content_cache.hits),
+                       ('revalidated', lambda: github_content_cache.revalidations),
+                       ('miss', lambda: github_content_cache.misses)):
+    metrics.callback('counter', 'quiz_github_cache_lookups_total',
+                     'GitHub file reads: served fresh, confirmed unchanged, or downloaded', _read, result=_result)
+metrics.callback('gauge', 'quiz_github_cache_bytes', 'Size of the cached GitHub file bodies',
+                 lambda: github_content_cache.total_bytes)
+metrics.callback('gauge', 'quiz_github_rate_limit_remaining', 'X-RateLimit-Remaining from the last GitHub response',
+                 lambda: github_client.rate_limit_remaining)
+metrics.callback('counter', 'quiz_github_retries_total', 'GitHub requests retried after errors or rate limiting',
+                 lambda: github_client.retries)
+metrics.callback('gauge', 'quiz_submissions_pending', 'Graded submissions not yet handed to storage',
+                 submission_queue.pending)
+metrics.callback('gauge', 'quiz_github_circuit_open', '1 while the GitHub circuit breaker is open',
+                 lambda: int(github_client.breaker.state != 'closed'))
 
 @app.route('/')
 def index():
@@ -839,42 +3325,31 @@ def login():
         username = data.get('username')
         password = data.get('password')
         
-        print(f"[LOGIN] Login attempt - Username: '{username}'")
-        
-        # Load users
-        print(f"[LOGIN] Loading users from GitHub...")
-        users_data = load_users()
-        users = users_data.get('users', [])
+        log.debug("[LOGIN] Login attempt - Username: '%s'", username)
         
-        print(f"[LOGIN] Loaded {len(users)} users from database")
-        print(f"[LOGIN] Available usernames: {[u.get('username') for u in users]}")
-        
-        # Find user
-        user = next((u for u in users if u['username'] == username), None)
+        # Find user (dict lookup in the cached directory, or an indexed query with sqlite storage)
+        user = storage.get_user(username)
         
         if user:
-            print(f"[LOGIN] User '{username}' found in database")
-            print(f"[LOGIN] Stored password: '{user['password']}'")
-            print(f"[LOGIN] Provided password: '{password}'")
+            log.debug("[LOGIN] User '%s' found in database", username)
             
-            # Verify password (plain text comparison)
-            if user['password'] == password:
-                print(f"[LOGIN] Password match!")
+            # Verify password (plain text, constant-time comparison)
+            if check_password(user, password):
+                log.debug("[LOGIN] Password match!")
                 
                 # Check if user allows multiple logins (default: False for single use)
                 multi_login = user.get('multiLogin', False)
-                print(f"[LOGIN] MultiLogin enabled: {multi_login}")
+                log.debug("[LOGIN] MultiLogin enabled: %s", multi_login)
                 
                 if not multi_login:
                     # Check if any database has been completed (credential already used)
-                    completed = load_completed_sections()
-                    user_completed = completed.get(username, {})
+                    user_completed = storage.completed_sections(username)
                     if any('ALL' in sections for sections in user_completed.values()):
-                        print(f"[LOGIN] Credential '{username}' already used - login denied")
+                        log.info("[LOGIN] Credential '%s' already used - login denied", username)
                         return jsonify({'success': False, 'error': 'This credential has already been used'}), 403
                 
                 # Login successful
-                print(f"[LOGIN] Login successful for '{username}'")
+                log.info("[LOGIN] Login successful for '%s'", username)
                 session.clear()  # Clear any old session data
                 session['username'] = username
                 session['multi_login'] = multi_login
@@ -884,11 +3359,11 @@ def login():
                 
                 return jsonify({'success': True})
             else:
-                print(f"[LOGIN] Password mismatch for '{username}'")
+                log.info("[LOGIN] Password mismatch for '%s'", username)
         else:
-            print(f"[LOGIN] User '{username}' NOT found in database")
+            log.debug("[LOGIN] User '%s' NOT found in database", username)
         
-        print(f"[LOGIN] Login failed for '{username}'")
+        log.info("[LOGIN] Login failed for '%s'", username)
         return jsonify({'success': False, 'error': 'Invalid credentials'}), 401
     
     return render_template('login.html')
@@ -919,9 +3394,8 @@ def select_section():
     completed_databases = []
     
     if not multi_login:
-        for db_key in databases.keys():
-            if is_section_completed(username, db_key, 'ALL'):
-                completed_databases.append(db_key)
+        user_completed = storage.completed_sections(username)
+        completed_databases = [db_key for db_key in databases if 'ALL' in user_completed.get(db_key, ())]
     
     return render_template('select_section.html',
                          username=username,
@@ -938,34 +3412,36 @@ def quiz():
     
     # Get database from query params
     database_key = request.args.get('database', 'db1')
-    print(f"[QUIZ] Requested database_key: '{database_key}' from URL: {request.url}")
+    log.debug("[QUIZ] Requested database_key: '%s' from URL: %s", database_key, request.url)
     
     # Get database info
     databases = get_available_databases()
     db_index = databases.get(database_key, {}).get('index', 0)
-    print(f"[QUIZ] Database index: {db_index}")
+    log.debug("[QUIZ] Database index: %s", db_index)
     
     # Check if database already completed (for non-multi-login users)
     multi_login = session.get('multi_login', False)
     if not multi_login:
         if is_section_completed(session['username'], database_key, 'ALL'):
-            print(f"[QUIZ] Database '{database_key}' already completed by {session['username']}")
+            log.debug("[QUIZ] Database '%s' already completed by %s", database_key, session['username'])
             return redirect(url_for('select_section'))
     
     # Check if quiz was already taken (prevent refresh after submission)
     if session.get('quiz_completed', False):
-        print(f"[QUIZ] User {session['username']} tried to access quiz after completion - redirecting to section selection")
+        log.debug("[QUIZ] User %s tried to access quiz after completion - redirecting to section selection",
+                  session['username'])
         session.pop('quiz_completed', None)
         return redirect(url_for('select_section'))
     
     # Clear cache and generate new questions if database changed
     if session.get('database_key') != database_key:
-        print(f"[QUIZ] Database changed from '{session.get('database_key')}' to '{database_key}' - clearing cache")
+        log.debug("[QUIZ] Database changed from '%s' to '%s' - clearing cache",
+                  session.get('database_key'), database_key)
         # Clear quiz-related session data and cache
         old_session_id = session.get('quiz_session_id')
-        if old_session_id and old_session_id in questions_cache:
-            del questions_cache[old_session_id]
-            print(f"[QUIZ] Removed old cache entry: {old_session_id}")
+        if old_session_id:
+            questions_cache.delete(old_session_id)
+            log.debug("[QUIZ] Removed old cache entry: %s", old_session_id)
         
         session.pop('quiz_session_id', None)
         session.pop('quiz_started', None)
@@ -981,28 +3457,28 @@ def quiz():
     # Generate new questions for this session only if not already generated
     if 'questions' not in session or 'quiz_started' not in session:
         # Generate questions from ALL sections in the database with distribution
-        print(f"[QUIZ] Generating new questions for database: {database_key} (index #{db_index})")
-        questions = generate_random_questions(database_key, section_name=None, num_questions=num_questions)
+        log.debug("[QUIZ] Generating new questions for database: %s (index #%s)", database_key, db_index)
+        quiz_session = generate_quiz_session(database_key, section_name=None, num_questions=num_questions,
+                                             username=session['username'] if multi_login else None)
         
-        if not questions:
-            print(f"[ERROR] No questions generated for database {database_key}")
+        if not quiz_session:
+            log.error("No questions generated for database %s", database_key)
             return redirect(url_for('select_section'))
         
-        print(f"[QUIZ] Generated {len(questions)} questions")
+        log.debug("[QUIZ] Generated %s questions", len(quiz_session))
         
-        # Generate unique session ID for this quiz session
-        if 'quiz_session_id' not in session:
-            session['quiz_session_id'] = str(uuid.uuid4())
+        # A fresh ID for every quiz served: it is also the submit's idempotency key, so a
+        # retake must not share it with the attempt before
+        old_session_id = session.get('quiz_session_id')
+        if old_session_id:
+            questions_cache.delete(old_session_id)
+        session['quiz_session_id'] = str(uuid.uuid4())
         
         quiz_session_id = session['quiz_session_id']
         
         # Store questions in memory cache instead of session (to avoid size limits)
         cleanup_old_cache()  # Clean up old entries first
-        questions_cache[quiz_session_id] = {
-            'questions': questions,
-            'timestamp': datetime.now(),
-            'database_key': database_key
-        }
+        questions_cache.set(quiz_session_id, quiz_session)
         
         # Store only metadata in session
         session['database_key'] = database_key
@@ -1011,10 +3487,10 @@ def quiz():
         session['start_time'] = datetime.now().isoformat()
         session.modified = True
         
-        print(f"[QUIZ] Stored {len(questions)} questions in cache with ID: {quiz_session_id}")
-        print(f"[QUIZ] Cache now has {len(questions_cache)} entries")
+        log.debug("[QUIZ] Stored %s questions in cache with ID: %s", len(quiz_session), quiz_session_id)
+        log.debug("[QUIZ] Cache now has %s entries", len(questions_cache))
     else:
-        print(f"[QUIZ] Reusing existing questions for database: {database_key} (index #{db_index})")
+        log.debug("[QUIZ] Reusing existing questions for database: %s (index #%s)", database_key, db_index)
     
     databases = get_available_databases()
     db_name = databases.get(database_key, {}).get('name', 'Quiz')
@@ -1029,30 +3505,31 @@ def quiz():
 def get_questions():
     """API endpoint to get questions"""
     if 'username' not in session:
-        print("[API] /api/questions - No username in session")
+        log.debug("[API] /api/questions - No username in session")
         return jsonify({'error': 'Not authenticated'}), 401
     
     # Get questions from cache using session ID
     quiz_session_id = session.get('quiz_session_id')
     if not quiz_session_id:
-        print("[API] /api/questions - No quiz_session_id in session")
+        log.debug("[API] /api/questions - No quiz_session_id in session")
         return jsonify({'error': 'No active quiz session'}), 400
     
-    cache_entry = questions_cache.get(quiz_session_id)
-    if not cache_entry:
-        print(f"[API] /api/questions - No cache entry found for session ID: {quiz_session_id}")
-        print(f"[API] Available cache keys: {list(questions_cache.keys())}")
+    quiz_session = questions_cache.get(quiz_session_id)
+    bank = get_bank_version(quiz_session.database_key, quiz_session.bank_version) if quiz_session else None
+    if not bank:
+        log.debug("[API] /api/questions - No cache entry found for session ID: %s", quiz_session_id)
+        log.debug("[API] Session store: %s", questions_cache.stats())
         return jsonify({'error': 'Quiz session expired'}), 400
     
-    questions = cache_entry.get('questions', [])
-    print(f"[API] /api/questions - Retrieved {len(questions)} questions from cache (session: {quiz_session_id})")
+    questions = quiz_session.questions(bank)
+    log.debug("[API] /api/questions - Retrieved %s questions from cache (session: %s)", len(questions), quiz_session_id)
     
-    if questions:
+    if questions and log.isEnabledFor(logging.DEBUG):
         # Log first question details
         first_q = questions[0]
         q_preview = first_q.get('question', '')[:100].replace('\n', ' ')
-        print(f"[API] First question preview: {q_preview}...")
-        print(f"[API] First question has {len(first_q.get('options', []))} options")
+        log.debug("[API] First question preview: %s...", q_preview)
+        log.debug("[API] First question has %s options", len(first_q.get('options', [])))
     
     # Return questions without answers
     questions_without_answers = []
@@ -1066,16 +3543,17 @@ def get_questions():
         questions_without_answers.append(question_data)
     
     # Get database-specific configuration
-    database_key = cache_entry.get('database_key', 'db1')
-    db_config = get_database_config(database_key)
+    db_config = get_database_config(quiz_session.database_key)
     
     response_data = {
         'questions': questions_without_answers,
-        'quiz_time_minutes': db_config['time_minutes']
+        'quiz_time_minutes': db_config['time_minutes'],
+        'submit_key': quiz_session_id  # Idempotency-Key for /api/submit
     }
     
-    print(f"[API] Returning {len(questions_without_answers)} questions to frontend")
-    print(f"[API] Response size: ~{len(json.dumps(response_data))} bytes")
+    log.debug("[API] Returning %s questions to frontend", len(questions_without_answers))
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug("[API] Response size: ~%s bytes", len(json.dumps(response_data)))
     
     return jsonify(response_data)
 
@@ -1093,129 +3571,194 @@ def get_config():
 
 @app.route('/api/submit', methods=['POST'])
 def submit_quiz():
-    """Submit quiz and get results"""
+    """Grade the quiz from the served session and queue the result; retries replay the first response"""
     if 'username' not in session:
         return jsonify({'error': 'Not authenticated'}), 401
     
+    username = session['username']
+    quiz_session_id = session.get('quiz_session_id')
+    # quiz.js sends the key it received with the questions; older clients rely on the session
+    submission_key = request.headers.get('Idempotency-Key') or quiz_session_id
+    if submission_key:
+        stored = submission_queue.replay(submission_key, username)
+        if stored is not None:
+            log.info("[SUBMIT] Replaying stored result of %s for '%s'", submission_key, username)
+            session['quiz_completed'] = True
+            return app.response_class(stored, mimetype='application/json', headers={'Idempotent-Replayed': 'true'})
+    
     data = request.get_json()
     user_answers = data.get('answers', {})
     time_taken = data.get('time_taken', '00:00')
     
-    # Get questions from cache
-    quiz_session_id = session.get('quiz_session_id')
-    cache_entry = questions_cache.get(quiz_session_id, {})
-    questions = cache_entry.get('questions', [])
+    # Rebuild the served questions from the cached session and its bank version
+    quiz_session = questions_cache.get(quiz_session_id) if quiz_session_id == submission_key else None
+    bank = get_bank_version(quiz_session.database_key, quiz_session.bank_version) if quiz_session else None
+    if not bank:
+        return jsonify({'error': 'Quiz session expired'}), 400
+    questions = quiz_session.questions(bank)
     
     database_key = session.get('database_key', 'unknown')
     section_name = session.get('section_name', 'All Sections')
     
-    # Load database to get section information for each question
-    database_content = load_database(database_key)
-    sections, all_questions = parse_database(database_content)
-    
-    # Create a mapping of question text to section name
-    question_to_section = {}
-    for section in sections:
-        for q_idx in section['question_indices']:
-            if q_idx < len(all_questions):
-                q_text = all_questions[q_idx]
-                # Extract just the question text (after "QUESTION N.")
-                match = re.search(r'QUESTION \d+\.\s*(.*?)(?:\nOPTIONS:|\n|$)', q_text, re.DOTALL)
-                if match:
-                    question_key = match.group(1).strip()[:100]  # First 100 chars as key
-                    question_to_section[question_key] = section['name']
-    
-    # Calculate score and track section-wise performance
-    score = 0
-    results = []
-    section_wise_scores = {}
-    
-    for q in questions:
-        q_id = str(q['id'])
-        correct_answer_texts = q['correct_answers']  # List of correct option texts
-        user_answer_texts = user_answers.get(q_id, [])  # List of selected option texts
-        
-        # Ensure user_answer_texts is a list
-        if not isinstance(user_answer_texts, list):
-            user_answer_texts = [user_answer_texts] if user_answer_texts else []
-        
-        # Normalize texts by stripping whitespace for comparison
-        correct_set = set(text.strip() for text in correct_answer_texts)
-        user_set = set(text.strip() for text in user_answer_texts if text)
-        
-        is_correct = correct_set == user_set
-        if is_correct:
-            score += 1
-        
-        # Find which section this question belongs to
-        question_key = q['question'].strip()[:100]
-        question_section = question_to_section.get(question_key, 'Unknown Section')
-        
-        # Track section-wise scores
-        if question_section not in section_wise_scores:
-            section_wise_scores[question_section] = {'correct': 0, 'total': 0}
-        
-        section_wise_scores[question_section]['total'] += 1
-        if is_correct:
-            section_wise_scores[question_section]['correct'] += 1
-        
-        results.append({
-            'id': q['id'],
-            'question': q['question'],
-            'section': question_section,
-            'options': q['options'],
-            'correct_answers': correct_answer_texts,
-            'user_answers': user_answer_texts,
-            'is_correct': is_correct,
-            'is_multiple': q.get('is_multiple', False)
-        })
+    score, results, section_wise_results = grade_quiz(questions, user_answers)
     
-    # Calculate percentages for each section
-    section_wise_results = {}
-    for sect, scores in section_wise_scores.items():
-        section_wise_results[sect] = {
-            'correct': scores['correct'],
-            'total': scores['total'],
-            'percentage': round((scores['correct'] / scores['total']) * 100, 2) if scores['total'] > 0 else 0
-        }
+    # Single-use credentials are spent by a successful submission
+    completion = None
+    if not session.get('multi_login', False) and section_name:
+        completion = _complete_section_op(username, database_key, section_name)
     
-    # Save result to persistent storage with section details
-    save_result(session['username'], score, len(questions), time_taken, 
-                database_key, section_name, section_wise_results)
+    response = {
+        'score': score,
+        'total': len(questions),
+        'percentage': round((score / len(questions)) * 100, 2),
+        'results': results,
+        'section_wise_scores': section_wise_results
+    }
     
-    # Mark section as completed if single-use (after successful submission)
-    username = session.get('username')
-    multi_login = session.get('multi_login', False)
+    # One INSERT makes the submission durable; the result and completion are written in the background
+    with stage_timer('queue_submission').time():
+        body = submission_queue.submit(
+            submission_key, username,
+            result_record(username, score, len(questions), time_taken, database_key, section_name, section_wise_results),
+            completion, response)
     
-    if not multi_login and username and section_name:
-        mark_section_completed(username, database_key, section_name)
-        print(f"[SUBMIT] Section '{section_name}' in '{database_key}' marked as completed for '{username}'")
+    if completion:
+        # Refuse a retake at once (other workers see it in the queue on their next refresh)
+        storage.remember_completion(username, database_key, section_name)
+        log.info("[SUBMIT] Section '%s' in '%s' marked as completed for '%s'", section_name, database_key, username)
     
     # Mark quiz as completed to prevent refresh/retake
     session['quiz_completed'] = True
     session.modified = True
     
-    return jsonify({
-        'score': score,
-        'total': len(questions),
-        'percentage': round((score / len(questions)) * 100, 2),
-        'results': results,
-        'section_wise_scores': section_wise_results
-    })
+    return app.response_class(body, mimetype='application/json')
 
 @app.route('/health')
 def health():
-    """Health check endpoint for keep-alive"""
-    return jsonify({'status': 'ok', 'timestamp': datetime.now().isoformat()})
+    """Health check endpoint for keep-alive; 503 until this worker's question banks are warm"""
+    if not warmup_state['ready']:
+        return jsonify({'status': 'warming', 'timestamp': datetime.now().isoformat()}), 503
+    return jsonify({
+        'status': 'ok',
+        'timestamp': datetime.now().isoformat(),
+        'warmup_seconds': warmup_state['seconds'],
+        'databases': warmup_state['databases']
+    })
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus metrics for this worker process"""
+    return metrics.render(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
+class ProfilingMiddleware:
+    """WSGI wrapper that profiles selected requests end to end.
+
+    A request is profiled when it carries PROFILE_TOKEN or is picked at PROFILE_SAMPLE_RATE.
+    Each profile is written under PROFILE_DIR/<endpoint>/ as a cProfile dump (.prof, for
+    pstats/snakeviz) and as collapsed stacks sampled from the request thread (.folded, for
+    flamegraph.pl/speedscope). One request is profiled at a time; others run normally.
+    """
+    
+    def __init__(self, wsgi_app, flask_app):
+        self.wsgi_app = wsgi_app
+        self.flask_app = flask_app
+        self._busy = threading.Lock()
+    
+    def _requested(self, environ):
+        if PROFILE_TOKEN:
+            token = environ.get('HTTP_X_PROFILE_TOKEN')
+            if token is None and 'profile=' in environ.get('QUERY_STRING', ''):
+                token = parse_qs(environ['QUERY_STRING']).get('profile', [''])[0]
+            if token is not None and hmac.compare_digest(token.encode('utf-8'), PROFILE_TOKEN.encode('utf-8')):
+                return True
+        return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+    
+    def _endpoint(self, environ):
+        try:
+            endpoint, _ = self.flask_app.url_map.bind_to_environ(environ).match()
+            return endpoint
+        except Exception:
+            return 'unmatched'
+    
+    def __call__(self, environ, start_response):
+        if not self._requested(environ) or not self._busy.acquire(blocking=False):
+            return self.wsgi_app(environ, start_response)
+        try:
+            return self._profile(environ, start_response)
+        finally:
+            self._busy.release()
+    
+    def _profile(self, environ, start_response):
+        stacks = {}
+        stop = threading.Event()
+        sampler = threading.Thread(target=self._sample_stacks, name='profile-sampler', daemon=True,
+                                   args=(threading.get_ident(), sys._getframe(), stacks, stop))
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        sampler.start()
+        profiler.enable()
+        try:
+            # Materialize the body so the profile covers the whole response
+            result = self.wsgi_app(environ, start_response)
+            try:
+                body = b''.join(result)
+            finally:
+                if hasattr(result, 'close'):
+                    result.close()
+        finally:
+            profiler.disable()
+            stop.set()
+            sampler.join()
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        try:
+            self._save(self._endpoint(environ), profiler, stacks, elapsed_ms)
+        except OSError as e:
+            log.error("[PROFILE] Could not save profile: %s", e)
+        return [body]
+    
+    @staticmethod
+    def _sample_stacks(thread_id, outer_frame, stacks, stop):
+        """Count the request thread's stacks (below this middleware) until stopped"""
+        interval = PROFILE_STACK_INTERVAL_MS / 1000
+        while not stop.wait(interval):
+            frame = sys._current_frames().get(thread_id)
+            names = []
+            while frame is not None and frame is not outer_frame:
+                names.append(f"{frame.f_globals.get('__name__', '?')}.{frame.f_code.co_name}")
+                frame = frame.f_back
+            if names:
+                key = ';'.join(reversed(names))
+                stacks[key] = stacks.get(key, 0) + 1
+    
+    @staticmethod
+    def _save(endpoint, profiler, stacks, elapsed_ms):
+        directory = os.path.join(PROFILE_DIR, endpoint)
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, f"{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}-{os.getpid()}-{elapsed_ms:.0f}ms")
+        profiler.dump_stats(base + '.prof')
+        with open(base + '.folded', 'w') as f:
+            for stack, count in stacks.items():
+                f.write(f"{stack} {count}\n")
+        log.info("[PROFILE] %s took %.1f ms, saved %s.{prof,folded}", endpoint, elapsed_ms, base)
+        
+        profiles = sorted(name for name in os.listdir(directory) if name.endswith('.prof'))
+        for name in profiles[:-PROFILE_KEEP] if PROFILE_KEEP > 0 else []:
+            for suffix in ('.prof', '.folded'):
+                try:
+                    os.remove(os.path.join(directory, name[:-len('.prof')] + suffix))
+                except OSError:
+                    pass
+
+if PROFILE_TOKEN or PROFILE_SAMPLE_RATE > 0:
+    app.wsgi_app = ProfilingMiddleware(app.wsgi_app, app)
 
 if __name__ == '__main__':
-    print("="*50)
-    print("[STARTUP] Application starting...")
-    print(f"[STARTUP] Environment variables check:")
-    print(f"  - SECRET_KEY: {'SET' if os.environ.get('SECRET_KEY') else 'NOT SET'}")
-    print(f"  - GITHUB_TOKEN: {'SET' if os.environ.get('GITHUB_TOKEN') else 'NOT SET'}")
-    print(f"  - PRIVATE_REPO: {os.environ.get('PRIVATE_REPO', 'NOT SET')}")
-    print(f"  - QUIZ_NUM_QUESTIONS: {QUIZ_NUM_QUESTIONS}")
-    print(f"  - QUIZ_TIME_MINUTES: {QUIZ_TIME_MINUTES}")
-    print("="*50)
+    log.info("[STARTUP] Application starting...")
+    log.info("[STARTUP] Environment variables check:")
+    log.info("  - SECRET_KEY: %s", 'SET' if os.environ.get('SECRET_KEY') else 'NOT SET')
+    log.info("  - GITHUB_TOKEN: %s", 'SET' if os.environ.get('GITHUB_TOKEN') else 'NOT SET')
+    log.info("  - PRIVATE_REPO: %s", os.environ.get('PRIVATE_REPO', 'NOT SET'))
+    log.info("  - QUIZ_NUM_QUESTIONS: %s", QUIZ_NUM_QUESTIONS)
+    log.info("  - QUIZ_TIME_MINUTES: %s", QUIZ_TIME_MINUTES)
+    start_background_workers()
     app.run(host='0.0.0.0', port=int(os.environ.get('PORT', 5000)))
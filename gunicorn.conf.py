@@ -0,0 +1,20 @@
+"""Gunicorn settings, picked up automatically by `gunicorn app:app`.
+
+Set GUNICORN_PRELOAD=true to import the app and warm every question bank once in the
+master; workers then share the compiled banks copy-on-write and only revalidate them.
+"""
+import os
+
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'false').lower() == 'true'
+
+
+def when_ready(server):
+    if preload_app:
+        import app
+        app.warm_up()
+
+
+def post_fork(server, worker):
+    # Warm-up, write-behind and refresher threads are per process and must start after fork
+    import app
+    app.start_background_workers()
@@ -5,6 +5,7 @@ let timeLeft = 30 * 60; // Will be set from server config
 let timerInterval;
 let startTime;
 let quizSubmitted = false;
+let submitKey = null;  // Idempotency key of this page's quiz (new per quiz): retries return the first result
 
 // Detect page refresh/reload and prevent cheating
 window.addEventListener('beforeunload', function(e) {
@@ -26,8 +27,10 @@ document.addEventListener('DOMContentLoaded', async () => {
 async function loadQuestions() {
     try {
         const response = await fetch('/api/questions');
+        submitKey = null;
         const data = await response.json();
         questions = data.questions;
+        submitKey = data.submit_key || null;
         
         // Set timer from server configuration
         if (data.quiz_time_minutes) {
@@ -263,17 +266,17 @@ async function submitQuiz() {
         formattedAnswers[qId] = selectedOptions; // Keep as array
     }
     
+    const headers = {'Content-Type': 'application/json'};
+    if (submitKey) {
+        headers['Idempotency-Key'] = submitKey;
+    }
+    const body = JSON.stringify({
+        answers: formattedAnswers,
+        time_taken: getTimeTaken()
+    });
+    
     try {
-        const response = await fetch('/api/submit', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json'
-            },
-            body: JSON.stringify({
-                answers: formattedAnswers,
-                time_taken: getTimeTaken()
-            })
-        });
+        const response = await postWithRetry('/api/submit', headers, body);
         
         if (response.status === 401) {
             // Session expired, redirect to login
@@ -291,6 +294,27 @@ async function submitQuiz() {
     }
 }
 
+// Retry network errors and server-side failures with backoff. Safe because the server
+// records each quiz once per idempotency key and replays the first response.
+async function postWithRetry(url, headers, body, attempts = 5) {
+    let delay = 500;
+    for (let attempt = 1; ; attempt++) {
+        try {
+            const response = await fetch(url, {method: 'POST', headers: headers, body: body});
+            if ((response.status < 500 && response.status !== 429) || attempt === attempts) {
+                return response;
+            }
+        } catch (error) {
+            if (attempt === attempts) {
+                throw error;
+            }
+        }
+        // Jitter spreads out a cohort whose timers expired in the same second
+        await new Promise(resolve => setTimeout(resolve, delay + Math.random() * delay));
+        delay *= 2;
+    }
+}
+
 function displayResults(data) {
     const modal = document.getElementById('resultsModal');
     const content = document.getElementById('resultsContent');
@@ -0,0 +1,228 @@
+"""The question parser the app used before banks were compiled (copied unchanged from
+the original app.py), kept as the baseline of the benchmarks.
+
+parse_database splits a bank into sections and raw question texts; parse_question
+turns one raw text into a quiz question dict. Both print a line for nearly every line
+they parse, as the original did: redirect stdout when timing them.
+"""
+import random
+import re
+
+
+def parse_database(content):
+    """Parse database file to extract sections and questions with fallback logic"""
+    # Try primary parsing method (line-by-line)
+    sections, questions = _parse_database_line_by_line(content)
+    
+    # Safeguard: If no questions found, try alternative parsing method
+    if not questions or len(questions) == 0:
+        print("[WARNING] Primary parser found 0 questions. Trying fallback parser...")
+        sections, questions = _parse_database_fallback(content)
+        if questions:
+            print(f"[SUCCESS] Fallback parser found {len(questions)} questions")
+    
+    return sections, questions
+
+
+def _parse_database_line_by_line(content):
+    """Primary parsing method: line-by-line"""
+    lines = content.split('\n')
+    sections = []
+    questions = []
+    
+    current_section = {'name': '', 'count': 0, 'question_indices': []}
+    current_question = ''
+    in_question = False
+    
+    for line in lines:
+        line_stripped = line.strip()
+        
+        # Check for section header
+        if line_stripped.startswith('SECTION:'):
+            if current_section['name']:
+                sections.append(current_section)
+            section_name = line_stripped[8:].strip()
+            current_section = {'name': section_name, 'count': 0, 'question_indices': []}
+            continue
+        
+        # Check for question start
+        if line_stripped.startswith('QUESTION '):
+            if in_question and current_question:
+                questions.append(current_question.strip())
+                current_section['count'] += 1
+                current_section['question_indices'].append(len(questions) - 1)
+            current_question = line
+            in_question = True
+        elif in_question:
+            current_question += '\n' + line
+            if line_stripped.startswith('ANSWER:'):
+                questions.append(current_question.strip())
+                current_section['count'] += 1
+                current_section['question_indices'].append(len(questions) - 1)
+                current_question = ''
+                in_question = False
+    
+    if current_section['name']:
+        sections.append(current_section)
+    
+    return sections, questions
+
+
+def _parse_database_fallback(content):
+    """Fallback parsing method: split by QUESTION markers"""
+    sections = []
+    questions = []
+    
+    # Split content into section blocks
+    section_blocks = re.split(r'\nSECTION:\s*', content)
+    
+    for block in section_blocks:
+        if not block.strip():
+            continue
+        
+        # First line is section name
+        lines = block.split('\n')
+        section_name = lines[0].strip()
+        
+        if not section_name:
+            continue
+        
+        current_section = {'name': section_name, 'count': 0, 'question_indices': []}
+        
+        # Split by QUESTION markers (but keep the QUESTION keyword)
+        question_blocks = re.split(r'(\nQUESTION\s+\d+\.)', block)
+        
+        # Reconstruct questions (pairs of marker + content)
+        for i in range(1, len(question_blocks), 2):
+            if i + 1 < len(question_blocks):
+                question_text = (question_blocks[i].strip() + '\n' + question_blocks[i + 1]).strip()
+                
+                # Validate it has required components
+                if 'OPTIONS:' in question_text and 'ANSWER:' in question_text:
+                    questions.append(question_text)
+                    current_section['count'] += 1
+                    current_section['question_indices'].append(len(questions) - 1)
+        
+        if current_section['count'] > 0:
+            sections.append(current_section)
+    
+    return sections, questions
+
+
+def parse_question(question_text):
+    """Parse individual question to extract components with detailed logging"""
+    lines = question_text.split('\n')
+    question_num = ''
+    question = ''
+    options = []
+    answer = ''
+    
+    in_options = False
+    line_count = 0
+    options_line_found = False
+    
+    print(f"[PARSE_DEBUG] Starting to parse question with {len(lines)} lines")
+    
+    for line in lines:
+        line_count += 1
+        line_stripped = line.strip()
+        
+        if line_stripped.startswith('QUESTION '):
+            # Extract question number and text
+            match = re.match(r'QUESTION (\d+)\.\s*(.*)', line_stripped)
+            if match:
+                question_num = match.group(1)
+                question = match.group(2)
+                print(f"[PARSE_DEBUG] Line {line_count}: Found QUESTION {question_num}, initial text: '{match.group(2)[:50]}'")
+        elif line_stripped.startswith('OPTIONS:'):
+            in_options = True
+            options_line_found = True
+            print(f"[PARSE_DEBUG] Line {line_count}: Found OPTIONS marker, question text length: {len(question)}")
+        elif line_stripped.startswith('ANSWER:'):
+            in_options = False
+            answer = line_stripped[7:].strip()
+            print(f"[PARSE_DEBUG] Line {line_count}: Found ANSWER: {answer}, parsed {len(options)} options")
+        elif in_options and line_stripped:
+            # Parse option (format: "1. option text")
+            match = re.match(r'(\d+)\.\s*(.*)', line_stripped)
+            if match:
+                options.append({
+                    'num': match.group(1),
+                    'text': match.group(2).strip()
+                })
+                print(f"[PARSE_DEBUG] Line {line_count}: Parsed option {match.group(1)}: '{match.group(2)[:30]}'")
+            else:
+                print(f"[PARSE_DEBUG] Line {line_count}: In options but line doesn't match pattern: '{line_stripped[:50]}'")
+        elif not line_stripped.startswith('OPTIONS:') and not in_options and question:
+            # Continue question text - preserve newlines for diagram tags
+            question += '\n' + line_stripped
+    
+    print(f"[PARSE_DEBUG] Parsing complete for Q{question_num}: question_len={len(question)}, options={len(options)}, answer='{answer}'")
+    
+    # Debug logging for parsing issues
+    if not question:
+        print(f"[PARSE_ERROR] No question text found in: {question_text[:200]}")
+    if not options:
+        print(f"[PARSE_ERROR] No options found in question {question_num}, options_line_found={options_line_found}")
+        print(f"[PARSE_ERROR] Full question text:\n{question_text}")
+    if not answer:
+        print(f"[PARSE_ERROR] No answer found in question {question_num}")
+    
+    # Convert answer numbers to actual option texts
+    answer_nums = answer.split()
+    correct_option_texts = []
+    for num in answer_nums:
+        for opt in options:
+            if opt['num'] == num:
+                correct_option_texts.append(opt['text'].strip())  # Ensure clean text
+                break
+    
+    # Check if any option references other options (e.g., "Both 1 and 2", "Option A and B")
+    # If so, don't shuffle to avoid breaking references
+    has_references = False
+    reference_patterns = [
+        r'both.*\d+.*\d+',  # "Both 1 and 2"
+        r'both.*and',  # "Both A and B"
+        r'option.*and.*option',  # "Option A and Option B"
+        r'\d+.*and.*\d+',  # "1 and 2"
+        r'all of the above',
+        r'none of the above',
+        r'all the above',
+        r'none the above'
+    ]
+    
+    for opt in options:
+        opt_lower = opt['text'].lower()
+        if any(re.search(pattern, opt_lower) for pattern in reference_patterns):
+            has_references = True
+            break
+    
+    # If no references, shuffle normally but keep special options at end
+    if not has_references:
+        special_keywords = ['all of the above', 'none of the above', 'all the above', 'none the above']
+        
+        regular_options = []
+        special_options = []
+        
+        for opt in options:
+            if any(keyword in opt['text'].lower() for keyword in special_keywords):
+                special_options.append(opt)
+            else:
+                regular_options.append(opt)
+        
+        # Shuffle only regular options
+        random.shuffle(regular_options)
+        
+        # Combine: shuffled regular options + special options at end
+        shuffled_options = regular_options + special_options
+    else:
+        # Don't shuffle if options reference each other
+        shuffled_options = options
+    
+    return {
+        'number': question_num,
+        'question': question.strip(),
+        'options': shuffled_options,
+        'correct_answers': correct_option_texts,  # Store actual text of correct answers
+        'is_multiple': len(correct_option_texts) > 1  # Flag for radio vs checkbox
+    }
@@ -0,0 +1,515 @@
+"""Micro-benchmarks for the quiz hot paths.
+
+Runs against synthetic banks in-process (no GitHub access needed):
+
+    python tools/benchmark.py assembly             # quiz assembly: parse_question vs compiled records
+    python tools/benchmark.py assembly --json      # machine-readable output
+    python tools/benchmark.py sessions             # memory per stored quiz session (1k / 10k sessions)
+    python tools/benchmark.py github               # GitHub client under injected latency, 5xx and 429
+    python tools/benchmark.py parse                # bank compile time for 6k..50k questions (linear scaling)
+    python tools/benchmark.py sampler              # 100k quiz draws: per-request planning vs cached sampler
+    python tools/benchmark.py rotation             # unseen-first draws for 10k users with persisted bitsets
+    python tools/benchmark.py metrics              # cost of one histogram observation, 1 and 8 threads
+    python tools/benchmark.py storage              # per-request state: whole JSON files vs SQLite point queries
+    python tools/benchmark.py renders              # GitHub requests per page render once warm (fails if any)
+
+Modes that check correctness as well (renders, sampler, rotation) exit with status 1
+and list the failed checks when one does not hold.
+"""
+import argparse
+import contextlib
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Queues, journals and snapshots the app writes during a run (renders starts its background
+# workers) go to a throwaway directory, never into the real data/ directory
+_results_dir = tempfile.TemporaryDirectory(prefix='quiz-benchmark-')
+os.environ['RESULTS_DIR'] = _results_dir.name
+
+import app  # noqa: E402
+import baseline_parser  # noqa: E402
+from fake_github import FakeGitHub  # noqa: E402
+from synthetic_bank import make_bank  # noqa: E402
+
+
+def _time_per_call(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def _compiled_bank(num_sections, per_section, seed=0):
+    content = make_bank(num_sections, per_section, seed)
+    sections, questions = baseline_parser.parse_database(content)
+    return sections, questions, app.CompiledBank.from_text('bench', 'bench', content)
+
+
+def bench_assembly(args):
+    """Time to turn k sampled questions into quiz payloads, before and after pre-compilation"""
+    sections, questions, bank = _compiled_bank(18, 85)
+    results = []
+    with open(os.devnull, 'w') as devnull:
+        for k in args.sizes:
+            k = min(k, len(bank.records))
+
+            def before():
+                # Pre-compilation path: sample raw texts and run parse_question on each
+                for i, text in enumerate(random.sample(questions, k)):
+                    parsed = baseline_parser.parse_question(text)
+                    parsed['id'] = i + 1
+
+            def after():
+                for i, record in enumerate(random.sample(bank.records, k)):
+                    app.build_quiz_question(record, i + 1)
+
+            # parse_question prints every line it parses; discard that output for both variants
+            with contextlib.redirect_stdout(devnull):
+                before_s = _time_per_call(before, args.repeat)
+                after_s = _time_per_call(after, args.repeat)
+            results.append({
+                'questions': k,
+                'before_ms': round(before_s * 1000, 4),
+                'after_ms': round(after_s * 1000, 4),
+                'speedup': round(before_s / after_s, 1) if after_s else None,
+            })
+    return {'benchmark': 'assembly', 'bank_questions': len(bank.records), 'repeat': args.repeat, 'results': results}
+
+
+def _measure_sessions(make_session, count):
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    sessions = [make_session() for _ in range(count)]
+    used = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+    del sessions
+    return used
+
+
+def bench_sessions(args):
+    """Memory held per stored quiz session: full question dicts vs QuizSession references"""
+    _, _, bank = _compiled_bank(18, 85)
+    k = args.questions
+
+    def as_dicts():
+        records = random.sample(bank.records, k)
+        return {'questions': app.QuizSession.draw(bank, records).questions(bank), 'database_key': 'db1'}
+
+    def as_references():
+        return app.QuizSession.draw(bank, random.sample(bank.records, k))
+
+    results = []
+    for count in args.counts:
+        before = _measure_sessions(as_dicts, count)
+        after = _measure_sessions(as_references, count)
+        results.append({
+            'sessions': count,
+            'dicts_bytes_per_session': before // count,
+            'refs_bytes_per_session': after // count,
+            'dicts_total_mb': round(before / 2**20, 2),
+            'refs_total_mb': round(after / 2**20, 2),
+        })
+    return {'benchmark': 'sessions', 'questions_per_quiz': k, 'results': results}
+
+
+def bench_github(args):
+    """Run the GitHub client against a local stub that injects latency, 5xx and 429 responses"""
+    fake = FakeGitHub().start()
+    fake.set_file('users.json', '{"users": []}')
+    app.GITHUB_API_URL, app.GITHUB_TOKEN, app.PRIVATE_REPO = fake.url, 'benchmark-token', fake.repo
+    app.GITHUB_BACKOFF_SECONDS = 0.05
+    app.GITHUB_READ_TIMEOUT = 0.2
+    app.GITHUB_BREAKER_THRESHOLD = app.github_client.breaker.threshold = 3
+    app.github_client.breaker.reset_seconds = 60
+
+    def setup_latency():
+        fake.latency = 0.5
+
+    # (name, setup, start with a closed breaker, file reads); the breaker counts each read once
+    threshold = app.github_client.breaker.threshold
+    scenarios = [
+        ('healthy', lambda: None, True, 1),
+        ('two 503s then ok', lambda: fake.inject(503, count=2), True, 1),
+        ('429 with Retry-After: 1', lambda: fake.inject(429, retry_after=1), True, 1),
+        ('rate limit exhausted (403)', lambda: fake.inject(403, rate_limited=True), True, 1),
+        ('read timeout (500 ms latency)', setup_latency, True, 1),
+        ('outage: one failed read', lambda: fake.inject(503, count=1000), True, 1),
+        (f'outage: breaker opens ({threshold} reads)', lambda: None, True, threshold),
+        ('outage: fails fast while open', lambda: None, False, 1),
+    ]
+
+    results = []
+    for name, setup, reset_breaker, reads in scenarios:
+        if reset_breaker:
+            app.github_client.breaker.record_success()
+        app.github_content_cache.clear()
+        fake.reset_log()
+        retries_before = app.github_client.retries
+        setup()
+        start = time.perf_counter()
+        for _ in range(reads):
+            app.github_content_cache.clear()
+            try:
+                app.fetch_github_file('users.json')
+                outcome = 'ok'
+            except Exception as e:
+                outcome = type(e).__name__
+        elapsed = time.perf_counter() - start
+        fake.latency = 0.0
+        results.append({
+            'scenario': name,
+            'outcome': outcome,
+            'server_requests': fake.count(),
+            'retries': app.github_client.retries - retries_before,
+            'elapsed_ms': round(elapsed * 1000, 1),
+            'breaker': app.github_client.breaker.state,
+        })
+    fake.stop()
+    return {'benchmark': 'github', 'max_retries': app.GITHUB_MAX_RETRIES, 'results': results}
+
+
+def _baseline_parse(content):
+    """Every question of a bank parsed the original way: parse_database, then parse_question on each"""
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        _, questions = baseline_parser.parse_database(content)
+        return [baseline_parser.parse_question(text) for text in questions]
+
+
+def bench_parse(args):
+    """Single-pass compile time of whole banks vs the original parser; time per question stays flat"""
+    results = []
+
+    def measure(content, questions, lines):
+        start = time.perf_counter()
+        bank = app.CompiledBank.from_lines('bench', 'bench', iter(content.split('\n')))
+        elapsed = time.perf_counter() - start
+        start = time.perf_counter()
+        _baseline_parse(content)
+        baseline = time.perf_counter() - start
+        questions = questions or len(bank.records)
+        results.append({
+            'questions': questions,
+            'lines': lines,
+            'mb': round(len(content) / 2**20, 2),
+            'ms': round(elapsed * 1000, 1),
+            'us_per_question': round(elapsed * 1e6 / questions, 2),
+            'baseline_ms': round(baseline * 1000, 1),
+            'speedup': round(baseline / elapsed, 1) if elapsed else None,
+        })
+
+    for total in args.bank_questions:
+        content = make_bank(50, max(1, total // 50))
+        measure(content, None, content.count('\n') + 1)
+    # One question with a very long stem: cost must grow linearly with its line count
+    for stem_lines in (1000, 10000, 100000):
+        content = 'SECTION: LONG\nQUESTION 1. Long stem\n' + 'stem line\n' * stem_lines + 'OPTIONS:\n1. a\nANSWER: 1\n'
+        measure(content, 1, stem_lines + 5)
+    return {'benchmark': 'parse', 'results': results}
+
+
+def bench_sampler(args):
+    """Quiz draws with the quota plan rebuilt per request vs a cached QuizSampler, plus a quota check"""
+    _, _, bank = _compiled_bank(18, 85)
+    bank.database_key = 'db1'
+    k = args.questions
+    # Uneven shares so rounding and the quota plan matter
+    weights = [i + 1 for i in range(len(bank.sections))]
+    pct = [str(w / sum(weights)) for w in weights]
+    app.SECTION_PCT_BY_DB_INDEX[1] = pct
+
+    sampler = app.QuizSampler.for_bank(bank, None, k)
+    before_s = _time_per_call(lambda: app.QuizSampler.for_bank(bank, None, k).draw(), min(args.draws, 10000))
+    after_s = _time_per_call(sampler.draw, args.draws)
+
+    # Every draw must contain exactly the planned number of distinct questions per section,
+    # and within a section every question should be picked equally often
+    section_of = {i: s for s, section in enumerate(bank.sections) for i in section['question_indices']}
+    picks = [0] * len(bank.records)
+    quota_misses = duplicates = 0
+    for _ in range(args.draws):
+        records = sampler.draw()
+        counts = [0] * len(bank.sections)
+        for record in records:
+            counts[section_of[record.bank_id]] += 1
+            picks[record.bank_id] += 1
+        if counts != sampler.quotas:
+            quota_misses += 1
+        if len({r.bank_id for r in records}) != len(records):
+            duplicates += 1
+    worst = 0.0
+    for s, section in enumerate(bank.sections):
+        if sampler.quotas[s]:
+            expected = args.draws * sampler.quotas[s] / section['count']
+            worst = max(worst, max(abs(picks[i] - expected) / expected for i in section['question_indices']))
+
+    failures = []
+    if quota_misses:
+        failures.append(f'{quota_misses} of {args.draws} draws missed the section quotas {sampler.quotas}')
+    if duplicates:
+        failures.append(f'{duplicates} of {args.draws} draws repeated a question')
+    return {'benchmark': 'sampler', 'draws': args.draws, 'questions_per_quiz': k,
+            'quotas': sampler.quotas, 'quota_misses': quota_misses, 'duplicate_draws': duplicates,
+            'max_pick_rate_deviation': round(worst, 4), 'failures': failures,
+            'results': [{'path': 'plan per request', 'us_per_draw': round(before_s * 1e6, 2)},
+                        {'path': 'cached sampler', 'us_per_draw': round(after_s * 1e6, 2)}]}
+
+
+def bench_rotation(args):
+    """Repeat quizzes for many users: uniform draws vs unseen-first draws with SQLite-backed bitsets"""
+    _, _, bank = _compiled_bank(18, 85)
+    bank.database_key = 'db1'
+    sampler = app.QuizSampler.for_bank(bank, None, args.questions)
+    users = [f'user{i}' for i in range(args.users)]
+    section_of = {i: s for s, section in enumerate(bank.sections) for i in section['question_indices']}
+    early_repeats = []
+
+    def check_rotation(cycle, ids):
+        # A question may come back only once every other question of its section has been
+        # served in the current cycle; the section then starts a new cycle with this draw
+        drawn = {}
+        for i in ids:
+            drawn.setdefault(section_of[i], set()).add(i)
+        for s, picked in drawn.items():
+            served = cycle.setdefault(s, set())
+            if picked & served:
+                unseen = set(bank.sections[s]['question_indices']) - served
+                if not unseen <= picked:
+                    early_repeats.append(len(picked & served))
+                cycle[s] = set(picked)
+            else:
+                served |= picked
+
+    def run(rotate, store):
+        overlap = 0
+        start = time.perf_counter()
+        previous, cycles = {}, {}
+        for _ in range(args.attempts):
+            for user in users:
+                seen = store.load(user, bank) if rotate else None
+                ids = {r.bank_id for r in sampler.draw(seen)}
+                if rotate:
+                    store.save(user, bank, seen)
+                    check_rotation(cycles.setdefault(user, {}), ids)
+                overlap += len(ids & previous.get(user, set()))
+                previous[user] = ids
+        elapsed = time.perf_counter() - start
+        repeats = args.attempts - 1
+        return elapsed / (args.users * args.attempts), overlap / (args.users * repeats) if repeats else 0.0
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = app.ExposureStore(os.path.join(tmp, 'exposure.sqlite3'))
+        uniform_s, uniform_overlap = run(False, store)
+        rotation_s, rotation_overlap = run(True, store)
+        db_bytes = sum(os.path.getsize(os.path.join(tmp, name)) for name in os.listdir(tmp))
+        # Draw cost alone, averaged over many complete rotations of one user's bitset
+        seen = bytearray((len(bank.records) + 7) >> 3)
+        draw_s = _time_per_call(lambda: sampler.draw(seen), 10000)
+
+    failures = []
+    if early_repeats:
+        failures.append(f'{len(early_repeats)} section draws repeated {sum(early_repeats)} question(s) '
+                        f'while unseen ones were still available')
+    return {'benchmark': 'rotation', 'users': args.users, 'attempts_per_user': args.attempts,
+            'bank_questions': len(bank.records), 'bitset_bytes_per_user': len(seen),
+            'store_bytes_per_user': db_bytes // args.users, 'early_repeats': len(early_repeats),
+            'failures': failures,
+            'results': [
+                {'mode': 'uniform', 'us_per_quiz': round(uniform_s * 1e6, 1),
+                 'avg_repeated_questions': round(uniform_overlap, 2)},
+                {'mode': 'rotation, draw only (full cycles)', 'us_per_quiz': round(draw_s * 1e6, 1),
+                 'avg_repeated_questions': ''},
+                {'mode': 'rotation + SQLite', 'us_per_quiz': round(rotation_s * 1e6, 1),
+                 'avg_repeated_questions': round(rotation_overlap, 2)},
+            ]}
+
+
+def bench_metrics(args):
+    """Histogram observation cost: per-thread cells vs a single lock-guarded histogram"""
+    class LockedHistogram:
+        def __init__(self):
+            self.counts = [0] * (len(app.METRICS_BUCKETS) + 2)
+            self.lock = threading.Lock()
+
+        def observe(self, seconds):
+            with self.lock:
+                self.counts[app.bisect.bisect_left(app.METRICS_BUCKETS, seconds)] += 1
+                self.counts[-1] += seconds
+
+    def run(histogram, threads):
+        per_thread = args.draws // threads
+
+        def work():
+            observe = histogram.observe
+            for i in range(per_thread):
+                observe((i % 1000) * 1e-4)
+        workers = [threading.Thread(target=work) for _ in range(threads)]
+        start = time.perf_counter()
+        for t in workers:
+            t.start()
+        for t in workers:
+            t.join()
+        return (time.perf_counter() - start) / (per_thread * threads)
+
+    results = []
+    for threads in (1, 8):
+        results.append({'threads': threads,
+                        'locked_ns': round(run(LockedHistogram(), threads) * 1e9),
+                        'per_thread_ns': round(run(app.Histogram({}), threads) * 1e9)})
+    registry = app.MetricsRegistry()
+    for stage in ('a', 'b', 'c', 'd', 'e', 'f', 'g'):
+        registry.histogram('bench_seconds', 'Benchmark', stage=stage).observe(0.01)
+    render_s = _time_per_call(registry.render, 200)
+    return {'benchmark': 'metrics', 'observations': args.draws, 'render_7_histograms_us': round(render_s * 1e6),
+            'results': results}
+
+
+def bench_storage(args):
+    """Login lookup, completion check and result insert: whole JSON files vs SQLite point queries"""
+    results = []
+    for count in args.counts:
+        users = {'users': [{'username': f'user{i}', 'password': 'pw'} for i in range(count)]}
+        completed = {f'user{i}': {'db1': ['ALL']} for i in range(0, count, 2)}
+        records = [app.result_record(f'user{i}', 20, 30, '12:34', 'db1', 'ALL') for i in range(count)]
+        users_text, completed_text, results_text = json.dumps(users), json.dumps(completed), json.dumps(records)
+        probe = f'user{count // 2}'
+
+        def json_login():
+            return next((u for u in json.loads(users_text)['users'] if u['username'] == probe), None)
+
+        def json_completed():
+            return 'ALL' in json.loads(completed_text).get(probe, {}).get('db1', [])
+
+        def json_save():
+            return json.dumps(json.loads(results_text) + [records[0]])
+
+        with tempfile.TemporaryDirectory() as tmp:
+            store = app.SQLiteStorage(os.path.join(tmp, 'quiz.sqlite3'), 3600)
+            store._refreshed_at = time.monotonic()  # Seeded below instead of imported from GitHub
+            store._transaction(lambda conn: (store._import_users(conn, users),
+                                             store._import_completions(conn, completed),
+                                             store._insert_results(conn, records)))
+            sqlite_login = _time_per_call(lambda: store.get_user(probe), args.repeat * 20)
+            sqlite_completed = _time_per_call(lambda: store.is_section_completed(probe, 'db1', 'ALL'), args.repeat * 20)
+            sqlite_save = _time_per_call(lambda: store.add_results([dict(records[0], submission_id=None)]), args.repeat)
+        results.append({
+            'records': count,
+            'json_login_us': round(_time_per_call(json_login, args.repeat) * 1e6, 1),
+            'sqlite_login_us': round(sqlite_login * 1e6, 1),
+            'json_completed_us': round(_time_per_call(json_completed, args.repeat) * 1e6, 1),
+            'sqlite_completed_us': round(sqlite_completed * 1e6, 1),
+            'json_save_us': round(_time_per_call(json_save, args.repeat) * 1e6, 1),
+            'sqlite_save_us': round(sqlite_save * 1e6, 1),
+        })
+    return {'benchmark': 'storage', 'synchronous': 'FULL' if app.RESULTS_FSYNC == 'always' else 'NORMAL',
+            'results': results}
+
+
+def bench_renders(args):
+    """Outbound GitHub requests made by each page of a quiz once the app is warm.
+
+    Login, section selection, quiz and questions must be answered from the in-memory
+    user directory, completion index and compiled banks. Revalidation intervals are
+    widened to a minute so only requests caused by a render itself are counted.
+    """
+    databases = app.get_available_databases()
+    fake = FakeGitHub().start()
+    fake.set_file('users.json', json.dumps({'users': [{'username': 'examinee', 'password': 'pw'}]}))
+    fake.set_file('completed_sections.json', json.dumps({'someone': {'db1': ['ALL']}}))
+    for info in databases.values():
+        fake.set_file(info['file'], make_bank(4, 40))
+    app.GITHUB_API_URL, app.GITHUB_TOKEN, app.PRIVATE_REPO = fake.url, 'benchmark-token', fake.repo
+    app.GITHUB_TREE_TTL_SECONDS = 60
+    app.BANK_REFRESH_SECONDS = 0
+    app.user_directory.refresh_seconds = app.completion_index.refresh_seconds = 60
+    app.start_background_workers()
+    deadline = time.monotonic() + 60
+    while not app.warmup_state['ready'] and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+    pages = [('login', 'POST', '/login', {'json': {'username': 'examinee', 'password': 'pw'}}),
+             ('select-section', 'GET', '/select-section', {})]
+    for key in sorted(databases):
+        pages += [('quiz', 'GET', f'/quiz?database={key}', {}), ('questions', 'GET', '/api/questions', {})]
+    counts, renders, failures = {}, {}, []
+    client = app.app.test_client()
+    for _ in range(args.attempts):
+        for name, method, path, kwargs in pages:
+            before = fake.count()
+            response = client.open(path, method=method, **kwargs)
+            if response.status_code >= 400:
+                failures.append(f'{method} {path} answered {response.status_code}')
+            counts[name] = counts.get(name, 0) + fake.count() - before
+            renders[name] = renders.get(name, 0) + 1
+    fake.stop()
+
+    results = [{'page': name, 'renders': renders[name], 'github_requests': counts[name]} for name in renders]
+    failures += [f"{row['page']}: {row['github_requests']} GitHub request(s) in {row['renders']} render(s)"
+                 for row in results if row['github_requests']]
+    return {'benchmark': 'renders', 'warmup_requests': fake.count() - sum(counts.values()),
+            'results': results, 'failures': failures}
+
+
+def _print_table(report):
+    rows = report['results']
+    if not rows:
+        return
+    columns = list(rows[0])
+    widths = {c: max(len(c), *(len(str(r[c])) for r in rows)) for c in columns}
+    print(f"{report['benchmark']}: " + ', '.join(f'{k}={v}' for k, v in report.items()
+                                                 if k not in ('benchmark', 'results')))
+    print('  '.join(c.rjust(widths[c]) for c in columns))
+    for row in rows:
+        print('  '.join(str(row[c]).rjust(widths[c]) for c in columns))
+
+
+BENCHMARKS = {
+    'assembly': bench_assembly,
+    'sessions': bench_sessions,
+    'github': bench_github,
+    'parse': bench_parse,
+    'sampler': bench_sampler,
+    'rotation': bench_rotation,
+    'metrics': bench_metrics,
+    'storage': bench_storage,
+    'renders': bench_renders,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Quiz application micro-benchmarks')
+    parser.add_argument('benchmark', choices=sorted(BENCHMARKS))
+    parser.add_argument('--sizes', type=int, nargs='+', default=[30, 100, 500])
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--counts', type=int, nargs='+', default=[1000, 10000], help='Session counts (sessions), user/result counts (storage)')
+    parser.add_argument('--questions', type=int, default=30, help='Questions per quiz (sessions)')
+    parser.add_argument('--bank-questions', type=int, nargs='+', default=[6250, 12500, 25000, 50000],
+                        help='Bank sizes (parse)')
+    parser.add_argument('--draws', type=int, default=100000, help='Quizzes drawn (sampler), observations (metrics)')
+    parser.add_argument('--users', type=int, default=10000, help='Users (rotation)')
+    parser.add_argument('--attempts', type=int, default=3, help='Quizzes per user (rotation), page rounds (renders)')
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+    args = parser.parse_args()
+
+    app.log.setLevel(logging.CRITICAL)  # Keep the app's own log lines out of the report
+    report = BENCHMARKS[args.benchmark](args)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        _print_table(report)
+    for failure in report.get('failures', []):
+        print(f'FAILED: {failure}', file=sys.stderr)
+    sys.exit(1 if report.get('failures') else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""Compile the question banks into binary snapshots the app can mmap at startup.
+
+    python tools/compile_banks.py                            # fetch the banks from PRIVATE_REPO
+    python tools/compile_banks.py --source-dir ../quiz-db    # compile a local checkout instead
+    python tools/compile_banks.py --out /srv/quiz/snapshots  # default: BANK_SNAPSHOT_DIR
+
+Each snapshot records the git blob SHA of the file it was compiled from. The app only
+uses a snapshot while GitHub still lists that SHA for the file and parses the text
+otherwise, so a stale snapshot is never served.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app  # noqa: E402
+
+
+def _read_source(filename, source_dir):
+    if source_dir:
+        with open(os.path.join(source_dir, filename), 'rb') as f:
+            return f.read()
+    with open(app.fetch_github_blob(filename).path, 'rb') as f:
+        return f.read()
+
+
+def compile_bank(database_key, filename, source_dir, out_dir):
+    data = _read_source(filename, source_dir)
+    blob_sha = app.git_blob_sha(data)
+    started = time.perf_counter()
+    parser = app.BankParser()
+    for line in data.decode('utf-8', errors='replace').split('\n'):
+        parser.feed(line)
+    parser.close()
+    bank = app.CompiledBank(database_key, blob_sha, parser.sections, parser.records)
+    path = os.path.join(out_dir, os.path.basename(app.snapshot_path(filename)))
+    app.write_bank_snapshot(path, bank, blob_sha)
+    skipped = len(parser.errors)
+    print(f'{database_key}: {filename} -> {path} ({len(bank.sections)} sections, {len(bank.records)} questions, '
+          f'{skipped} skipped, {os.path.getsize(path)} bytes, {time.perf_counter() - started:.2f}s, '
+          f'blob {blob_sha[:12]})')
+    for line_no, message in parser.errors:
+        print(f'  line {line_no}: {message}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compile question banks into mmap-able snapshots')
+    parser.add_argument('--source-dir', help='Directory with the bank files (default: fetch from GitHub)')
+    parser.add_argument('--out', default=app.BANK_SNAPSHOT_DIR, help='Snapshot directory')
+    parser.add_argument('databases', nargs='*', help='Database keys to compile (default: all)')
+    args = parser.parse_args()
+
+    os.makedirs(args.out, exist_ok=True)
+    databases = app.get_available_databases()
+    failed = False
+    for key in args.databases or sorted(databases):
+        try:
+            compile_bank(key, databases[key]['file'], args.source_dir, args.out)
+        except Exception as e:
+            print(f'{key}: failed: {e}')
+            failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
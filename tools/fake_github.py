@@ -0,0 +1,294 @@
+"""Local stand-in for the parts of the GitHub REST API the quiz app uses.
+
+Serves files from an in-memory dict (optionally seeded from a directory) so the
+app can be run and exercised without a network connection or a real token:
+
+    python tools/fake_github.py --dir path/to/private-repo --port 8765
+    GITHUB_API_URL=http://127.0.0.1:8765 GITHUB_TOKEN=x PRIVATE_REPO=me/quiz-db python app.py
+
+Supported endpoints:
+    GET /repos/{owner}/{repo}
+    GET /repos/{owner}/{repo}/contents
+    GET /repos/{owner}/{repo}/contents/{path}?ref=branch   (raw or JSON, ETag / If-None-Match)
+    GET /repos/{owner}/{repo}/git/trees/{branch}?recursive=1 (ETag / If-None-Match)
+    GET /repos/{owner}/{repo}/git/blobs/{sha}              (raw or JSON, gzip if accepted)
+    PUT /repos/{owner}/{repo}/contents/{path}              (sha-checked create/update)
+    GET /_fake/stats                                       (request counts, for harnesses in another process)
+
+Faults can be injected for resilience testing: fixed latency on every response and
+queued failures (e.g. three 503s, or a 429 with Retry-After) for the next requests.
+"""
+import argparse
+import base64
+import hashlib
+import gzip
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+
+def git_blob_sha(data):
+    """SHA-1 of a blob exactly as git computes it"""
+    return hashlib.sha1(b'blob %d\0' % len(data) + data).hexdigest()
+
+
+class _QuietServer(ThreadingHTTPServer):
+    def handle_error(self, request, client_address):
+        # Clients that time out (by design, under injected latency) drop the connection
+        pass
+
+
+class FakeGitHub:
+    """In-memory repository plus a threaded HTTP server speaking a GitHub API subset"""
+
+    def __init__(self, repo='owner/quiz-db', default_branch='main', host='127.0.0.1', port=0):
+        self.repo = repo
+        self.default_branch = default_branch
+        self.files = {}
+        self.shas = {}  # path -> blob SHA, kept in step with files
+        self.request_log = []
+        self.latency = 0.0  # Seconds added to every response
+        self._faults = []
+        self._lock = threading.Lock()
+        self._server = _QuietServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def set_file(self, path, content):
+        if isinstance(content, str):
+            content = content.encode('utf-8')
+        with self._lock:
+            self.files[path] = content
+            self.shas[path] = git_blob_sha(content)
+
+    def get_file(self, path):
+        with self._lock:
+            return self.files.get(path)
+
+    def load_dir(self, directory):
+        for name in sorted(os.listdir(directory)):
+            full = os.path.join(directory, name)
+            if os.path.isfile(full):
+                with open(full, 'rb') as f:
+                    self.set_file(name, f.read())
+
+    def count(self, method=None, path_prefix=None):
+        """Number of logged requests, optionally filtered by method and path prefix"""
+        with self._lock:
+            return sum(
+                1 for m, p, _ in self.request_log
+                if (method is None or m == method) and (path_prefix is None or p.startswith(path_prefix))
+            )
+
+    def inject(self, status, count=1, retry_after=None, path_prefix=None, latency=0.0, rate_limited=False):
+        """Answer the next `count` matching requests with an error status instead of serving them.
+
+        retry_after adds a Retry-After header; rate_limited adds X-RateLimit-Remaining: 0.
+        status=None with latency only delays the requests and then serves them normally.
+        """
+        with self._lock:
+            self._faults.append({'status': status, 'count': count, 'retry_after': retry_after,
+                                 'path_prefix': path_prefix, 'latency': latency,
+                                 'rate_limited': rate_limited})
+
+    def clear_faults(self):
+        with self._lock:
+            self._faults.clear()
+            self.latency = 0.0
+
+    def _take_fault(self, path):
+        with self._lock:
+            for fault in self._faults:
+                if fault['path_prefix'] is None or path.startswith(fault['path_prefix']):
+                    fault['count'] -= 1
+                    if fault['count'] <= 0:
+                        self._faults.remove(fault)
+                    return fault
+        return None
+
+    def reset_log(self):
+        with self._lock:
+            self.request_log.clear()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _make_handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, fmt, *args):
+                pass
+
+            def _send(self, status, body=b'', content_type='application/json', headers=None):
+                if isinstance(body, (dict, list)):
+                    body = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                if body and self.command != 'HEAD':
+                    self.wfile.write(body)
+
+            def _route(self):
+                parts = urlsplit(self.path)
+                with fake._lock:
+                    fake.request_log.append((self.command, parts.path, dict(self.headers)))
+                if fake.latency:
+                    time.sleep(fake.latency)
+                fault = fake._take_fault(parts.path)
+                if fault is not None:
+                    if fault['latency']:
+                        time.sleep(fault['latency'])
+                    if fault['status'] is not None:
+                        if self.command == 'PUT':
+                            self.rfile.read(int(self.headers.get('Content-Length', '0')))
+                        headers = {}
+                        if fault['retry_after'] is not None:
+                            headers['Retry-After'] = str(fault['retry_after'])
+                        if fault['rate_limited']:
+                            headers['X-RateLimit-Remaining'] = '0'
+                            headers['X-RateLimit-Reset'] = str(int(time.time()) + 1)
+                        self._send(fault['status'], {'message': 'Injected fault'}, headers=headers)
+                        return None, None, None
+                prefix = f'/repos/{fake.repo}'
+                if not parts.path.startswith(prefix):
+                    self._send(404, {'message': 'Not Found'})
+                    return None, None, None
+                return parts.path[len(prefix):], parse_qs(parts.query), parts
+
+            def do_GET(self):
+                if self.path == '/_fake/stats':
+                    return self._send(200, {'requests': fake.count(), 'puts': fake.count('PUT')})
+                rest, query, _ = self._route()
+                if rest is None:
+                    return
+                if rest == '':
+                    return self._send(200, {
+                        'name': fake.repo.split('/')[-1],
+                        'default_branch': fake.default_branch,
+                        'private': True,
+                    })
+                if rest in ('/contents', '/contents/'):
+                    with fake._lock:
+                        names = sorted(fake.files)
+                    return self._send(200, [{'name': n, 'path': n, 'type': 'file'} for n in names])
+                if rest.startswith('/contents/'):
+                    path = rest[len('/contents/'):]
+                    ref = query.get('ref', [fake.default_branch])[0]
+                    data = fake.get_file(path)
+                    if data is None or ref != fake.default_branch:
+                        return self._send(404, {'message': 'Not Found'})
+                    sha = fake.shas[path]
+                    etag = f'"{sha}"'
+                    if self.headers.get('If-None-Match') == etag:
+                        return self._send(304, headers={'ETag': etag})
+                    if 'raw' in self.headers.get('Accept', ''):
+                        return self._send(200, data, 'application/vnd.github.v3.raw', {'ETag': etag})
+                    return self._send(200, {
+                        'name': path.split('/')[-1],
+                        'path': path,
+                        'sha': sha,
+                        'size': len(data),
+                        'encoding': 'base64',
+                        'content': base64.b64encode(data).decode('ascii'),
+                    }, headers={'ETag': etag})
+                if rest.startswith('/git/blobs/'):
+                    sha = rest[len('/git/blobs/'):]
+                    with fake._lock:
+                        data = next((fake.files[n] for n, blob in fake.shas.items() if blob == sha), None)
+                    if data is None:
+                        return self._send(404, {'message': 'Not Found'})
+                    if 'raw' not in self.headers.get('Accept', ''):
+                        return self._send(200, {'sha': sha, 'size': len(data), 'encoding': 'base64',
+                                                'content': base64.b64encode(data).decode('ascii')})
+                    if 'gzip' in self.headers.get('Accept-Encoding', ''):
+                        return self._send(200, gzip.compress(data), 'application/vnd.github.v3.raw',
+                                          {'Content-Encoding': 'gzip'})
+                    return self._send(200, data, 'application/vnd.github.v3.raw')
+                if rest.startswith('/git/trees/'):
+                    if rest[len('/git/trees/'):] != fake.default_branch:
+                        return self._send(404, {'message': 'Not Found'})
+                    with fake._lock:
+                        tree = [{'path': n, 'type': 'blob', 'sha': fake.shas[n], 'size': len(d)}
+                                for n, d in sorted(fake.files.items())]
+                    etag = '"%s"' % hashlib.sha1(json.dumps(tree).encode('utf-8')).hexdigest()
+                    if self.headers.get('If-None-Match') == etag:
+                        return self._send(304, headers={'ETag': etag})
+                    return self._send(200, {'sha': etag.strip('"'), 'tree': tree, 'truncated': False},
+                                      headers={'ETag': etag})
+                return self._send(404, {'message': 'Not Found'})
+
+            def do_PUT(self):
+                rest, _, _ = self._route()
+                if rest is None:
+                    return
+                if not rest.startswith('/contents/'):
+                    return self._send(404, {'message': 'Not Found'})
+                path = rest[len('/contents/'):]
+                length = int(self.headers.get('Content-Length', '0'))
+                payload = json.loads(self.rfile.read(length) or b'{}')
+                new_data = base64.b64decode(payload.get('content', ''))
+                with fake._lock:
+                    current = fake.files.get(path)
+                    if current is not None and payload.get('sha') != fake.shas[path]:
+                        conflict = True
+                    else:
+                        conflict = False
+                        fake.files[path] = new_data
+                        fake.shas[path] = git_blob_sha(new_data)
+                if conflict:
+                    return self._send(409, {'message': f'{path} does not match {payload.get("sha")}'})
+                sha = git_blob_sha(new_data)
+                return self._send(201 if current is None else 200, {'content': {'path': path, 'sha': sha}})
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve a local stand-in for the GitHub contents API')
+    parser.add_argument('--dir', help='Directory whose files become the repository contents')
+    parser.add_argument('--repo', default='owner/quiz-db', help='owner/name the server answers for')
+    parser.add_argument('--branch', default='main', help='Default branch name')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds added to every response')
+    args = parser.parse_args()
+
+    fake = FakeGitHub(args.repo, args.branch, args.host, args.port)
+    fake.latency = args.latency
+    if args.dir:
+        fake.load_dir(args.dir)
+    print(f'Serving {len(fake.files)} files for {args.repo} at {fake.url}')
+    try:
+        fake._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,455 @@
+"""End-to-end load test of the quiz lifecycle against a local stand-in for GitHub.
+
+Serves six synthetic question banks from tools/fake_github.py, boots the app pointed at
+it (each in its own process, so neither competes with the load generator for the GIL),
+and drives simulated examinees concurrently through
+login -> select-section -> quiz -> questions -> submit:
+
+    python tools/loadtest.py                                  # 200 examinees, 1.5k questions per bank
+    python tools/loadtest.py --examinees 1000 --questions 100000 --server gunicorn --workers 4
+    python tools/loadtest.py --out run.json                   # also write the report to a file
+    python tools/loadtest.py --compare run.json               # exit 1 if a p95 regressed
+    python tools/loadtest.py --examinees 500 --sync-submit --duplicate-submits 2
+                                                              # 500 submits in the same instant, each sent 3 times
+    python tools/loadtest.py --examinees 50 --retakes 1       # every retake must be stored as its own result
+    python tools/loadtest.py --storage sqlite                 # users, results and completions in quiz.sqlite3
+
+The JSON report has throughput, p50/p95/p99 per endpoint, outbound GitHub calls per
+examinee, the server's peak RSS, how many results were persisted, and mean stage
+times from /metrics (of whichever worker answers the scrape). The exit status is 1 unless
+every examinee finished (retakes included) and each quiz was persisted exactly once.
+"""
+import argparse
+import json
+import os
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic_bank import make_bank  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Same files as get_available_databases() in app.py
+BANK_FILES = {
+    'db1': 'm_script_database.txt',
+    'db2': 'simulink_stateflow_database.txt',
+    'db3': 'simulink_stateflow_modeling.txt',
+    'db4': 'embedded_c_automotive.txt',
+    'db5': 'CAN.txt',
+    'db6': 'autosar.txt',
+}
+SECTIONS_PER_BANK = {'db1': 18, 'db2': 8, 'db3': 4, 'db4': 6, 'db5': 3, 'db6': 3}
+ENDPOINTS = ('login', 'select_section', 'quiz', 'questions', 'submit', 'submit_duplicate')
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def seed_repository(directory, questions_per_bank, examinees, multi_login):
+    """Write the six banks and a users.json with one user per examinee"""
+    for key, filename in BANK_FILES.items():
+        sections = SECTIONS_PER_BANK[key]
+        with open(os.path.join(directory, filename), 'w') as f:
+            f.write(make_bank(sections, max(1, questions_per_bank // sections), seed=int(key[2:]),
+                              section_prefix=key.upper()))
+    users = [{'username': f'examinee{i}', 'password': 'pw', 'multiLogin': multi_login} for i in range(examinees)]
+    with open(os.path.join(directory, 'users.json'), 'w') as f:
+        json.dump({'users': users}, f)
+
+
+def _children(pid):
+    try:
+        with open(f'/proc/{pid}/task/{pid}/children') as f:
+            return [int(p) for p in f.read().split()]
+    except OSError:
+        return []
+
+
+def _peak_rss_kb(pid):
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+class RssSampler:
+    """Tracks the peak RSS (VmHWM) of the server process and its workers (Linux only)"""
+
+    def __init__(self, pid, interval=0.5):
+        self.pid = pid
+        self.interval = interval
+        self.peaks = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def sample(self):
+        for pid in [self.pid] + _children(self.pid):
+            rss = _peak_rss_kb(pid)
+            if rss is not None:
+                self.peaks[pid] = max(rss, self.peaks.get(pid, 0))
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def start(self):
+        self.sample()
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.sample()
+
+
+class FakeGitHubProcess:
+    """tools/fake_github.py serving a directory from a subprocess"""
+
+    repo = 'owner/quiz-db'
+
+    def __init__(self, directory, latency):
+        self.port = _free_port()
+        self.url = f'http://127.0.0.1:{self.port}'
+        self.process = subprocess.Popen(
+            [sys.executable, os.path.join(ROOT, 'tools', 'fake_github.py'), '--dir', directory,
+             '--repo', self.repo, '--port', str(self.port), '--latency', str(latency)],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        for _ in range(100):
+            try:
+                self.stats()
+                return
+            except requests.RequestException:
+                time.sleep(0.1)
+        self.stop()
+        raise RuntimeError('Fake GitHub did not start')
+
+    def stats(self):
+        return requests.get(self.url + '/_fake/stats', timeout=10).json()
+
+    def stop(self):
+        self.process.terminate()
+        self.process.wait()
+
+
+class Server:
+    """The app in a subprocess: the Flask development server or gunicorn"""
+
+    def __init__(self, kind, workers, env):
+        self.port = _free_port()
+        self.url = f'http://127.0.0.1:{self.port}'
+        env = {**os.environ, **env, 'PORT': str(self.port)}
+        if kind == 'gunicorn':
+            cmd = [sys.executable, '-m', 'gunicorn', '--bind', f'127.0.0.1:{self.port}', '--workers', str(workers),
+                   '--threads', '8', '--worker-class', 'gthread', 'app:app']
+        else:
+            cmd = [sys.executable, 'app.py']
+        self.log = tempfile.TemporaryFile()
+        self.process = subprocess.Popen(cmd, cwd=ROOT, env=env, stdout=self.log, stderr=subprocess.STDOUT)
+
+    def wait_ready(self, timeout):
+        """Wait until /health reports warm (every gunicorn worker answers 200 eventually)"""
+        deadline = time.monotonic() + timeout
+        ready = 0
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                break
+            try:
+                ready = ready + 1 if requests.get(self.url + '/health', timeout=2).status_code == 200 else 0
+            except requests.RequestException:
+                ready = 0
+            if ready >= 5:
+                return
+            time.sleep(0.1 if ready else 0.5)
+        self.log.seek(0)
+        raise RuntimeError('Server did not become ready:\n' + self.log.read().decode('utf-8', 'replace')[-4000:])
+
+    def stop(self):
+        self.process.terminate()
+        try:
+            self.process.wait(10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+        self.log.close()
+
+
+def run_examinee(base_url, username, database_key, barrier=None, duplicates=0, attempts=1):
+    """One examinee's full quiz; returns [(endpoint, seconds, status)] (status 0: no response).
+
+    With a barrier, the submit waits until every examinee is ready to submit (a cohort
+    whose timers run out together). duplicates sends that many copies of the submit at
+    the same time, as client retries would. attempts > 1 retakes the same database
+    (multiLogin users) after each submit.
+    """
+    timings = []
+    client = requests.Session()
+
+    def call(endpoint, method, path, session=client, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = session.request(method, base_url + path, timeout=120, allow_redirects=False, **kwargs)
+            status = response.status_code
+        except requests.RequestException:
+            response, status = None, 0
+        timings.append((endpoint, time.perf_counter() - start, status))
+        return response if 0 < status < 400 else None
+
+    try:
+        logged_in = call('login', 'POST', '/login', json={'username': username, 'password': 'pw'})
+        for _ in range(attempts):
+            submission = None
+            if logged_in:
+                call('select_section', 'GET', '/select-section')
+                response = call('quiz', 'GET', f'/quiz?database={database_key}')
+                if response is not None and response.is_redirect:
+                    # The first visit after a submit only clears the finished quiz (as in the browser)
+                    response = call('quiz', 'GET', f'/quiz?database={database_key}')
+                if response is not None:
+                    response = call('questions', 'GET', '/api/questions')
+                if response is not None:
+                    data = response.json()
+                    answers = {str(q['id']): [q['options'][0]['text']] for q in data['questions']}
+                    headers = {'Idempotency-Key': data['submit_key']} if data.get('submit_key') else {}
+                    submission = {'json': {'answers': answers, 'time_taken': '12:34'}, 'headers': headers}
+            if barrier is not None:
+                try:
+                    barrier.wait()
+                except threading.BrokenBarrierError:
+                    pass
+                # The wait outlasts gunicorn's keep-alive; a pooled connection the server already
+                # closed would fail the submit before it is sent, so reconnect like a browser would
+                client.close()
+            if submission is not None:
+                def retry():
+                    with requests.Session() as other:
+                        other.cookies.update(client.cookies)
+                        call('submit_duplicate', 'POST', '/api/submit', session=other, **submission)
+                copies = [threading.Thread(target=retry) for _ in range(duplicates)]
+                for t in copies:
+                    t.start()
+                call('submit', 'POST', '/api/submit', **submission)
+                for t in copies:
+                    t.join()
+    finally:
+        client.close()
+    return timings
+
+
+def scrape_stage_means(base_url):
+    """Mean milliseconds per call of each quiz_stage_seconds stage, from one worker's /metrics"""
+    try:
+        text = requests.get(base_url + '/metrics', timeout=10).text
+    except requests.RequestException:
+        return {}
+    sums, counts = {}, {}
+    for line in text.splitlines():
+        if line.startswith('quiz_stage_seconds_sum') or line.startswith('quiz_stage_seconds_count'):
+            sample, value = line.rsplit(' ', 1)
+            stage = sample.split('stage="', 1)[1].split('"', 1)[0]
+            (sums if sample.startswith('quiz_stage_seconds_sum') else counts)[stage] = float(value)
+    return {stage: {'calls': int(counts[stage]), 'mean_ms': round(sums[stage] / counts[stage] * 1000, 3)}
+            for stage in sums if counts.get(stage)}
+
+
+def _count_results(results_dir, storage):
+    """(results persisted, distinct submission IDs among them)"""
+    if storage == 'sqlite':
+        with sqlite3.connect(os.path.join(results_dir, 'quiz.sqlite3')) as conn:
+            return conn.execute('SELECT COUNT(*), COUNT(DISTINCT submission_id) FROM results').fetchone()
+    try:
+        with open(os.path.join(results_dir, 'results.jsonl'), 'rb') as f:
+            records = [json.loads(line) for line in f if line.strip()]
+    except FileNotFoundError:
+        return 0, 0
+    return len(records), len({r.get('submission_id') for r in records})
+
+
+def run_load_test(args):
+    results_dir = tempfile.mkdtemp(prefix='quiz-loadtest-')
+    repo_dir = os.path.join(results_dir, 'repo')
+    os.makedirs(repo_dir)
+    seed_repository(repo_dir, args.questions, args.examinees, args.multi_login)
+    fake = FakeGitHubProcess(repo_dir, args.github_latency)
+    env = {
+        'GITHUB_API_URL': fake.url,
+        'GITHUB_TOKEN': 'loadtest',
+        'PRIVATE_REPO': fake.repo,
+        'RESULTS_DIR': results_dir,
+        'SECRET_KEY': 'loadtest',
+        'LOG_LEVEL': args.log_level,
+        'RESULTS_EXPORT_INTERVAL_SECONDS': '0',
+        'GITHUB_FLUSH_INTERVAL_SECONDS': '1',  # Let completed-section commits land within --settle
+        'QUIZ_SESSION_BACKEND': 'sqlite' if args.server == 'gunicorn' else 'memory',
+        'STORAGE_BACKEND': args.storage,
+    }
+    server = Server(args.server, args.workers, env)
+    try:
+        server.wait_ready(args.startup_timeout)
+        startup = fake.stats()
+        rss = RssSampler(server.process.pid)
+        rss.start()
+
+        databases = args.databases or sorted(BANK_FILES)
+        started = time.perf_counter()
+        # A synchronized submit needs every examinee in flight at once
+        concurrency = args.examinees if args.sync_submit else (args.concurrency or args.examinees)
+        barrier = threading.Barrier(args.examinees, timeout=args.startup_timeout) if args.sync_submit else None
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            futures = [pool.submit(run_examinee, server.url, f'examinee{i}', databases[i % len(databases)],
+                                   barrier, args.duplicate_submits, 1 + args.retakes)
+                       for i in range(args.examinees)]
+            all_timings = [f.result() for f in futures]
+        elapsed = time.perf_counter() - started
+
+        rss.stop()
+        # Write-behind and result appends settle in the background; give them a moment
+        time.sleep(args.settle)
+        results, distinct_results = _count_results(results_dir, args.storage)
+        final = fake.stats()
+        github_calls = final['requests'] - startup['requests']
+        github_puts = final['puts'] - startup['puts']
+        stages = scrape_stage_means(server.url)
+    finally:
+        server.stop()
+        fake.stop()
+
+    endpoints = {}
+    for name in ENDPOINTS:
+        samples = [(seconds, status) for timings in all_timings for endpoint, seconds, status in timings
+                   if endpoint == name]
+        if not samples:
+            continue
+        latencies = sorted(seconds * 1000 for seconds, _ in samples)
+        endpoints[name] = {
+            'requests': len(samples),
+            'errors': {str(status): count for status, count in sorted(Counter(
+                status for _, status in samples if not 0 < status < 400).items())},
+            'p50_ms': _round(_percentile(latencies, 50)),
+            'p95_ms': _round(_percentile(latencies, 95)),
+            'p99_ms': _round(_percentile(latencies, 99)),
+            'max_ms': _round(latencies[-1]),
+        }
+    submitted = [sum(1 for endpoint, _, status in timings if endpoint == 'submit' and 0 < status < 400)
+                 for timings in all_timings]
+    completed = sum(1 for count in submitted if count == 1 + args.retakes)
+    requests_total = sum(len(timings) for timings in all_timings)
+    peaks = rss.peaks
+    return {
+        'config': {
+            'examinees': args.examinees,
+            'concurrency': concurrency,
+            'sync_submit': args.sync_submit,
+            'duplicate_submits': args.duplicate_submits,
+            'retakes': args.retakes,
+            'questions_per_bank': args.questions,
+            'databases': databases,
+            'server': args.server,
+            'workers': args.workers if args.server == 'gunicorn' else 1,
+            'storage': args.storage,
+            'github_latency_s': args.github_latency,
+            'multi_login': args.multi_login,
+        },
+        'elapsed_s': round(elapsed, 3),
+        'completed_examinees': completed,
+        'quizzes_submitted': sum(submitted),
+        'examinees_per_s': round(completed / elapsed, 2),
+        'requests_per_s': round(requests_total / elapsed, 1),
+        'endpoints': endpoints,
+        'github': {
+            'startup_calls': startup['requests'],
+            'calls': github_calls,
+            'puts': github_puts,
+            'calls_per_examinee': round(github_calls / args.examinees, 3),
+        },
+        'server_peak_rss_mb': {
+            'total': round(sum(peaks.values()) / 1024, 1) if peaks else None,
+            'max_process': round(max(peaks.values()) / 1024, 1) if peaks else None,
+        },
+        'results_persisted': results,
+        'distinct_submissions_persisted': distinct_results,
+        'server_stages_one_worker': stages,
+    }
+
+
+def _round(value):
+    return None if value is None else round(value, 2)
+
+
+def compare(report, baseline, tolerance):
+    """Return the endpoints whose p95 grew by more than tolerance over the baseline"""
+    regressions = []
+    for name, current in report['endpoints'].items():
+        before = baseline.get('endpoints', {}).get(name, {}).get('p95_ms')
+        if before and current['p95_ms'] is not None and current['p95_ms'] > before * (1 + tolerance):
+            regressions.append({'endpoint': name, 'baseline_p95_ms': before, 'p95_ms': current['p95_ms']})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load-test the quiz lifecycle against a fake GitHub')
+    parser.add_argument('--examinees', type=int, default=200, help='Simulated examinees (one quiz each)')
+    parser.add_argument('--concurrency', type=int, default=0, help='Examinees in flight at once (default: all)')
+    parser.add_argument('--questions', type=int, default=1500, help='Questions per bank (1500..100000)')
+    parser.add_argument('--databases', nargs='*', help='Database keys to spread examinees over (default: all six)')
+    parser.add_argument('--server', choices=('flask', 'gunicorn'), default='flask')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn worker processes')
+    parser.add_argument('--storage', choices=('github', 'sqlite'), default='github', help='STORAGE_BACKEND for the server')
+    parser.add_argument('--multi-login', action='store_true', help='Give every examinee multiLogin')
+    parser.add_argument('--sync-submit', action='store_true',
+                        help='Hold every submit until all examinees are ready, then send them together')
+    parser.add_argument('--duplicate-submits', type=int, default=0,
+                        help='Extra copies of each submit sent concurrently (client retries)')
+    parser.add_argument('--retakes', type=int, default=0,
+                        help='Quizzes each examinee retakes on the same database (implies --multi-login)')
+    parser.add_argument('--github-latency', type=float, default=0.0, help='Seconds added to every GitHub response')
+    parser.add_argument('--startup-timeout', type=float, default=300)
+    parser.add_argument('--settle', type=float, default=2.0, help='Seconds to wait for background writes')
+    parser.add_argument('--log-level', default='WARNING', help='LOG_LEVEL for the server')
+    parser.add_argument('--out', help='Also write the JSON report to this file')
+    parser.add_argument('--compare', help='Baseline report; exit 1 if any endpoint p95 regressed')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed p95 growth over the baseline')
+    args = parser.parse_args()
+    args.multi_login = args.multi_login or args.retakes > 0
+
+    report = run_load_test(args)
+    if args.compare:
+        with open(args.compare) as f:
+            report['regressions'] = compare(report, json.load(f), args.tolerance)
+    print(json.dumps(report, indent=2))
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=2)
+    # Every submitted quiz (retakes included) must be persisted exactly once, however often it was sent
+    failed = (report['completed_examinees'] < args.examinees
+              or report['results_persisted'] != report['quizzes_submitted']
+              or report['distinct_submissions_persisted'] != report['quizzes_submitted']
+              or report.get('regressions'))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""Generate synthetic question banks in the m_script_database.txt format.
+
+    python tools/synthetic_bank.py --sections 18 --per-section 100 > bank.txt
+"""
+import argparse
+import random
+
+
+def make_bank(num_sections=18, per_section=85, seed=0, section_prefix='SECTION'):
+    """Return bank text with num_sections sections of per_section questions each.
+
+    The mix mirrors the real banks: multi-line stems, multi-answer questions,
+    "All of the above" options and options that reference each other.
+    """
+    rnd = random.Random(seed)
+    lines = []
+    number = 1
+    for s in range(num_sections):
+        lines.append(f'SECTION: {section_prefix} {s + 1}')
+        lines.append('')
+        for q in range(per_section):
+            lines.append(f'QUESTION {number}. Which statement about item {number} in section {s + 1} is correct?')
+            if rnd.random() < 0.2:
+                lines.append('Consider the following snippet:')
+                lines.append(f'x = {rnd.randint(1, 99)}; y = x * {rnd.randint(2, 9)};')
+            lines.append('OPTIONS:')
+            num_options = rnd.choice((2, 4, 4, 4, 5))
+            options = [f'Candidate answer {k} for question {number}' for k in range(1, num_options + 1)]
+            roll = rnd.random()
+            if num_options >= 4 and roll < 0.1:
+                options[-1] = 'All of the above'
+            elif num_options >= 4 and roll < 0.15:
+                options[-1] = 'Both 1 and 2'
+            for k, text in enumerate(options, 1):
+                lines.append(f'{k}. {text}')
+            answers = rnd.sample(range(1, num_options + 1), 2 if rnd.random() < 0.2 else 1)
+            lines.append('ANSWER: ' + ' '.join(str(a) for a in sorted(answers)))
+            lines.append('')
+            number += 1
+    return '\n'.join(lines) + '\n'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Print a synthetic question bank')
+    parser.add_argument('--sections', type=int, default=18)
+    parser.add_argument('--per-section', type=int, default=85)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    print(make_bank(args.sections, args.per_section, args.seed), end='')
+
+
+if __name__ == '__main__':
+    main()